@@ -0,0 +1,199 @@
+# exp/beacon_synth.py
+"""
+Beacon 基准测试用的合成 Python 模块生成器。
+
+生成的模块包含：
+- 若干模块级常量（被各函数引用，构成共享的模块级依赖子图）；
+- n_funcs 个函数，每个函数 stmts_per_func 条语句：
+  赋值引用前面的局部变量和全局常量，右侧是深度为 depth 的嵌套调用表达式，
+  每个函数调用 fanout 个其他函数，结尾 return / print；
+- 一个调用部分函数的 main()。
+
+generate_rich_module 生成覆盖更多语法的模块：类与方法（self.m() 调用）、增量赋值、
+带注解的赋值、推导式、生成器（yield）和 async 函数。
+
+同一组参数 + seed 生成的源码完全相同，便于跨提交比较。
+"""
+
+import random
+from pathlib import Path
+
+
+def _nested_expr(rng: random.Random, names, depth: int) -> str:
+    """生成深度为 depth 的嵌套调用表达式，例如 f(g(x, 1), y)。"""
+    if depth <= 0:
+        return rng.choice(names)
+    inner = _nested_expr(rng, names, depth - 1)
+    op = rng.choice(("abs", "min", "max", "round"))
+    if op in ("min", "max"):
+        return f"{op}({inner}, {rng.choice(names)})"
+    return f"{op}({inner})"
+
+
+def generate_module(n_funcs: int = 200,
+                    stmts_per_func: int = 40,
+                    fanout: int = 3,
+                    depth: int = 2,
+                    n_globals: int = 20,
+                    seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines = []
+
+    globals_ = [f"CONST_{i}" for i in range(n_globals)]
+    for i, g in enumerate(globals_):
+        if i == 0:
+            lines.append(f"{g} = {rng.randint(1, 100)}")
+        else:
+            lines.append(f"{g} = {globals_[i - 1]} + {rng.randint(1, 100)}")
+    lines.append("")
+
+    func_names = [f"func_{i}" for i in range(n_funcs)]
+    for fi, fname in enumerate(func_names):
+        lines.append(f"def {fname}(a, b):")
+        local_names = ["a", "b"]
+        for si in range(stmts_per_func):
+            var = f"v{si}"
+            pool = local_names[-6:] + rng.sample(globals_, min(2, len(globals_)))
+            kind = si % 5
+            if kind == 0 and fanout > 0 and fi > 0:
+                callee = func_names[rng.randrange(0, fi)]
+                lines.append(f"    {var} = {callee}({rng.choice(pool)}, {rng.choice(pool)})")
+            elif kind == 1:
+                lines.append(f"    {var} = {_nested_expr(rng, pool, depth)}")
+            elif kind == 2:
+                lines.append(f"    {var} = {rng.choice(pool)} + {rng.choice(pool)} * {rng.randint(1, 9)}")
+            elif kind == 3:
+                lines.append(f"    if {rng.choice(pool)} > {rng.randint(0, 50)}:")
+                lines.append(f"        {var} = {rng.choice(pool)} - 1")
+                lines.append("    else:")
+                lines.append(f"        {var} = {rng.choice(pool)} + 1")
+            else:
+                lines.append(f"    {var} = [{rng.choice(pool)}, {rng.choice(pool)}]")
+                lines.append(f"    {var}[0] = {rng.choice(pool)}")
+            local_names.append(var)
+
+        # 额外的调用，使每个函数的 call fan-out 达到 fanout
+        for _ in range(max(0, fanout - stmts_per_func // 5)):
+            if fi > 0:
+                lines.append(f"    {func_names[rng.randrange(0, fi)]}(a, b)")
+        if fi % 7 == 0:
+            lines.append("    if a is None:")
+            lines.append("        return None")
+        if fi % 3 == 0:
+            lines.append(f"    print({local_names[-1]})")
+        lines.append(f"    return {local_names[-1]}")
+        lines.append("")
+
+    lines.append("def main():")
+    for fname in rng.sample(func_names, min(fanout * 2, len(func_names))):
+        lines.append(f"    r_{fname} = {fname}(CONST_0, CONST_1)")
+        lines.append(f"    print(r_{fname})")
+    lines.append("    return 0")
+    lines.append("")
+    lines.append('if __name__ == "__main__":')
+    lines.append("    main()")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def generate_rich_module(n_classes: int = 40,
+                         methods_per_class: int = 6,
+                         stmts_per_method: int = 12,
+                         n_funcs: int = 40,
+                         seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines = ["import asyncio", "", "LIMIT: int = 100", "COUNTS = {}", ""]
+
+    for ci in range(n_classes):
+        lines.append(f"class Model{ci}:")
+        lines.append("    def __init__(self, a, b):")
+        lines.append("        self.a = a")
+        lines.append("        self.b = b")
+        for mi in range(methods_per_class):
+            lines.append(f"    def step_{mi}(self, x):")
+            local_names = ["x"]
+            for si in range(stmts_per_method):
+                var = f"v{si}"
+                pool = local_names[-4:]
+                kind = si % 6
+                if kind == 0 and mi > 0:
+                    lines.append(f"        {var} = self.step_{rng.randrange(0, mi)}({rng.choice(pool)})")
+                elif kind == 1:
+                    lines.append(f"        {var}: int = {rng.choice(pool)} + LIMIT")
+                elif kind == 2:
+                    lines.append(f"        {var} = [i * {rng.choice(pool)} for i in range({rng.randint(2, 9)}) if i % 2]")
+                elif kind == 3:
+                    lines.append(f"        {var} = {{k: {rng.choice(pool)} for k in range(3)}}")
+                else:
+                    lines.append(f"        {var} = {rng.choice(pool)}")
+                    lines.append(f"        {var} += {rng.choice(pool)}")
+                local_names.append(var)
+            lines.append(f"        COUNTS[{ci}] = {local_names[-1]}")
+            lines.append(f"        return {local_names[-1]}")
+        lines.append("")
+
+    for fi in range(n_funcs):
+        if fi % 3 == 0:
+            lines.append(f"def gen_{fi}(n):")
+            lines.append("    total = 0")
+            lines.append("    for i in range(n):")
+            lines.append("        total += i")
+            lines.append("        yield total")
+        elif fi % 3 == 1:
+            lines.append(f"async def fetch_{fi}(n):")
+            lines.append("    await asyncio.sleep(0)")
+            lines.append(f"    m = Model{rng.randrange(n_classes)}(n, n)")
+            lines.append(f"    return m.step_{rng.randrange(methods_per_class)}(n)")
+        else:
+            lines.append(f"def use_{fi}(n):")
+            lines.append(f"    m = Model{rng.randrange(n_classes)}(n, n + 1)")
+            lines.append(f"    r = m.step_{rng.randrange(methods_per_class)}(n)")
+            lines.append(f"    r += sum(g for g in gen_{fi - 2}(n))")
+            lines.append("    print(r)")
+            lines.append("    return r")
+        lines.append("")
+
+    lines.append("def main():")
+    for fi in range(2, n_funcs, 3):
+        lines.append(f"    use_{fi}(LIMIT)")
+    lines.append(f"    asyncio.run(fetch_1(LIMIT))")
+    lines.append("    return 0")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def generate_project(out_dir,
+                     n_files: int = 200,
+                     n_funcs: int = 20,
+                     stmts_per_func: int = 15,
+                     imports_per_file: int = 3,
+                     seed: int = 0) -> int:
+    """
+    在 out_dir 下生成一个合成包 synthpkg/：每个文件是一个 generate_module 模块，
+    并通过 `from synthpkg.mod_j import func_k`（以及相对导入）调用其他文件里的函数，
+    构成跨模块调用图。返回生成的文件数。
+    """
+    rng = random.Random(seed)
+    pkg = Path(out_dir) / "synthpkg"
+    pkg.mkdir(parents=True, exist_ok=True)
+    (pkg / "__init__.py").write_text("", encoding="utf-8")
+
+    for i in range(n_files):
+        body = generate_module(n_funcs, stmts_per_func, fanout=3, depth=2, n_globals=5, seed=seed + i)
+        header, bridge = [], ["def bridge(a, b):"]
+        for j in rng.sample(range(n_files), min(imports_per_file, n_files)):
+            if j == i:
+                continue
+            k = rng.randrange(n_funcs)
+            alias = f"m{j}_f{k}"
+            if j % 2:
+                header.append(f"from synthpkg.mod_{j} import func_{k} as {alias}")
+            else:
+                header.append(f"from .mod_{j} import func_{k} as {alias}")
+            bridge.append(f"    r_{alias} = {alias}(a, b)")
+        bridge.append("    return a")
+        text = "\n".join(header) + "\n\n" + body + "\n" + "\n".join(bridge) + "\n"
+        # main() 也调用 bridge()，让跨文件的函数从入口可达
+        text = text.replace("def main():\n", "def main():\n    bridge(CONST_0, CONST_1)\n", 1)
+        (pkg / f"mod_{i}.py").write_text(text, encoding="utf-8")
+    return n_files + 1
@@ -0,0 +1,151 @@
+# exp/bench_beacon.py
+"""
+BeaconExtractor 基准测试：当前实现 vs. 某个 git 版本中的实现。
+
+对合成模块（见 exp/beacon_synth.py）分别计时 visit、依赖图构建、
+compute_all_local_beacons、compute_program_beacons，并用 tracemalloc 统计分析阶段的峰值内存；
+同时比较两边 to_json 的结果，确保输出一致。
+
+--depth-scaling 固定函数规模、逐步加深嵌套调用表达式，只测 visit 阶段，
+用于观察 visit 随表达式深度的增长（线性 vs. 平方）。
+
+用法（在项目根目录）:
+    python -m exp.bench_beacon
+    python -m exp.bench_beacon --funcs 400 --stmts 40 --ref <commit>
+    python -m exp.bench_beacon --depth-scaling 10,20,40,80,160
+"""
+
+import argparse
+import gc
+import importlib.util
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from exp.beacon_synth import generate_module
+from src import Beacon
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _root_commit() -> str:
+    out = subprocess.run(["git", "rev-list", "--max-parents=0", "HEAD"],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    return out.stdout.split()[0]
+
+
+def load_beacon_at(ref: str):
+    """从 git 中取出 ref 版本的 src/Beacon.py，作为独立模块导入。"""
+    source = subprocess.run(["git", "show", f"{ref}:src/Beacon.py"],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    path = Path(tempfile.mkdtemp()) / "beacon_ref.py"
+    path.write_text(source, encoding="utf-8")
+    spec = importlib.util.spec_from_file_location("beacon_ref", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_once(module, code: str, repeat: int = 3) -> dict:
+    """返回各阶段的最佳耗时（秒）、峰值内存（MB）与 to_json 结果。"""
+    timings = {"visit": [], "graph": [], "local": [], "program": []}
+    for _ in range(repeat):
+        gc.collect()
+        ext = module.BeaconExtractor(code)
+        t0 = time.perf_counter()
+        ext.visit(ext.tree)
+        t1 = time.perf_counter()
+        # 当前实现在首次访问时把依赖边压缩成 CSR；旧实现这里只是取一个 dict
+        ext.dep_graph
+        tg = time.perf_counter()
+        local = ext.compute_all_local_beacons()
+        t2 = time.perf_counter()
+        program = ext.compute_program_beacons()
+        t3 = time.perf_counter()
+        timings["visit"].append(t1 - t0)
+        timings["graph"].append(tg - t1)
+        timings["local"].append(t2 - tg)
+        timings["program"].append(t3 - t2)
+
+    # 峰值内存单独测一次（tracemalloc 会拖慢计时）
+    gc.collect()
+    ext = module.BeaconExtractor(code)
+    tracemalloc.start()
+    ext.visit(ext.tree)
+    local = ext.compute_all_local_beacons()
+    program = ext.compute_program_beacons()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {phase: min(values) for phase, values in timings.items()}
+    result["peak_mb"] = peak / 1e6
+    result["json"] = ext.to_json(local, program)
+    return result
+
+
+def time_visit(module, code: str, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        ext = module.BeaconExtractor(code)
+        t0 = time.perf_counter()
+        ext.visit(ext.tree)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def depth_scaling(baseline, depths, args) -> None:
+    print(f"{'depth':<8}{'baseline':>12}{'current':>12}{'speedup':>10}{'current/depth':>16}")
+    for depth in depths:
+        code = generate_module(args.funcs, args.stmts, args.fanout, depth, n_globals=args.globals)
+        old = time_visit(baseline, code, args.repeat)
+        new = time_visit(Beacon, code, args.repeat)
+        print(f"{depth:<8}{old * 1e3:>10.1f}ms{new * 1e3:>10.1f}ms{old / max(new, 1e-9):>9.1f}x"
+              f"{new * 1e6 / depth:>14.1f}us")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark BeaconExtractor against a git ref.")
+    parser.add_argument("--funcs", type=int, default=300)
+    parser.add_argument("--stmts", type=int, default=40)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--globals", type=int, default=20, help="number of module-level constants")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--ref", default=None, help="git ref to compare against (default: root commit)")
+    parser.add_argument("--depth-scaling", default=None,
+                        help="comma-separated expression depths, e.g. 10,20,40,80")
+    args = parser.parse_args()
+
+    ref = args.ref or _root_commit()
+    baseline = load_beacon_at(ref)
+
+    if args.depth_scaling:
+        depths = [int(d) for d in args.depth_scaling.split(",")]
+        print(f"[bench] visit vs. expression depth: {args.funcs} functions x {args.stmts} statements; "
+              f"baseline = {ref[:10]}")
+        depth_scaling(baseline, depths, args)
+        return 0
+    code = generate_module(args.funcs, args.stmts, args.fanout, args.depth, n_globals=args.globals)
+    print(f"[bench] synthetic module: {code.count(chr(10))} lines, "
+          f"{args.funcs} functions; baseline = {ref[:10]}")
+
+    old = run_once(baseline, code, args.repeat)
+    new = run_once(Beacon, code, args.repeat)
+
+    print(f"{'phase':<10}{'baseline':>12}{'current':>12}{'speedup':>10}")
+    for phase in ("visit", "graph", "local", "program"):
+        print(f"{phase:<10}{old[phase] * 1e3:>10.1f}ms{new[phase] * 1e3:>10.1f}ms"
+              f"{old[phase] / max(new[phase], 1e-9):>9.1f}x")
+    print(f"{'peak mem':<10}{old['peak_mb']:>10.1f}MB{new['peak_mb']:>10.1f}MB"
+          f"{old['peak_mb'] / max(new['peak_mb'], 1e-9):>9.1f}x")
+
+    same = old["json"] == new["json"]
+    print(f"[bench] to_json identical: {same}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# exp/bench_beacon_background.py
+"""
+coding agent 后处理（_postprocess）的延迟：同步 Beacon 分析 vs. 后台分析（BEACON_BACKGROUND_ENABLED）。
+
+不调用 LLM：把实验结果 / 长期记忆里 coding 回答中的代码块（见 exp/bench_beacon_cache.py），
+以及几段合成的大代码块（其中一段超过 BEACON_MAX_CODE_CHARS）包装成回答文本，
+逐个交给 coding_agent._postprocess，统计：
+- 回答可以返回给用户之前的耗时（同步模式包含 Beacon 分析，后台模式只有提交任务）；
+- 后台模式下补充消息（collect_beacon_followup）到达的时间。
+
+每种模式在独立的子进程中运行（环境变量控制开关，Beacon 缓存互不影响）。
+
+用法（在项目根目录）:
+    python -m exp.bench_beacon_background
+    python -m exp.bench_beacon_background --timeout 0.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+from exp.beacon_synth import generate_module
+from exp.bench_beacon_cache import load_snippets
+
+
+def build_answers() -> List[str]:
+    blocks = list(dict.fromkeys(load_snippets()))
+    blocks += [generate_module(n_funcs=n, stmts_per_func=20, fanout=3, depth=2, n_globals=10, seed=n)
+               for n in (20, 60, 200)]
+    return [f"Here is the fix:\n\n```python\n{code}\n```\n\nLet me know if it helps." for code in blocks]
+
+
+def run_mode(answers: List[str]) -> dict:
+    from src.agents import coding_agent
+    from src.tools import collect_beacon_followup
+
+    answer_ms, followup_ms, skipped = [], [], 0
+    for answer in answers:
+        start = time.perf_counter()
+        state = coding_agent._postprocess({"query": ""}, answer)
+        answer_ms.append((time.perf_counter() - start) * 1e3)
+        job = state.get("beacon_job")
+        text = collect_beacon_followup(job) if job else state["partial_answer"]
+        if job:
+            followup_ms.append((time.perf_counter() - start) * 1e3)
+        if "[Beacon] Skipped" in text or "did not finish" in text:
+            skipped += 1
+    return {"answer_ms": answer_ms, "followup_ms": followup_ms, "skipped": skipped}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Latency of Beacon analysis in the coding agent.")
+    parser.add_argument("--timeout", type=float, default=None, help="BEACON_TIMEOUT for both modes")
+    parser.add_argument("--worker", choices=["sync", "background"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    answers = build_answers()
+    if args.worker:
+        print(json.dumps(run_mode(answers)))
+        return 0
+
+    print(f"[bench] {len(answers)} answers with code blocks "
+          f"({sum(len(a) for a in answers) / 1e3:.0f}k characters)")
+    print(f"{'mode':<12}{'answer p50':>12}{'answer max':>12}{'total':>10}{'follow-up p50':>15}{'skipped':>9}")
+    for mode in ("sync", "background"):
+        env = dict(os.environ, BEACON_BACKGROUND_ENABLED="1" if mode == "background" else "0")
+        if args.timeout is not None:
+            env["BEACON_TIMEOUT"] = str(args.timeout)
+        out = subprocess.run([sys.executable, "-m", "exp.bench_beacon_background", "--worker", mode],
+                             env=env, capture_output=True, text=True, check=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        follow = f"{statistics.median(r['followup_ms']):.1f}ms" if r["followup_ms"] else "-"
+        print(f"{mode:<12}{statistics.median(r['answer_ms']):>10.2f}ms{max(r['answer_ms']):>10.1f}ms"
+              f"{sum(r['answer_ms']):>8.0f}ms{follow:>15}{r['skipped']:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
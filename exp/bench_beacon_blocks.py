@@ -0,0 +1,127 @@
+# exp/bench_beacon_blocks.py
+"""
+多代码块回答的 Beacon 分析基准测试。
+
+生成 --answers 条长回答，每条包含 --blocks 个代码块（合成模块，大小不一；约 1/4 是重复的代码块，
+另有 bash 代码块和说明文字），比较：
+- 代码块提取：旧实现（每次调用重新编译两个正则，只取第一个代码块）vs. _extract_python_blocks
+  （预编译正则，取全部 Python 代码块）；
+- 分析：逐个代码块调用 analyze_source（不去重）vs. BeaconServer.analyze_batch 一次分析一整条回答
+  （按内容去重；inline 与 --workers 个进程两种方式）。每种方式使用新的空缓存。
+
+并检查批量分析的结果与逐个分析的结果一致。
+
+用法（在项目根目录）:
+    python -m exp.bench_beacon_blocks
+    python -m exp.bench_beacon_blocks --answers 40 --blocks 16 --workers 4
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from typing import List
+
+from exp.beacon_synth import generate_module
+from src.agents.coding_agent import _extract_python_blocks
+from src.Beacon import analyze_source
+from src.beacon import BeaconResultCache, BeaconServer
+
+
+def _old_extract_first_python_block(text: str):
+    """改动前 coding_agent 的实现（作为基线）。"""
+    pattern_py = re.compile(r"```python\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+    m = pattern_py.search(text)
+    if m:
+        code = m.group(1).strip()
+        return code if code else None
+    pattern_any = re.compile(r"```(.*?)```", re.DOTALL)
+    m = pattern_any.search(text)
+    if m:
+        code = m.group(1).strip()
+        return code if code else None
+    return None
+
+
+def build_answers(n_answers: int, n_blocks: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    answers = []
+    for a in range(n_answers):
+        parts: List[str] = []
+        seen: List[str] = []
+        for b in range(n_blocks):
+            parts.append("Some explanation of the next step. " * rng.randint(2, 8))
+            if seen and rng.random() < 0.25:
+                code = rng.choice(seen)
+            else:
+                code = generate_module(n_funcs=rng.randint(2, 40), stmts_per_func=rng.randint(5, 30),
+                                       fanout=2, depth=2, n_globals=5, seed=a * 1000 + b)
+                seen.append(code)
+            parts.append(f"```python\n{code}\n```")
+            if rng.random() < 0.3:
+                parts.append("```bash\npip install -r requirements.txt\n```")
+        answers.append("\n\n".join(parts))
+    return answers
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark batched Beacon analysis of multi-block answers.")
+    parser.add_argument("--answers", type=int, default=20)
+    parser.add_argument("--blocks", type=int, default=12, help="code blocks per answer")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    answers = build_answers(args.answers, args.blocks)
+    print(f"[bench] {len(answers)} answers x {args.blocks} code blocks "
+          f"({sum(len(a) for a in answers) / 1e6:.1f}M characters), {args.workers} workers")
+
+    # 1) 提取
+    old_t, _ = timed(lambda: [_old_extract_first_python_block(a) for a in answers])
+    new_t, blocks = timed(lambda: [_extract_python_blocks(a) for a in answers])
+    n_blocks = sum(len(b) for b in blocks)
+    n_unique = sum(len(set(b)) for b in blocks)
+    print(f"[extract] old (first block only): {old_t * 1e6 / len(answers):.0f}us/answer, 1 block; "
+          f"new: {new_t * 1e6 / len(answers):.0f}us/answer, {n_blocks / len(answers):.1f} blocks "
+          f"({n_unique / len(answers):.1f} distinct)")
+
+    # 2) 分析
+    def per_block():
+        return [[analyze_source(code, include_local=False) for code in bs] for bs in blocks]
+
+    def batched(server: BeaconServer):
+        out = []
+        for bs in blocks:
+            responses = server.analyze_batch([{"id": i, "code": code, "include_local": False}
+                                              for i, code in enumerate(bs)])
+            out.append([r["result"] for r in responses])
+        return out
+
+    seq_t, expected = timed(per_block)
+    rows = [("per block, no dedupe", seq_t)]
+    same = True
+    configs = [("batch, inline", 1)]
+    if args.workers > 1:
+        configs.append((f"batch, {args.workers} workers", args.workers))
+    for label, workers in configs:
+        with BeaconServer(workers=workers, cache=BeaconResultCache(max_entries=1 << 14)) as server:
+            t, got = timed(lambda: batched(server))
+        rows.append((label, t))
+        same = same and got == expected
+
+    print(f"{'analysis':<24}{'total':>10}{'per answer':>12}{'speedup':>9}")
+    for label, t in rows:
+        print(f"{label:<24}{t * 1e3:>8.0f}ms{t * 1e3 / len(answers):>10.1f}ms{seq_t / max(t, 1e-9):>8.2f}x")
+    print(f"[bench] batched results identical to per-block analysis: {same}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
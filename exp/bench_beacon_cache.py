@@ -0,0 +1,107 @@
+# exp/bench_beacon_cache.py
+"""
+Beacon 结果缓存的基准测试。
+
+从实验结果（exp/experiment_results.json）和长期记忆（data/memory.json）中
+coding 回答里的 Python 代码块构造工作负载：每个代码块分析 --repeat 次，
+模拟 LLM 在追问中重复给出同一段代码。比较：
+- 不使用缓存；
+- 进程内 LRU 缓存；
+- 磁盘缓存的“冷启动”：新进程（空 LRU）读取上一次运行写入的 SQLite。
+
+同时检查缓存结果与重新分析的结果一致，并打印命中率。
+
+用法（在项目根目录）:
+    python -m exp.bench_beacon_cache
+    python -m exp.bench_beacon_cache --repeat 5
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from src.Beacon import analyze_source
+from src.beacon.cache import BeaconResultCache
+
+ROOT = Path(__file__).resolve().parents[1]
+_CODE_BLOCK_RE = re.compile(r"```(?:python|py)?\s*\n(.*?)```", re.DOTALL | re.IGNORECASE)
+
+
+def load_snippets() -> List[str]:
+    texts: List[str] = []
+    results_path = ROOT / "exp" / "experiment_results.json"
+    if results_path.exists():
+        texts.extend(r.get("final_answer", "") for r in json.loads(results_path.read_text(encoding="utf-8")))
+    memory_path = ROOT / "data" / "memory.json"
+    if memory_path.exists():
+        memory = json.loads(memory_path.read_text(encoding="utf-8"))
+        texts.extend(t.get("content", "") for t in memory.get("history", []) if t.get("role") == "assistant")
+
+    snippets = []
+    for text in texts:
+        for block in _CODE_BLOCK_RE.findall(text):
+            try:
+                compile(block, "<snippet>", "exec")
+            except SyntaxError:
+                continue
+            snippets.append(block)
+    return snippets
+
+
+def run(snippets: List[str], repeat: int, cache) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for code in snippets:
+            analyze_source(code, cache=cache)
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Beacon result cache.")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    snippets = load_snippets()
+    if not snippets:
+        print("[bench] no Python code blocks found in experiment results / memory")
+        return 1
+    total_lines = sum(s.count("\n") + 1 for s in snippets)
+    print(f"[bench] {len(snippets)} code blocks ({len(set(snippets))} distinct, {total_lines} lines), "
+          f"each analyzed {args.repeat} times")
+
+    baseline = run(snippets, args.repeat, None)
+
+    memory_cache = BeaconResultCache()
+    cached = run(snippets, args.repeat, memory_cache)
+    stats = memory_cache.stats()
+    same = all(analyze_source(code, cache=memory_cache) == analyze_source(code) for code in snippets)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "beacon_cache.sqlite")
+        warm = BeaconResultCache(path=db)
+        run(snippets, 1, warm)
+        warm.close()
+        cold = BeaconResultCache(path=db)
+        cold_time = run(snippets, 1, cold)
+        cold_stats = cold.stats()
+        cold.close()
+
+    n = len(snippets) * args.repeat
+    print(f"{'no cache':<22}{baseline * 1e3:>9.1f}ms{baseline * 1e6 / n:>10.0f}us/call")
+    print(f"{'memory LRU':<22}{cached * 1e3:>9.1f}ms{cached * 1e6 / n:>10.0f}us/call"
+          f"   hit rate {stats['hit_rate']:.0%} ({stats['hits']}/{stats['hits'] + stats['misses']})")
+    print(f"{'disk, new process':<22}{cold_time * 1e3:>9.1f}ms{cold_time * 1e6 / len(snippets):>10.0f}us/call"
+          f"   disk hits {cold_stats['disk_hits']}/{len(snippets)}")
+    print(f"[bench] speedup with memory cache: {baseline / max(cached, 1e-9):.1f}x; "
+          f"cached results identical: {same}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
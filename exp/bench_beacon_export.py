@@ -0,0 +1,87 @@
+# exp/bench_beacon_export.py
+"""
+Beacon 结果导出的基准测试：json（to_json + indent=2）vs. 流式 jsonl / binary。
+
+在合成项目（见 exp/beacon_synth.generate_project）上运行 BeaconProject，
+再分别导出三种格式，比较导出耗时、tracemalloc 峰值内存和文件大小；
+同时用 read_records 读回 jsonl / binary，检查两者记录完全相同，
+且 program beacons / call graph 与 to_json 的内容一致。
+
+用法（在项目根目录）:
+    python -m exp.bench_beacon_export
+    python -m exp.bench_beacon_export --files 400 --funcs 30
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+from exp.beacon_synth import generate_project
+from src.beacon.export import export_results, read_records
+from src.beacon.project import BeaconProject
+
+
+def measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+def records_match_json(records, data) -> bool:
+    program = defaultdict(list)
+    calls = defaultdict(list)
+    for r in records:
+        if r["type"] == "program":
+            program[r["entry"]].append({k: r[k] for k in ("module", "func", "line", "code")})
+        elif r["type"] == "call":
+            calls[r["caller"]].append(r["callee"])
+    return program == data["program_beacons"] and calls == data["call_graph"]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Beacon result export formats.")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--funcs", type=int, default=20)
+    parser.add_argument("--stmts", type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_project(tmp, n_files=args.files, n_funcs=args.funcs, stmts_per_func=args.stmts)
+        project = BeaconProject(os.path.join(tmp, "synthpkg"), workers=1).analyze()
+        program = project.compute_program_beacons()
+        print(f"[bench] {len(project.modules)} modules, {len(project.func_ranges)} functions, "
+              f"{sum(len(v) for v in program.values())} program beacons")
+
+        paths = {}
+        print(f"{'format':<10}{'time':>10}{'peak mem':>12}{'size':>12}")
+        for fmt in ("json", "jsonl", "binary"):
+            path = paths[fmt] = os.path.join(tmp, f"beacons.{fmt}")
+            elapsed, peak = measure(lambda: export_results(
+                path, fmt,
+                lambda: project.to_json(project.compute_program_beacons()),
+                project.iter_records,
+                source=project.root,
+            ))
+            size = os.path.getsize(path) / 1e6
+            print(f"{fmt:<10}{elapsed * 1e3:>8.1f}ms{peak:>10.1f}MB{size:>10.2f}MB")
+
+        with open(paths["json"], encoding="utf-8") as f:
+            data = json.load(f)
+        jsonl = list(read_records(paths["jsonl"]))
+        binary = list(read_records(paths["binary"]))
+        same = jsonl == binary and records_match_json(jsonl, data)
+        print(f"[bench] {len(jsonl)} records; jsonl == binary == to_json: {same}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+# exp/bench_beacon_project.py
+"""
+Beacon 项目模式（BeaconProject）的多进程扩展性基准。
+
+生成一个合成包（见 exp/beacon_synth.generate_project），
+分别用 1, 2, 4, ... 个 worker 进程分析，报告耗时与相对单进程的加速比，
+并检查不同 worker 数得到的程序级 beacon 与调用图完全一致。
+
+用法（在项目根目录）:
+    python -m exp.bench_beacon_project --files 1000
+    python -m exp.bench_beacon_project --files 2000 --workers 1,2,4,8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from exp.beacon_synth import generate_project
+from src.beacon.project import BeaconProject
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Beacon project mode scaling.")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--funcs", type=int, default=20)
+    parser.add_argument("--stmts", type=int, default=15)
+    parser.add_argument("--workers", default=None, help="comma-separated worker counts")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    if args.workers:
+        worker_counts = [int(w) for w in args.workers.split(",")]
+    else:
+        worker_counts = sorted({1, *(w for w in (2, 4, 8, 16, 32) if w <= cpus), cpus})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        n = generate_project(tmp, n_files=args.files, n_funcs=args.funcs, stmts_per_func=args.stmts)
+        print(f"[bench] synthetic project: {n} files, {cpus} CPUs")
+
+        reference = None
+        base_time = None
+        print(f"{'workers':<10}{'time':>10}{'files/s':>10}{'speedup':>10}")
+        for workers in worker_counts:
+            start = time.perf_counter()
+            project = BeaconProject(os.path.join(tmp, "synthpkg"), workers=workers).analyze()
+            program = project.compute_program_beacons()
+            elapsed = time.perf_counter() - start
+
+            result = project.to_json(program)
+            if reference is None:
+                reference, base_time = result, elapsed
+            elif result != reference:
+                print(f"[bench] results with {workers} workers differ from 1 worker")
+                return 1
+            print(f"{workers:<10}{elapsed:>9.2f}s{n / elapsed:>10.0f}{base_time / elapsed:>9.2f}x")
+
+        edges = sum(len(v) for v in reference["call_graph"].values())
+        print(f"[bench] {len(reference['modules'])} modules, {edges} call edges, "
+              f"{len(reference['program_beacons'])} entries; results identical across worker counts")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
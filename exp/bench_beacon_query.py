@@ -0,0 +1,73 @@
+# exp/bench_beacon_query.py
+"""
+按入口查询 Beacon 的基准测试：惰性（beacons_for_entry）vs. 先算全部函数。
+
+对合成模块（见 exp/beacon_synth.py）中的若干入口函数：
+- eager：compute_all_local_beacons 后再取该入口的 program beacons（旧的调用方式）；
+- lazy：只调用 beacons_for_entry，仅计算从入口可达的函数的闭包。
+两者都不计 visit 的时间（visit 单独列出），并检查结果完全相同。
+
+用法（在项目根目录）:
+    python -m exp.bench_beacon_query
+    python -m exp.bench_beacon_query --funcs 600 --entries func_3,func_300,main
+"""
+
+import argparse
+import sys
+import time
+
+from exp.beacon_synth import generate_module
+from src.Beacon import BeaconExtractor
+
+
+def visited(code: str) -> BeaconExtractor:
+    ext = BeaconExtractor(code)
+    ext.visit(ext.tree)
+    ext.dep_graph  # CSR 构建也不计入查询时间
+    return ext
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark lazy per-entry Beacon queries.")
+    parser.add_argument("--funcs", type=int, default=400)
+    parser.add_argument("--stmts", type=int, default=30)
+    parser.add_argument("--entries", default=None, help="comma-separated entry functions")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    code = generate_module(args.funcs, args.stmts, fanout=3, depth=2, n_globals=20)
+    entries = (args.entries.split(",") if args.entries else
+               ["func_1", f"func_{args.funcs // 20}", f"func_{args.funcs // 4}", "main"])
+
+    t0 = time.perf_counter()
+    visited(code)
+    print(f"[bench] {code.count(chr(10))} lines, {args.funcs} functions; "
+          f"visit + graph {(time.perf_counter() - t0) * 1e3:.1f}ms (not included below)")
+    print(f"{'entry':<12}{'reachable':>10}{'eager':>12}{'lazy':>12}{'speedup':>10}")
+
+    ok = True
+    for entry in entries:
+        eager_best = lazy_best = float("inf")
+        for _ in range(args.repeat):
+            ext = visited(code)
+            t0 = time.perf_counter()
+            ext.compute_all_local_beacons()
+            expected = ext.compute_program_beacons(explicit_entry=entry)
+            eager_best = min(eager_best, time.perf_counter() - t0)
+
+            ext = visited(code)
+            t0 = time.perf_counter()
+            got = ext.beacons_for_entry(entry)
+            lazy_best = min(lazy_best, time.perf_counter() - t0)
+
+        ok = ok and expected == {entry: got}
+        reachable = len(ext.reachable_functions_from(entry))
+        print(f"{entry:<12}{reachable:>10}{eager_best * 1e3:>10.1f}ms{lazy_best * 1e3:>10.1f}ms"
+              f"{eager_best / max(lazy_best, 1e-9):>9.1f}x")
+
+    print(f"[bench] lazy results identical to eager: {ok}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
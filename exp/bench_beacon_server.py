@@ -0,0 +1,141 @@
+# exp/bench_beacon_server.py
+"""
+Beacon 服务模式（BeaconServer，`Beacon.py --serve`）的基准测试。
+
+工作负载：实验结果 / 长期记忆里的 Python 代码块（见 exp/bench_beacon_cache.py），
+再用 exp/beacon_synth.py 生成若干互不相同的小模块，凑够 --count 个片段。比较：
+- 每个片段启动一次 CLI（`python src/Beacon.py file.py --json out.json`，只测前 --cli 个）；
+- 一个常驻的 `--serve` 进程，每行一个请求，逐个等待响应（单请求延迟 p50 / p95）；
+- 同一个进程，每行一批 --batch 个请求（批量吞吐，批内交给进程池）；
+- 同一批片段再发一遍（结果缓存命中）。
+
+并检查服务返回的结果与进程内 analyze_source 的结果完全一致。
+
+用法（在项目根目录）:
+    python -m exp.bench_beacon_server
+    python -m exp.bench_beacon_server --count 3000 --batch 128 --workers 4
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from exp.beacon_synth import generate_module
+from exp.bench_beacon_cache import ROOT, load_snippets
+from src.Beacon import analyze_source
+
+BEACON = str(ROOT / "src" / "Beacon.py")
+
+
+def build_workload(count: int) -> List[str]:
+    snippets = list(dict.fromkeys(load_snippets()))[:count]
+    seed = 0
+    while len(snippets) < count:
+        snippets.append(generate_module(n_funcs=3 + seed % 10, stmts_per_func=5 + seed % 11,
+                                        fanout=2, depth=2, n_globals=3, seed=seed))
+        seed += 1
+    return snippets
+
+
+def bench_cli(snippets: List[str]) -> float:
+    """每个片段一个新进程；返回平均耗时（秒）。"""
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        for i, code in enumerate(snippets):
+            path = os.path.join(tmp, f"snippet_{i}.py")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(code)
+            subprocess.run([sys.executable, BEACON, path, "--json", path + ".json"],
+                           stdout=subprocess.DEVNULL, check=True)
+        return (time.perf_counter() - start) / max(1, len(snippets))
+
+
+class ServerProcess:
+    def __init__(self, workers: int):
+        self.proc = subprocess.Popen([sys.executable, BEACON, "--serve", "--workers", str(workers)],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+                                     encoding="utf-8")
+
+    def send(self, payload) -> List[Dict]:
+        self.proc.stdin.write(json.dumps(payload) + "\n")
+        self.proc.stdin.flush()
+        n = len(payload) if isinstance(payload, list) else 1
+        return [json.loads(self.proc.stdout.readline()) for _ in range(n)]
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Beacon server mode.")
+    parser.add_argument("--count", type=int, default=2000, help="number of snippets")
+    parser.add_argument("--batch", type=int, default=64, help="requests per line in batch mode")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--cli", type=int, default=20, help="snippets timed through the CLI")
+    args = parser.parse_args()
+
+    snippets = build_workload(args.count)
+    lines = sum(s.count("\n") + 1 for s in snippets)
+    print(f"[bench] {len(snippets)} snippets ({lines} lines), {args.workers} workers")
+
+    cli = bench_cli(snippets[:args.cli])
+
+    # 逐个请求：单请求延迟
+    server = ServerProcess(args.workers)
+    server.send({"id": "warmup", "code": "x = 1"})
+    latencies = []
+    single: List[Dict] = []
+    start = time.perf_counter()
+    for i, code in enumerate(snippets):
+        t0 = time.perf_counter()
+        single.extend(server.send({"id": i, "code": code}))
+        latencies.append(time.perf_counter() - t0)
+    single_time = time.perf_counter() - start
+    server.close()
+
+    # 批量请求（新进程，缓存为空），然后同一批再发一遍（缓存命中）
+    server = ServerProcess(args.workers)
+    batched: List[Dict] = []
+    start = time.perf_counter()
+    for lo in range(0, len(snippets), args.batch):
+        batch = [{"id": i, "code": snippets[i]} for i in range(lo, min(lo + args.batch, len(snippets)))]
+        batched.extend(server.send(batch))
+    batch_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for lo in range(0, len(snippets), args.batch):
+        server.send([{"id": i, "code": snippets[i]} for i in range(lo, min(lo + args.batch, len(snippets)))])
+    cached_time = time.perf_counter() - start
+    stats = server.send({"op": "stats"})[0]["stats"]
+    server.close()
+
+    expected = []
+    for code in snippets:
+        try:
+            expected.append(json.loads(json.dumps(analyze_source(code))))
+        except (SyntaxError, ValueError, RecursionError):
+            expected.append(None)
+    same = all(r.get("result") == e for r, e in zip(single, expected)) and \
+        all(r.get("result") == e for r, e in zip(batched, expected))
+
+    n = len(snippets)
+    ms = sorted(t * 1e3 for t in latencies)
+    print(f"{'mode':<24}{'per snippet':>12}{'snippets/min':>14}")
+    print(f"{'CLI process each':<24}{cli * 1e3:>10.1f}ms{60 / cli:>14.0f}")
+    print(f"{'server, one per line':<24}{single_time * 1e3 / n:>10.2f}ms{60 * n / single_time:>14.0f}"
+          f"   p50 {statistics.median(ms):.2f}ms, p95 {ms[int(len(ms) * 0.95) - 1]:.2f}ms")
+    print(f"{f'server, batch {args.batch}':<24}{batch_time * 1e3 / n:>10.2f}ms{60 * n / batch_time:>14.0f}")
+    print(f"{'server, cached':<24}{cached_time * 1e3 / n:>10.2f}ms{60 * n / cached_time:>14.0f}"
+          f"   cache hit rate {stats['cache']['hit_rate']:.0%}")
+    print(f"[bench] server results identical to analyze_source: {same}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
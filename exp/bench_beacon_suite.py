@@ -0,0 +1,244 @@
+# exp/bench_beacon_suite.py
+"""
+BeaconExtractor 基准测试 / 性能剖析套件。
+
+用 exp/beacon_synth.generate_module 生成一组合成模块（按函数个数、每个函数的语句数、
+调用扇出、表达式深度参数化，见 CASES；rich 用例用 generate_rich_module 生成类、方法、
+增量赋值、推导式、生成器和 async 函数），对每个用例分阶段计时：
+    parse（ast.parse） / visit / graph（CSR 构建） / local（compute_all_local_beacons）
+    / program（compute_program_beacons） / to_json
+每个阶段重复 --repeat 次，记录最小值和中位数；峰值内存用 tracemalloc 单独测一次。
+
+结果以 JSON Lines 追加到 --out（每个用例一条记录，含 git commit、时间、Python 版本、
+模块规模等），可以在不同提交之间累积。--compare 把本次结果与文件中另一个提交的
+同名用例对比，任一阶段变慢超过 --threshold 倍时以退出码 1 结束，便于在 CI 中发现回归。
+
+--profile CASE 对指定用例的完整流程跑 cProfile，打印最耗时的函数并保存 .pstats 文件。
+
+用法（在项目根目录）:
+    python -m exp.bench_beacon_suite
+    python -m exp.bench_beacon_suite --cases small,deep_exprs --repeat 5
+    python -m exp.bench_beacon_suite --compare HEAD~1 --threshold 1.2
+    python -m exp.bench_beacon_suite --profile high_fanout
+"""
+
+import argparse
+import cProfile
+import gc
+import json
+import platform
+import pstats
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from exp.beacon_synth import generate_module, generate_rich_module
+from src.Beacon import BeaconExtractor
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_OUT = ROOT / "exp" / "beacon_bench_results.jsonl"
+PHASES = ("parse", "visit", "graph", "local", "program", "to_json")
+
+# 用例名 -> generate_module 参数
+CASES: Dict[str, Dict[str, int]] = {
+    "small": dict(n_funcs=50, stmts_per_func=20, fanout=3, depth=2, n_globals=10),
+    "many_funcs": dict(n_funcs=600, stmts_per_func=20, fanout=3, depth=2, n_globals=20),
+    "long_funcs": dict(n_funcs=40, stmts_per_func=400, fanout=3, depth=2, n_globals=20),
+    "high_fanout": dict(n_funcs=300, stmts_per_func=30, fanout=12, depth=2, n_globals=20),
+    "deep_exprs": dict(n_funcs=100, stmts_per_func=20, fanout=3, depth=40, n_globals=20),
+    "many_globals": dict(n_funcs=200, stmts_per_func=20, fanout=3, depth=2, n_globals=2000),
+    "rich": dict(n_classes=120, methods_per_class=8, stmts_per_method=15, n_funcs=150),
+}
+
+
+def case_source(name: str) -> str:
+    params = CASES[name]
+    if name == "rich":
+        return generate_rich_module(**params)
+    return generate_module(**params)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    commit = out.stdout.strip()
+    dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                           capture_output=True, text=True).stdout.strip()
+    return commit + ("-dirty" if dirty else "")
+
+
+def resolve_commit(ref: str) -> str:
+    out = subprocess.run(["git", "rev-parse", ref], cwd=ROOT, capture_output=True, text=True)
+    return out.stdout.strip() or ref
+
+
+def run_pipeline(code: str) -> Dict[str, float]:
+    """一次完整流程，返回各阶段耗时（秒）。"""
+    times: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    ext = BeaconExtractor(code)
+    t1 = time.perf_counter()
+    ext.visit(ext.tree)
+    t2 = time.perf_counter()
+    ext.dep_graph
+    t3 = time.perf_counter()
+    local = ext.compute_all_local_beacons()
+    t4 = time.perf_counter()
+    program = ext.compute_program_beacons()
+    t5 = time.perf_counter()
+    json.dumps(ext.to_json(local, program), ensure_ascii=False)
+    t6 = time.perf_counter()
+    for phase, (a, b) in zip(PHASES, ((t0, t1), (t1, t2), (t2, t3), (t3, t4), (t4, t5), (t5, t6))):
+        times[phase] = b - a
+    return times
+
+
+def peak_memory(code: str) -> float:
+    gc.collect()
+    tracemalloc.start()
+    ext = BeaconExtractor(code)
+    ext.visit(ext.tree)
+    local = ext.compute_all_local_beacons()
+    program = ext.compute_program_beacons()
+    ext.to_json(local, program)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def bench_case(name: str, params: Dict[str, int], repeat: int) -> Dict:
+    code = case_source(name)
+    samples: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    for _ in range(repeat):
+        gc.collect()
+        for phase, value in run_pipeline(code).items():
+            samples[phase].append(value)
+
+    ext = BeaconExtractor(code)
+    ext.visit(ext.tree)
+    return {
+        "case": name,
+        "params": params,
+        "lines": code.count("\n") + 1,
+        "nodes": len(ext.nodes),
+        "edges": len(ext.dep_graph.indices),
+        "repeat": repeat,
+        "min_ms": {p: round(min(v) * 1e3, 3) for p, v in samples.items()},
+        "median_ms": {p: round(statistics.median(v) * 1e3, 3) for p, v in samples.items()},
+        "total_ms": round(sum(min(v) for v in samples.values()) * 1e3, 3),
+        "peak_mb": round(peak_memory(code), 3),
+    }
+
+
+def load_results(path: Path) -> List[Dict]:
+    if not path.exists():
+        return []
+    with path.open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(records: List[Dict], previous: List[Dict], baseline: str, threshold: float) -> bool:
+    """打印本次结果相对 baseline 提交的比值；返回是否没有超过阈值的回归。"""
+    old = {}
+    for r in previous:
+        if r.get("commit", "").startswith(baseline):
+            old[r["case"]] = r  # 同一提交多次运行时取最后一次
+    if not old:
+        print(f"[compare] no results for {baseline[:10]} in the results file")
+        return True
+
+    ok = True
+    print(f"\n[compare] current / {baseline[:10]} (min time; > {threshold:.2f} is flagged)")
+    print(f"{'case':<14}" + "".join(f"{p:>10}" for p in PHASES) + f"{'peak mem':>10}")
+    for r in records:
+        o = old.get(r["case"])
+        if o is None:
+            continue
+        cells = []
+        for p in PHASES:
+            ratio = r["min_ms"][p] / max(o["min_ms"][p], 1e-3)
+            # 小于 1ms 的阶段噪声太大，不参与判定
+            flagged = ratio > threshold and r["min_ms"][p] > 1.0
+            ok = ok and not flagged
+            cells.append(f"{ratio:>9.2f}{'!' if flagged else ' '}")
+        mem = r["peak_mb"] / max(o["peak_mb"], 1e-3)
+        ok = ok and mem <= threshold
+        cells.append(f"{mem:>9.2f}{'!' if mem > threshold else ' '}")
+        print(f"{r['case']:<14}" + "".join(cells))
+    return ok
+
+
+def profile_case(name: str, top: int):
+    code = case_source(name)
+    out = ROOT / "exp" / f"beacon_profile_{name}.pstats"
+    profiler = cProfile.Profile()
+    profiler.enable()
+    run_pipeline(code)
+    profiler.disable()
+    profiler.dump_stats(out)
+    print(f"[profile] {name}: {code.count(chr(10))} lines; stats saved to {out}")
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark / profiling suite for BeaconExtractor.")
+    parser.add_argument("--cases", default=",".join(CASES), help="comma-separated case names")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default=str(DEFAULT_OUT), help="JSONL file results are appended to")
+    parser.add_argument("--no-save", action="store_true", help="do not append results to --out")
+    parser.add_argument("--compare", default=None, help="git ref whose saved results to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="regression threshold (ratio)")
+    parser.add_argument("--profile", default=None, help="profile one case with cProfile instead")
+    parser.add_argument("--top", type=int, default=25, help="functions shown with --profile")
+    args = parser.parse_args()
+
+    if args.profile:
+        if args.profile not in CASES:
+            parser.error(f"unknown case {args.profile!r}; choose from {', '.join(CASES)}")
+        profile_case(args.profile, args.top)
+        return 0
+
+    names = [n for n in args.cases.split(",") if n]
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    out = Path(args.out)
+    previous = load_results(out)
+    meta = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+
+    print(f"{'case':<14}{'lines':>7}{'nodes':>9}" + "".join(f"{p:>10}" for p in PHASES) + f"{'peak':>9}")
+    records = []
+    for name in names:
+        record = dict(meta, **bench_case(name, CASES[name], args.repeat))
+        records.append(record)
+        print(f"{name:<14}{record['lines']:>7}{record['nodes']:>9}"
+              + "".join(f"{record['min_ms'][p]:>8.1f}ms" for p in PHASES)
+              + f"{record['peak_mb']:>7.1f}MB")
+
+    if not args.no_save:
+        with out.open("a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"[bench] {len(records)} results appended to {out}")
+
+    if args.compare:
+        return 0 if compare(records, previous, resolve_commit(args.compare), args.threshold) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
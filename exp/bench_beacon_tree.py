@@ -0,0 +1,133 @@
+# exp/bench_beacon_tree.py
+"""
+Beacon Tree 渲染的基准测试：当前的迭代实现 vs. 某个 git 版本（默认 HEAD）中的实现。
+
+用 exp/beacon_synth.py 生成每个函数有上千条语句的模块，以 full 模式、不限制每个函数的
+beacon 个数（--max-per-func）计算 program beacons，使 Beacon Tree 覆盖函数里的大部分语句，
+然后分别计时：
+- baseline 的 print_program_beacon_tree（逐行 print，递归展开；依赖链过深时会 RecursionError）；
+- 当前实现输出到同一个 StringIO 的文本（并检查与 baseline 的输出完全一致）；
+- 当前实现的 JSON / DOT 输出，以及带深度 / 宽度限制的文本输出。
+另外用一条 --chain 长的赋值依赖链（x1 = x0 + 1; x2 = x1 + 1; ...）检查两边能否渲染
+深度等于链长的树。
+
+用法（在项目根目录）:
+    python -m exp.bench_beacon_tree
+    python -m exp.bench_beacon_tree --funcs 4 --stmts 5000 --ref <commit>
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+
+from exp.beacon_synth import generate_module
+from exp.bench_beacon import load_beacon_at
+from src import Beacon
+
+
+def analyzed(module, code: str, max_per_func: int):
+    ext = module.BeaconExtractor(code)
+    ext.visit(ext.tree)
+    return ext, ext.compute_program_beacons(max_per_func=max_per_func, mode="full")
+
+
+def timed(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def print_tree(ext, program) -> str:
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        ext.print_program_beacon_tree(program)
+    return buf.getvalue()
+
+
+def chain_module(length: int) -> str:
+    body = ["def main(x0):"] + [f"    x{i} = x{i - 1} + 1" for i in range(1, length + 1)]
+    return "\n".join(body + [f"    return x{length}", ""])
+
+
+def check_chain(baseline, length: int):
+    code = chain_module(length)
+    for label, module in (("baseline", baseline), ("current", Beacon)):
+        ext, program = analyzed(module, code, length + 10)
+        try:
+            t0 = time.perf_counter()
+            text = print_tree(ext, program)
+            print(f"[chain] {label}: {length}-deep tree rendered in "
+                  f"{(time.perf_counter() - t0) * 1e3:.1f}ms, {text.count(chr(10))} lines")
+        except RecursionError:
+            print(f"[chain] {label}: RecursionError on a {length}-deep tree")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Beacon Tree rendering.")
+    parser.add_argument("--funcs", type=int, default=6)
+    parser.add_argument("--stmts", type=int, default=3000, help="statements per function")
+    parser.add_argument("--max-per-func", type=int, default=10 ** 6)
+    parser.add_argument("--ref", default="HEAD", help="git ref of the baseline implementation")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chain", type=int, default=5000, help="length of the dependency chain case")
+    args = parser.parse_args()
+
+    code = generate_module(args.funcs, args.stmts, fanout=3, depth=2, n_globals=20)
+    baseline = load_beacon_at(args.ref)
+    print(f"[bench] synthetic module: {code.count(chr(10))} lines, {args.funcs} functions "
+          f"x {args.stmts} statements; baseline = {args.ref}")
+
+    old_ext, old_program = analyzed(baseline, code, args.max_per_func)
+    ext, program = analyzed(Beacon, code, args.max_per_func)
+    n_nodes = sum(len(nodes) for nodes in program.values())
+
+    # 基线实现递归展开，放宽递归深度限制后再测（否则长依赖链直接 RecursionError）
+    limit = sys.getrecursionlimit()
+    try:
+        old_time, old_text = timed(lambda: print_tree(old_ext, old_program), args.repeat)
+    except RecursionError:
+        sys.setrecursionlimit(max(limit, 20 * args.stmts))
+        try:
+            old_time, old_text = timed(lambda: print_tree(old_ext, old_program), args.repeat)
+        except RecursionError:
+            old_time, old_text = None, None
+        print(f"[bench] baseline hit the recursion limit ({limit}) and needed a higher one")
+    finally:
+        sys.setrecursionlimit(limit)
+
+    def render(fmt="text", **limits):
+        buf = io.StringIO()
+        ext.write_program_beacon_tree(program, buf, fmt=fmt, **limits)
+        return buf.getvalue()
+
+    rows = [("baseline text", old_time, old_text)]
+    new_time, new_text = timed(lambda: print_tree(ext, program), args.repeat)
+    rows.append(("text", new_time, new_text))
+    for label, fmt, limits in (("json", "json", {}), ("dot", "dot", {}),
+                               ("text depth<=8", "text", {"max_depth": 8}),
+                               ("text width<=2", "text", {"max_children": 2})):
+        rows.append((label, *timed(lambda: render(fmt, **limits), args.repeat)))
+
+    print(f"[bench] {n_nodes} beacon nodes in the tree")
+    print(f"{'output':<18}{'time':>10}{'lines':>9}{'size':>10}")
+    for label, seconds, text in rows:
+        if seconds is None:
+            print(f"{label:<18}{'failed':>10}")
+            continue
+        print(f"{label:<18}{seconds * 1e3:>8.1f}ms{text.count(chr(10)):>9}{len(text) / 1e6:>8.2f}MB")
+
+    check_chain(baseline, args.chain)
+
+    same = old_text is None or old_text == new_text
+    if old_time is not None:
+        print(f"[bench] text speedup: {old_time / max(new_time, 1e-9):.1f}x; identical to baseline: {same}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+# exp/bench_graph_parallel.py
+"""
+图结构的端到端延迟：串行（router → memory_load → 专家）vs. 并行（router ∥ memory_load）
+vs. 并行 + 投机执行（SPECULATIVE_ROUTING_ENABLED）。
+
+不连接 vLLM：router 与各专家节点的 llm 换成按固定延迟返回的 LatencyChatModel
+（--router-ms / --specialist-ms，专家回答分 --chunks 个 chunk 流式返回），
+Router 的分类结果由下面 QUERIES 中的标签给出。memory_load / memory_update 使用真实的
+MemoryManager（临时目录，预先写入 --history 轮历史），可以再用 --memory-ms 给每次
+记忆加载附加一段模拟的存储延迟（例如远程存储）。
+
+QUERIES 都是本地快速路由无法高置信度命中、需要调用 LLM Router 的问题；
+其中一部分的快速路由猜测与标签不同，用来观察投机执行被取消时的开销。
+每种图结构在同一进程中依次运行（与 CLI 一样经 stream_graph 流式运行），每条 query 取 --repeat 次的
+中位数，并检查三种结构的回答一致、每条回答都有 token 流式推出（投机命中时由 token_writer 补发）。
+
+用法（在项目根目录）:
+    python -m exp.bench_graph_parallel
+    python -m exp.bench_graph_parallel --router-ms 500 --specialist-ms 2000 --memory-ms 50
+"""
+
+import argparse
+import asyncio
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langgraph.graph import StateGraph, END
+
+from src import graph_builder, tools
+from src.agents import (coding_agent, general_agent, memory_agent, planner_agent,
+                        router_agent, theory_agent)
+from src.memory_manager import MemoryManager
+from src.memory_store import MemoryStore
+from src.run_cli import build_initial_state
+from src.speculation import speculation_stats
+from src.state import AgentState
+from src.streaming import stream_graph
+
+# (query, Router 给出的标签)
+QUERIES = [
+    ("How do I fix this pandas merge that drops rows?", "coding"),
+    ("Explain the intuition behind policy gradient methods", "theory"),
+    ("What is a Markov decision process?", "theory"),
+    ("Compare PPO versus DQN for sparse rewards", "theory"),
+    ("Give me a 4-week plan to learn reinforcement learning", "planning"),
+    ("What's the best way to take notes in lectures?", "general"),
+    ("Can you help me organize my week before the exam?", "planning"),
+    ("My training loop is slow, any tips?", "coding"),
+    ("I keep procrastinating, what should I do?", "general"),
+    ("Why does my LangGraph node run twice?", "coding"),
+]
+LABELS = dict(QUERIES)
+
+_SAVED_NOTE_RE = re.compile(r"\n\n_\(Saved as markdown note: .*?\)_")
+
+
+class LatencyChatModel(BaseChatModel):
+    """按固定延迟返回文本的 chat model，模拟一次 vLLM 往返。"""
+
+    name: str = "latency"
+    latency: float = 0.3
+    chunks: int = 1
+    router: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "latency"
+
+    def _reply(self, messages) -> str:
+        text = messages[-1].content
+        if self.router:
+            return LABELS.get(text, "general")
+        return f"[{self.name}] answer for: {text.splitlines()[1] if chr(10) in text else text}"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    def _pieces(self, messages) -> List[str]:
+        text = self._reply(messages)
+        step = max(1, -(-len(text) // self.chunks))
+        return [text[i:i + step] for i in range(0, len(text), step)]
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        pieces = self._pieces(messages)
+        for piece in pieces:
+            time.sleep(self.latency / len(pieces))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        pieces = self._pieces(messages)
+        for piece in pieces:
+            await asyncio.sleep(self.latency / len(pieces))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+
+def build_serial_graph():
+    """改动前的串行结构（作为基线）：router → memory_load → 专家 → memory_update → output。"""
+    dual = graph_builder._dual
+    graph = StateGraph(AgentState)
+    graph.add_node("router", dual(router_agent.router_node, router_agent.arouter_node))
+    graph.add_node("memory_load", dual(memory_agent.memory_load_node, memory_agent.amemory_load_node))
+    graph.add_node("theory", dual(theory_agent.theory_node, theory_agent.atheory_node))
+    graph.add_node("coding", dual(coding_agent.coding_node, coding_agent.acoding_node))
+    graph.add_node("planning", dual(planner_agent.planner_node, planner_agent.aplanner_node))
+    graph.add_node("general", dual(general_agent.general_node, general_agent.ageneral_node))
+    graph.add_node("memory_update", dual(memory_agent.memory_update_node, memory_agent.amemory_update_node))
+    graph.add_node("output", graph_builder.output_node)
+    graph.set_entry_point("router")
+    graph.add_edge("router", "memory_load")
+    graph.add_conditional_edges("memory_load", graph_builder.route_selector,
+                                {r: r for r in ("theory", "coding", "planning", "general")})
+    for name in ("theory", "coding", "planning", "general"):
+        graph.add_edge(name, "memory_update")
+    graph.add_edge("memory_update", "output")
+    graph.add_edge("output", END)
+    return graph.compile()
+
+
+def setup(args, workdir: Path) -> None:
+    """替换 llm、把长期记忆指向临时目录，并冻结快速路由模型（各结构看到同样的猜测）。"""
+    router_agent.llm = LatencyChatModel(name="router", latency=args.router_ms / 1e3, router=True)
+    for module, name in ((theory_agent, "theory"), (coding_agent, "coding"),
+                         (planner_agent, "planning"), (general_agent, "general")):
+        module.llm = LatencyChatModel(name=name, latency=args.specialist_ms / 1e3, chunks=args.chunks)
+    # theory 节点把回答保存为笔记：写到临时目录（base_dir 为绝对路径时不会拼到项目根目录下）
+    theory_agent.save_markdown_note = lambda title, content, base_dir="notes": tools.save_markdown_note(
+        title, content, base_dir=str(workdir / "notes"))
+
+    manager = MemoryManager(MemoryStore(workdir / "data"), max_history=memory_agent.MAX_HISTORY,
+                            flush_interval=memory_agent.FLUSH_INTERVAL)
+    manager.append_turns([{"role": "user" if i % 2 == 0 else "assistant",
+                           "content": f"earlier turn {i} about reinforcement learning and pandas"}
+                          for i in range(args.history)])
+    memory_agent._manager = manager
+    # 快速路由在第一次使用时用（临时目录里的）历史训练
+    router_agent._get_fast_router().retrain_every = 10 ** 9
+
+    if args.memory_ms > 0:
+        snapshot = manager.snapshot
+
+        def slow_snapshot(*a, **kw):
+            time.sleep(args.memory_ms / 1e3)
+            return snapshot(*a, **kw)
+
+        manager.snapshot = slow_snapshot
+
+
+def run(app, repeat: int) -> Dict[str, Dict[str, Any]]:
+    out = {}
+    for query, _ in QUERIES:
+        times, ttfts, state, streamed = [], [], None, []
+        for _ in range(repeat):
+            streamed = []
+            state, ttft, total = stream_graph(app, build_initial_state(query), streamed.append)
+            times.append(total)
+            ttfts.append(ttft if ttft is not None else total)
+        # 笔记文件名带时间戳，比较回答时去掉这一行
+        answer = _SAVED_NOTE_RE.sub("", state.get("final_answer") or "")
+        text = "".join(streamed)
+        out[query] = {"ms": statistics.median(times) * 1e3, "ttft_ms": statistics.median(ttfts) * 1e3,
+                      "answer": answer, "streamed": bool(text) and answer.startswith(text),
+                      "tool_calls": state.get("tool_calls", [])}
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Latency of the serial vs. parallel agent graph.")
+    parser.add_argument("--router-ms", type=float, default=300.0)
+    parser.add_argument("--specialist-ms", type=float, default=1000.0)
+    parser.add_argument("--chunks", type=int, default=20, help="streamed chunks per specialist answer")
+    parser.add_argument("--memory-ms", type=float, default=0.0, help="extra simulated latency per memory load")
+    parser.add_argument("--history", type=int, default=200, help="turns of history in the memory store")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_graph_"))
+    setup(args, workdir)
+
+    t0 = time.perf_counter()
+    memory_agent.memory_load_node(build_initial_state(QUERIES[0][0]))
+    load_ms = (time.perf_counter() - t0) * 1e3
+    print(f"[bench] {len(QUERIES)} queries; router {args.router_ms:.0f}ms, specialist "
+          f"{args.specialist_ms:.0f}ms, memory_load {load_ms:.1f}ms ({args.history} turns of history)")
+
+    results = {"serial": run(build_serial_graph(), args.repeat),
+               "parallel": run(graph_builder.build_graph(), args.repeat)}
+    graph_builder.SPECULATIVE_ROUTING_ENABLED = True
+    results["speculative"] = run(graph_builder.build_graph(), args.repeat)
+
+    print(f"{'query':<50}{'route':>9}{'guess':>10}{'serial':>9}{'parallel':>10}{'specul.':>9}")
+    for query, label in QUERIES:
+        guess = router_agent._get_fast_router().guess(query)
+        guess_text = f"{guess[0]}" if guess else "-"
+        print(f"{query[:48]:<50}{label:>9}{guess_text:>10}"
+              + "".join(f"{results[m][query]['ms']:>8.0f}ms" for m in ("serial", "parallel"))
+              + f"{results['speculative'][query]['ms']:>7.0f}ms")
+
+    means = {m: statistics.mean(r["ms"] for r in results[m].values()) for m in results}
+    ttfts = {m: statistics.mean(r["ttft_ms"] for r in results[m].values()) for m in results}
+    for mode in ("parallel", "speculative"):
+        print(f"[bench] {mode:<12} mean {means[mode]:.0f}ms vs serial {means['serial']:.0f}ms: "
+              f"{means['serial'] - means[mode]:+.0f}ms per query saved ({1 - means[mode] / means['serial']:.0%}); "
+              f"first token {ttfts[mode]:.0f}ms vs {ttfts['serial']:.0f}ms")
+    print(f"[bench] speculation: {speculation_stats()}")
+
+    same = all(results[m][q]["answer"] == results["serial"][q]["answer"]
+               for m in ("parallel", "speculative") for q, _ in QUERIES)
+    streamed = all(r["streamed"] for m in results for r in results[m].values())
+    print(f"[bench] answers identical across graph structures: {same}")
+    print(f"[bench] every answer streamed token by token: {streamed}")
+    return 0 if same and streamed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# exp/bench_notes_lookup.py
+"""
+笔记检索延迟的基准测试。
+
+在临时目录中生成 --notes 篇 markdown 笔记（词表取自实验结果和长期记忆里的回答，
+缺失时使用合成词表），建立 NotesIndex 后：
+- 对 --queries 条查询分别测 bm25 / embedding / hybrid 三种模式的 p50 / p99 延迟，
+  检查 bm25 查询是否达到亚毫秒目标；
+- 通过 save_markdown_note 追加笔记，测增量加入索引的耗时，并与整体重建对比；
+- 校验保存到索引根目录之外的笔记不会进入索引。
+
+用法（在项目根目录）:
+    python -m exp.bench_notes_lookup
+    python -m exp.bench_notes_lookup --notes 5000 --queries 500
+"""
+
+import argparse
+import json
+import random
+import re
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from src import retrieval
+from src.retrieval import NotesIndex, get_notes_index
+from src.tools import save_markdown_note
+
+ROOT = Path(__file__).resolve().parents[1]
+TARGET_MS = 1.0
+
+
+def load_vocabulary() -> List[str]:
+    texts: List[str] = []
+    results_path = ROOT / "exp" / "experiment_results.json"
+    if results_path.exists():
+        texts.extend(r.get("final_answer", "") for r in json.loads(results_path.read_text(encoding="utf-8")))
+    memory_path = ROOT / "data" / "memory.json"
+    if memory_path.exists():
+        memory = json.loads(memory_path.read_text(encoding="utf-8"))
+        texts.extend(t.get("content", "") for t in memory.get("history", []))
+    words = sorted(set(retrieval.tokenize(" ".join(texts))))
+    if len(words) < 500:
+        words.extend(f"term{i}" for i in range(2000))
+    return words
+
+
+def make_note(rng: random.Random, words: List[str], length: int) -> str:
+    # 近似 Zipf 分布：少数词高频出现，其余长尾
+    picks = [words[min(int(rng.paretovariate(1.2)) - 1, len(words) - 1)] for _ in range(length // 2)]
+    picks += rng.choices(words, k=length - len(picks))
+    rng.shuffle(picks)
+    return " ".join(picks)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark note lookup latency.")
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--words", type=int, default=200, help="approximate words per note")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = load_vocabulary()
+    ok = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        notes_dir = Path(tmp) / "notes"
+        notes_dir.mkdir()
+        for i in range(args.notes):
+            (notes_dir / f"note_{i:05d}.md").write_text(
+                f"# note {i}\n\n{make_note(rng, words, args.words)}\n", encoding="utf-8")
+
+        start = time.perf_counter()
+        index = get_notes_index(notes_dir)
+        build_s = time.perf_counter() - start
+        print(f"[bench] {args.notes} notes (~{args.words} words), vocabulary {len(words)}, "
+              f"build {build_s * 1e3:.1f} ms")
+
+        queries = [" ".join(rng.choices(words, k=rng.randint(2, 6))) for _ in range(args.queries)]
+        for mode in ("bm25", "embedding", "hybrid"):
+            if mode != "bm25" and index.embeddings is None:
+                print(f"[bench] {mode:9s} skipped (NumPy not installed)")
+                continue
+            index.search(queries[0], k=2, mode=mode)
+            samples = []
+            for q in queries:
+                t0 = time.perf_counter()
+                index.search(q, k=2, mode=mode)
+                samples.append((time.perf_counter() - t0) * 1e3)
+            p50, p99 = statistics.median(samples), percentile(samples, 0.99)
+            print(f"[bench] {mode:9s} p50={p50:.3f} ms  p99={p99:.3f} ms")
+            if mode == "bm25" and p50 >= TARGET_MS:
+                print(f"[bench] FAIL: bm25 p50 above the {TARGET_MS:.1f} ms target")
+                ok = False
+
+        # 增量保存：save_markdown_note 把新笔记直接加入已建立的索引
+        before = len(index.bm25)
+        samples = []
+        for i in range(20):
+            t0 = time.perf_counter()
+            save_markdown_note(f"bench note {i}", make_note(rng, words, args.words), base_dir=str(notes_dir))
+            samples.append((time.perf_counter() - t0) * 1e3)
+        start = time.perf_counter()
+        NotesIndex(notes_dir).build()
+        rebuild_ms = (time.perf_counter() - start) * 1e3
+        print(f"[bench] save_markdown_note p50={statistics.median(samples):.3f} ms "
+              f"(full rebuild {rebuild_ms:.1f} ms)")
+        if len(index.bm25) != before + 20:
+            print(f"[bench] FAIL: expected {before + 20} indexed notes, got {len(index.bm25)}")
+            ok = False
+
+        # 索引根目录之外的笔记不应进入索引
+        outside = Path(tmp) / "elsewhere"
+        path = save_markdown_note("outside note", "unique-outside-token", base_dir=str(outside))
+        if path in index.texts or index.search("unique-outside-token"):
+            print("[bench] FAIL: note outside the index root was indexed")
+            ok = False
+
+    print("[bench] OK" if ok else "[bench] FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,380 @@
+# exp/check_beacon_equivalence.py
+"""
+BeaconExtractor 差分测试。
+
+对每个输入模块检查：
+1. 每个函数的 compute_local_closure（SCC + 记忆化）与参考实现 _closure_dfs（逐函数 DFS）完全相同；
+2. 逐函数与性能优化系列开始之前的 BeaconExtractor（冻结在 exp/beacon_reference.py）比较
+   compute_all_local_beacons（compact / full）的结果（行号 + 代码行）。
+   方法 Class.method 对应基线中的 method（基线不带类名；同名方法在基线中会合并，这种函数不比较）。
+   闭包（任一实现）触及基线不认识的语法（async def、增量 / 带注解赋值、with ... as、yield、推导式）
+   所在行的函数是有意改变的，不比较，按原因计入 skipped；
+3. 不含类和上述语法的模块，整个 to_json（compact / full，含 program beacons 与调用图）
+   与基线实现完全相同；
+4. --ref REF 时另外与 git 中 REF 版本的 src/Beacon.py 比较完整输出（不跳过任何模块），
+   用于确认重构没有改变输出，例如 --ref HEAD。
+
+另外两类固定用例：
+- CONSTRUCT_CASES：每种新覆盖的语法一个小模块，断言其 local beacons（行号）与调用关系；
+- 含这些语法的合成模块（exp/beacon_synth.generate_rich_module）的输出与记录下来的
+  exp/beacon_expected.json（输出的 sha256）相同，保证新语法的输出以后也不会被悄悄改变。
+  有意改变输出时用 --update-fixture 重新记录。
+
+Beacon Tree 的文本不参与比较：同一行有多条同分语句（如 `a = 1; b = 2`）时，
+旧实现按 id() 的集合迭代顺序挑代表节点（依赖内存地址），现在固定取编号最小的节点，
+两者选中的节点可能不同，树的展开方式也就不同。
+
+输入包括项目自身的 .py 文件、若干组合成模块（见 exp/beacon_synth.py），以及命令行传入的路径
+（文件或目录）。任何不一致都会打印出来，并以退出码 1 结束。
+
+用法（在项目根目录）:
+    python -m exp.check_beacon_equivalence
+    python -m exp.check_beacon_equivalence /usr/lib/python3.11 --limit 500
+    python -m exp.check_beacon_equivalence --ref HEAD
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import sys
+from pathlib import Path
+from collections import Counter
+from typing import Iterator, List, Set, Tuple
+
+from exp import beacon_reference
+from exp.beacon_synth import generate_module, generate_rich_module
+from exp.bench_beacon import ROOT, load_beacon_at
+from src import Beacon
+
+SYNTHETIC_CONFIGS = [
+    dict(n_funcs=30, stmts_per_func=10, fanout=2, depth=2, n_globals=5),
+    dict(n_funcs=80, stmts_per_func=25, fanout=4, depth=4, n_globals=60),
+    dict(n_funcs=40, stmts_per_func=15, fanout=3, depth=1, n_globals=300),
+]
+
+# 递归 / 相互递归函数与循环中的依赖环（局部闭包中的 SCC）
+RECURSIVE_MODULE = """
+LIMIT = 10
+SCALE = LIMIT * 2
+
+
+def fact(n):
+    if n <= 1:
+        return 1
+    return n * fact(n - 1)
+
+
+def is_even(n):
+    if n == 0:
+        return True
+    return is_odd(n - 1)
+
+
+def is_odd(n):
+    if n == 0:
+        return False
+    return is_even(n - 1)
+
+
+def walk(tree, acc):
+    total = acc
+    for child in tree:
+        total = walk(child, total) + SCALE
+    return total
+
+
+def converge(x):
+    y = x
+    z = y
+    while z > LIMIT:
+        y = z - 1
+        z = fact(y) % LIMIT
+    print(z, y)
+    return walk([], z)
+
+
+def main():
+    value = converge(fact(5))
+    if is_even(value):
+        print(value)
+    return value
+"""
+
+RICH_CONFIGS = [
+    dict(n_classes=5, methods_per_class=4, stmts_per_method=8, n_funcs=10),
+    dict(n_classes=20, methods_per_class=6, stmts_per_method=12, n_funcs=30),
+]
+
+FIXTURE = Path(__file__).resolve().parent / "beacon_expected.json"
+
+# 新覆盖语法的固定用例：(名称, 源码, {函数: compact 模式 local beacon 的行号},
+#                     {入口: 应可达的函数}, {调用方: 应有的被调函数})
+CONSTRUCT_CASES = [
+    ("async def", """\
+async def fetch(url):
+    resp = await get(url)
+    return resp
+""", {"fetch": [2, 3]}, {}, {"fetch": {"get"}}),
+    ("class methods", """\
+class Store:
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        data = read(self.path)
+        return self.parse(data)
+
+    def parse(self, data):
+        return data.strip()
+
+
+def main():
+    store = Store("x")
+    return Store.load(store)
+""", {"Store.load": [6, 7], "Store.parse": [10], "main": [14, 15]},
+     {"main": {"Store.__init__", "Store.load", "Store.parse"}}, {"Store.load": {"Store.parse"}}),
+    ("augmented assignment", """\
+def total(items):
+    acc = 0
+    for item in items:
+        acc += price(item)
+    return acc
+""", {"total": [2, 4, 5]}, {}, {}),
+    ("annotated assignment", """\
+def build(n):
+    size: int = compute(n)
+    label: str
+    return size
+""", {"build": [2, 4]}, {}, {}),
+    ("yield / yield from", """\
+def gen(xs):
+    for x in xs:
+        y = transform(x)
+        yield y
+    yield from tail(xs)
+""", {"gen": [3, 4, 5]}, {}, {"gen": {"transform", "tail"}}),
+    ("with ... as", """\
+def load(path):
+    with open(path) as fh:
+        data = fh.read()
+    return data
+""", {"load": [2, 3, 4]}, {}, {}),
+    ("comprehension scope", """\
+def squares(n):
+    x = 3
+    return [x * x for x in range(n)]
+""", {"squares": [3]}, {}, {}),
+]
+
+
+def iter_sources(paths: List[str], limit: int) -> Iterator[Tuple[str, str]]:
+    yield "<recursive>", RECURSIVE_MODULE
+    for i, cfg in enumerate(SYNTHETIC_CONFIGS):
+        yield f"<synthetic-{i}>", generate_module(seed=i, **cfg)
+    for i, cfg in enumerate(RICH_CONFIGS):
+        yield f"<rich-{i}>", generate_rich_module(seed=i, **cfg)
+
+    files = sorted((ROOT / "src").rglob("*.py")) + sorted((ROOT / "exp").glob("*.py"))
+    for p in paths:
+        path = Path(p)
+        files.extend(sorted(path.rglob("*.py")) if path.is_dir() else [path])
+
+    for path in files[:limit]:
+        try:
+            yield str(path), path.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            continue
+
+
+def outputs(module, code: str) -> List[str]:
+    """to_json（compact / full）的规范化输出。"""
+    ext = module.BeaconExtractor(code)
+    ext.visit(ext.tree)
+    result = []
+    for mode in ("compact", "full"):
+        local = ext.compute_all_local_beacons(mode=mode)
+        program = ext.compute_program_beacons(mode=mode)
+        result.append(json.dumps(ext.to_json(local, program), sort_keys=True))
+    return result
+
+
+def digest(result: List[str]) -> str:
+    return hashlib.sha256("\n".join(result).encode("utf-8")).hexdigest()
+
+
+def check_constructs() -> int:
+    """CONSTRUCT_CASES：返回不符合预期的用例数。"""
+    failed = 0
+    for name, code, expected_local, expected_reach, expected_calls in CONSTRUCT_CASES:
+        ext = _extract(Beacon, code)
+        local = ext.compute_all_local_beacons(mode="compact")
+        problems = []
+        for func, lines in expected_local.items():
+            got = [ext.node_lines.get(nid) for nid in local.get(func, [])]
+            if got != lines:
+                problems.append(f"local beacons of {func}: expected lines {lines}, got {got}")
+        for entry, funcs in expected_reach.items():
+            missing = funcs - ext.reachable_functions_from(entry)
+            if missing:
+                problems.append(f"{sorted(missing)} not reachable from {entry}")
+        for caller, callees in expected_calls.items():
+            missing = callees - ext.calls.get(caller, set())
+            if missing:
+                problems.append(f"calls {caller} -> {sorted(missing)} missing")
+        if problems:
+            failed += 1
+            print(f"[FAIL] construct '{name}': " + "; ".join(problems))
+    print(f"[check] {len(CONSTRUCT_CASES)} construct cases, {failed} failures")
+    return failed
+
+
+def check_fixture(update: bool) -> int:
+    """合成的 rich 模块与记录的输出摘要比较；返回不一致的个数。"""
+    current = {f"<rich-{i}>": digest(outputs(Beacon, generate_rich_module(seed=i, **cfg)))
+               for i, cfg in enumerate(RICH_CONFIGS)}
+    if update:
+        FIXTURE.write_text(json.dumps(current, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"[check] recorded {len(current)} digests in {FIXTURE.name}")
+        return 0
+    expected = json.loads(FIXTURE.read_text(encoding="utf-8"))
+    failed = 0
+    for name, value in current.items():
+        if expected.get(name) != value:
+            failed += 1
+            print(f"[FAIL] {name}: output differs from {FIXTURE.name}")
+    print(f"[check] {len(current)} rich modules checked against {FIXTURE.name}, {failed} mismatches")
+    return failed
+
+
+# 基线不认识、当前实现有意改变处理方式的语法
+UNKNOWN_TO_REFERENCE = (ast.AsyncFunctionDef, ast.AugAssign, ast.AnnAssign, ast.Yield,
+                        ast.YieldFrom, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+_WITH = (ast.With, ast.AsyncWith)
+
+
+def changed_lines(tree: ast.AST) -> Set[int]:
+    """UNKNOWN_TO_REFERENCE 语法所在的行（含整个子树），以及带 as 绑定的 with 语句头。"""
+    lines: Set[int] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, UNKNOWN_TO_REFERENCE):
+            lines.update(range(node.lineno, (node.end_lineno or node.lineno) + 1))
+        elif isinstance(node, _WITH) and any(item.optional_vars is not None for item in node.items):
+            lines.update(range(node.lineno, max(node.lineno + 1, node.body[0].lineno)))
+    return lines
+
+
+def reference_covers(code: str) -> bool:
+    """模块不含类和 changed_lines 的语法时，整个输出（含 program beacons / 调用图）应与基线相同。"""
+    tree = ast.parse(code)
+    return not changed_lines(tree) and not any(isinstance(n, ast.ClassDef) for n in ast.walk(tree))
+
+
+def _extract(module, code: str):
+    ext = module.BeaconExtractor(code)
+    ext.visit(ext.tree)
+    return ext
+
+
+def _beacon_lines(ext, nodes) -> List[Tuple[int, str]]:
+    return [(ext.node_lines.get(nid), ext._safe_get_line(nid)) for nid in nodes]
+
+
+def local_beacon_mismatches(code: str, counts: Counter) -> List[str]:
+    """
+    逐函数比较 compute_all_local_beacons 与冻结的基线实现，返回结果不同的函数名。
+    counts 累计 compared 与各类 skipped 的函数数。
+    """
+    ext = _extract(Beacon, code)
+    ref = _extract(beacon_reference, code)
+    changed = changed_lines(ext.tree)
+
+    # 基线按裸函数名记录；同名的 def 在基线中会合并，只比较名字唯一的函数
+    def_counts = Counter(node.name for node in ast.walk(ext.tree) if isinstance(node, ast.FunctionDef))
+    funcs = sorted(set(ext.func_ranges) | {ext.module_name})
+
+    def touches_changed(impl, func) -> bool:
+        return any(impl.node_lines.get(nid) in changed for nid in impl.compute_local_closure(func))
+
+    comparable = []
+    for func in funcs:
+        base = func.rsplit(".", 1)[-1]
+        if func != ext.module_name and base not in ref.func_ranges:
+            counts["skipped (async def)"] += 1
+        elif func != ext.module_name and def_counts[base] != 1:
+            counts["skipped (name defined more than once)"] += 1
+        elif touches_changed(ext, func) or touches_changed(ref, base):
+            counts["skipped (closure uses newly covered syntax)"] += 1
+        else:
+            comparable.append((func, base))
+
+    bad = []
+    for mode in ("compact", "full"):
+        local = ext.compute_all_local_beacons(mode=mode)
+        expected = ref.compute_all_local_beacons(mode=mode)
+        for func, base in comparable:
+            if _beacon_lines(ext, local[func]) != _beacon_lines(ref, expected[base]) and func not in bad:
+                bad.append(func)
+    counts["compared"] += len(comparable)
+    return bad
+
+
+def closure_mismatches(code: str) -> List[str]:
+    ext = Beacon.BeaconExtractor(code)
+    ext.visit(ext.tree)
+    funcs = sorted(set(ext.func_ranges) | {ext.module_name})
+    return [f for f in funcs if ext.compute_local_closure(f) != ext._closure_dfs(f)]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Differential test for BeaconExtractor.")
+    parser.add_argument("paths", nargs="*", help="extra .py files or directories")
+    parser.add_argument("--limit", type=int, default=1000, help="max number of files")
+    parser.add_argument("--ref", default=None,
+                        help="also compare full outputs against src/Beacon.py at this git ref (e.g. HEAD)")
+    parser.add_argument("--update-fixture", action="store_true",
+                        help=f"re-record {FIXTURE.name} from the current Beacon")
+    args = parser.parse_args()
+
+    git_baseline = load_beacon_at(args.ref) if args.ref else None
+
+    checked = failed = full_compared = 0
+    func_counts: Counter = Counter()
+    for name, code in iter_sources(args.paths, args.limit):
+        try:
+            current = outputs(Beacon, code)
+        except (SyntaxError, RecursionError, ValueError):
+            continue
+        checked += 1
+
+        bad_closures = closure_mismatches(code)
+        if bad_closures:
+            failed += 1
+            print(f"[FAIL] {name}: closure differs from reference DFS for {bad_closures[:5]}")
+            continue
+        bad_locals = local_beacon_mismatches(code, func_counts)
+        if bad_locals:
+            failed += 1
+            print(f"[FAIL] {name}: local beacons differ from exp/beacon_reference.py for {bad_locals[:5]}")
+            continue
+        if reference_covers(code):
+            full_compared += 1
+            if current != outputs(beacon_reference, code):
+                failed += 1
+                print(f"[FAIL] {name}: output differs from exp/beacon_reference.py")
+                continue
+        if git_baseline is not None and current != outputs(git_baseline, code):
+            failed += 1
+            print(f"[FAIL] {name}: output differs from {args.ref}")
+
+    print(f"[check] local beacons vs exp/beacon_reference.py: {func_counts['compared']} functions compared, "
+          + ", ".join(f"{n} {reason}" for reason, n in sorted(func_counts.items()) if reason != "compared"))
+    print(f"[check] {checked} modules checked, {full_compared} with full output compared to the reference"
+          + (f", all against {args.ref}" if args.ref else "") + f", {failed} mismatches")
+    failed += check_constructs()
+    failed += check_fixture(args.update_fixture)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+# exp/check_beacon_incremental.py
+"""
+BeaconExtractor.reanalyze 的差分测试与计时。
+
+对每个输入模块，先完整分析一次（并计算 compact / full 两种 local beacons，
+让增量分析可以复用记忆化的结果），再随机生成若干次编辑：
+- 修改某个顶层函数（在函数体开头插入一条赋值语句，改变其后所有代码的行号）；
+- 删除某个顶层函数；
+- 在文件开头插入一个新函数；
+- 交换两个相邻的顶层函数；
+- 在文件末尾追加模块级赋值（模块级语句变化，应退化为完整分析）；
+- 追加一个与已有函数同名的函数（同名函数共享 var_defs，应退化为完整分析）；
+- 只改变词法结构的编辑：在函数结束后紧跟一行缩进代码（并入该函数）、给函数加装饰器、
+  插入空行，以及用跨行字符串包住一段函数体（检查只解析变化区域时的语句边界）。
+
+每次编辑后比较 old.reanalyze(new_code) 与 BeaconExtractor(new_code) 完整分析的：
+节点表各列、CSR 依赖图、call_targets、func_ranges、calls / attr_calls、output_nodes、
+class_ranges、validation_returns、var_defs、imports、to_json（两种模式，保留键顺序）以及 Beacon Tree 文本。
+
+最后在一个大的合成模块上比较“修改一个函数”后增量分析与完整分析的耗时。
+
+用法（在项目根目录）:
+    python -m exp.check_beacon_incremental
+    python -m exp.check_beacon_incremental /usr/lib/python3.11 --limit 300 --edits 4
+"""
+
+import argparse
+import ast
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+from collections import Counter
+from typing import List, Optional
+
+from exp.beacon_synth import generate_module, generate_rich_module
+from exp.check_beacon_equivalence import iter_sources
+from src.Beacon import BeaconExtractor
+
+
+def analyzed(code: str) -> BeaconExtractor:
+    ext = BeaconExtractor(code)
+    ext.visit(ext.tree)
+    for mode in ("compact", "full"):
+        ext.compute_all_local_beacons(mode=mode)
+    return ext
+
+
+def snapshot(ext: BeaconExtractor) -> dict:
+    graph = ext.dep_graph
+    result = {
+        "nodes": [list(ext.nodes.line), [ext.func_names[f] for f in ext.nodes.func],
+                  list(ext.nodes.kind), list(ext.nodes.score)],
+        "indptr": list(graph.indptr),
+        "indices": list(graph.indices),
+        "call_targets": list(ext.call_targets.items()),
+        "func_ranges": list(ext.func_ranges.items()),
+        "class_ranges": list(ext.class_ranges.items()),
+        "calls": [(f, sorted(c)) for f, c in ext.calls.items()],
+        "attr_calls": [(f, sorted(c)) for f, c in ext.attr_calls.items()],
+        "output_nodes": [(f, sorted(n)) for f, n in ext.output_nodes.items()],
+        "validation_returns": {f: sorted(n) for f, n in ext.validation_returns.items() if n},
+        "var_defs": {f: {v: ids for v, ids in d.items() if ids} for f, d in ext.var_defs.items() if d},
+        "imports": list(ext.imports.items()),
+    }
+    for mode in ("compact", "full"):
+        local = ext.compute_all_local_beacons(mode=mode)
+        program = ext.compute_program_beacons(mode=mode)
+        result[f"json_{mode}"] = json.dumps(ext.to_json(dict(sorted(local.items())), program))
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            ext.print_program_beacon_tree(program)
+        result[f"tree_{mode}"] = buf.getvalue()
+    return result
+
+
+def _function_stmts(tree: ast.Module) -> List[ast.FunctionDef]:
+    return [s for s in tree.body if isinstance(s, (ast.FunctionDef, ast.AsyncFunctionDef))]
+
+
+def make_edit(code: str, rng: random.Random) -> Optional[str]:
+    lines = code.splitlines()
+    funcs = _function_stmts(ast.parse(code))
+    kind = rng.choice(["modify", "modify", "delete", "prepend", "swap", "module", "duplicate",
+                       "continue", "decorate", "blank", "string"])
+
+    if kind == "prepend" or not funcs:
+        return "def __edit_new(a):\n    x = a + 1\n    return x\n\n" + code
+    if kind == "module":
+        return code + "\n__EDIT_CONST = 42\n"
+    if kind == "duplicate":
+        f = rng.choice(funcs)
+        return code + f"\n\ndef {f.name}(*args):\n    return None\n"
+
+    f = rng.choice(funcs)
+    start = min([f.lineno] + [d.lineno for d in f.decorator_list])
+    if kind == "delete":
+        return "\n".join(lines[:start - 1] + lines[f.end_lineno:]) + "\n"
+    if kind == "swap":
+        i = funcs.index(f)
+        if i + 1 >= len(funcs):
+            return None
+        g = funcs[i + 1]
+        g_start = min([g.lineno] + [d.lineno for d in g.decorator_list])
+        between = lines[f.end_lineno:g_start - 1]
+        if any(line.strip() and not line.lstrip().startswith("#") for line in between):
+            return None  # a module-level statement sits between them
+        return "\n".join(lines[:start - 1] + lines[g_start - 1:g.end_lineno] + between
+                         + lines[start - 1:f.end_lineno] + lines[g.end_lineno:]) + "\n"
+
+    if kind == "blank":
+        at = rng.randint(0, len(lines))
+        return "\n".join(lines[:at] + [""] + lines[at:]) + "\n"
+    if kind == "decorate":
+        return "\n".join(lines[:start - 1] + ["@__edit_deco"] + lines[start - 1:]) + "\n"
+    if kind == "continue":
+        # an indented line right after the function becomes part of its body
+        return "\n".join(lines[:f.end_lineno] + ["    __edit_tail = 1"] + lines[f.end_lineno:]) + "\n"
+
+    # modify: insert an assignment at the top of the body
+    first = f.body[0]
+    indent = " " * first.col_offset
+    if first.lineno == f.lineno:
+        return None  # one-line function body
+    if kind == "string" and len(f.body) > 1:
+        # turn the first statements of the body into a multi-line string literal
+        last = f.body[len(f.body) // 2].lineno - 1
+        return "\n".join(lines[:first.lineno - 1] + [f'{indent}__edit_doc = """']
+                         + lines[first.lineno - 1:last] + [f'{indent}"""']
+                         + lines[last:]) + "\n"
+    new_line = f"{indent}__edit = {rng.randint(0, 9)}"
+    return "\n".join(lines[:first.lineno - 1] + [new_line] + lines[first.lineno - 1:]) + "\n"
+
+
+def check_module(name: str, code: str, edits: int, rng: random.Random, stats: Counter) -> List[str]:
+    failures: List[str] = []
+    try:
+        base = analyzed(code)
+    except (SyntaxError, RecursionError, ValueError):
+        return failures
+    for _ in range(edits):
+        edited = make_edit(code, rng)
+        if edited is None:
+            continue
+        try:
+            expected = snapshot(analyzed(edited))
+        except SyntaxError:
+            # an invalid revision must be reported by reanalyze as well
+            try:
+                base.reanalyze(edited)
+            except SyntaxError:
+                continue
+            failures.append(f"{name}: reanalyze accepted a revision with a syntax error")
+            continue
+        except (RecursionError, ValueError):
+            continue
+        incremental = base.reanalyze(edited)
+        stats["revisions"] += 1
+        stats["reused"] += len(incremental.reused_functions)
+        stats["functions"] += len(incremental.segments)
+        got = snapshot(incremental)
+        diff = [k for k in expected if expected[k] != got[k]]
+        if diff:
+            failures.append(f"{name}: {diff}")
+        base, code = incremental, edited
+    return failures
+
+
+def timing(funcs: int, stmts: int, repeat: int):
+    code = generate_module(funcs, stmts, fanout=3, depth=2, n_globals=20)
+    tree = ast.parse(code)
+    target = _function_stmts(tree)[funcs // 2]
+    lines = code.splitlines()
+    edited = "\n".join(lines[:target.body[0].lineno - 1] + ["    __edit = 1"]
+                       + lines[target.body[0].lineno - 1:]) + "\n"
+
+    base = analyzed(code)
+    full_best = inc_best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        full = analyzed(edited)
+        full_best = min(full_best, time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        inc = base.reanalyze(edited)
+        for mode in ("compact", "full"):
+            inc.compute_all_local_beacons(mode=mode)
+        inc_best = min(inc_best, time.perf_counter() - t0)
+
+    same = snapshot(full) == snapshot(inc)
+    print(f"[timing] {code.count(chr(10))} lines, {funcs} functions, one function edited: "
+          f"full {full_best * 1e3:.1f}ms, incremental {inc_best * 1e3:.1f}ms "
+          f"({full_best / max(inc_best, 1e-9):.1f}x), "
+          f"{len(inc.reused_functions)} functions reused, identical: {same}")
+    return same
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Differential test for BeaconExtractor.reanalyze.")
+    parser.add_argument("paths", nargs="*", help="extra .py files or directories")
+    parser.add_argument("--limit", type=int, default=1000, help="max number of files")
+    parser.add_argument("--edits", type=int, default=6, help="edits per module")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--funcs", type=int, default=300, help="timing: functions in the synthetic module")
+    parser.add_argument("--stmts", type=int, default=40, help="timing: statements per function")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    checked = 0
+    failures: List[str] = []
+    stats: Counter = Counter()
+    sources = [("<synthetic-rich>", generate_rich_module(n_classes=8, n_funcs=12, seed=args.seed))]
+    sources.extend(iter_sources(args.paths, args.limit))
+    for name, code in sources:
+        failures.extend(check_module(name, code, args.edits, rng, stats))
+        checked += 1
+    for failure in failures:
+        print(f"[FAIL] {failure}")
+    print(f"[check] {checked} modules, {stats['revisions']} revisions, "
+          f"{stats['reused']}/{stats['functions']} top-level functions copied; {len(failures)} mismatches")
+
+    same = timing(args.funcs, args.stmts, args.repeat)
+    return 1 if failures or not same else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# exp/stress_memory.py
+"""
+多进程并发写 memory 的压力测试。
+
+启动 N 个进程，每个进程通过 MemoryManager 写入 M 轮对话（每轮 user + assistant 两条），
+并各自向 notes 合并写入一条笔记。结束后校验：
+- log 中每一行都能解析，索引有效且条数一致；
+- 不压缩时：每个 writer 的全部记录都在，且各自保持写入顺序；
+- 压缩时：尾部记录完整，索引与 log 对齐；
+- notes 包含所有 writer 的笔记（元数据合并没有丢失）。
+
+用法（在项目根目录）:
+    python -m exp.stress_memory --writers 8 --turns 200
+    python -m exp.stress_memory --writers 8 --turns 200 --max-history 50
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from src.memory_manager import MemoryManager
+from src.memory_store import MemoryStore
+
+
+def _writer(data_dir: str, writer_id: int, turns: int, max_history: int) -> None:
+    manager = MemoryManager(MemoryStore(Path(data_dir)),
+                            max_history=max_history, flush_interval=0.001)
+    for i in range(turns):
+        manager.append_turns([
+            {"role": "user", "content": f"w{writer_id} q{i}", "writer": writer_id, "seq": i},
+            {"role": "assistant", "content": f"w{writer_id} a{i}", "writer": writer_id, "seq": i},
+        ])
+        if i % 10 == 0:
+            # 让后台线程和其他进程有机会交错
+            manager.snapshot(4)
+    manager.update_meta(new_notes=[f"note from writer {writer_id}"])
+    manager.close()
+
+
+def run(writers: int, turns: int, max_history: int) -> bool:
+    data_dir = tempfile.mkdtemp(prefix="memory_stress_")
+    ctx = mp.get_context("spawn")
+    procs = [ctx.Process(target=_writer, args=(data_dir, w, turns, max_history))
+             for w in range(writers)]
+
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    store = MemoryStore(Path(data_dir))
+    ok = all(p.exitcode == 0 for p in procs)
+
+    raw_lines = [line for line in store.log_path.read_bytes().splitlines() if line.strip()]
+    parsed = []
+    for line in raw_lines:
+        try:
+            parsed.append(json.loads(line))
+        except ValueError:
+            print(f"[FAIL] unparsable line: {line[:80]!r}")
+            ok = False
+
+    if store.count() != len(parsed) or not store._index_is_valid():
+        print(f"[FAIL] index has {store.count()} entries, log has {len(parsed)} records")
+        ok = False
+    if store.load_recent(len(parsed)) != parsed:
+        print("[FAIL] records loaded through the index differ from the log")
+        ok = False
+
+    total_written = writers * turns * 2
+    compacting = total_written > 2 * max_history
+    seqs = defaultdict(list)
+    for record in parsed:
+        if record["role"] == "user":
+            seqs[record["writer"]].append(record["seq"])
+    for w, s in seqs.items():
+        if s != sorted(s):
+            print(f"[FAIL] writer {w} records out of order")
+            ok = False
+    if not compacting:
+        for w in range(writers):
+            if seqs.get(w) != list(range(turns)):
+                print(f"[FAIL] writer {w} lost records: {len(seqs.get(w, []))}/{turns}")
+                ok = False
+    elif not (max_history <= len(parsed) <= 2 * max_history):
+        print(f"[FAIL] compacted log has {len(parsed)} records (max_history={max_history})")
+        ok = False
+
+    notes = store.load_meta()["notes"]
+    missing = [w for w in range(writers) if f"note from writer {w}" not in notes]
+    if missing:
+        print(f"[FAIL] notes lost for writers {missing}")
+        ok = False
+
+    print(f"writers={writers} turns={turns} records_written={total_written} "
+          f"records_on_disk={len(parsed)} compacting={compacting} time={elapsed:.2f}s")
+    print("[OK]" if ok else "[FAILED]", data_dir)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel writer stress test for the memory store.")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument(
+        "--max-history",
+        type=int,
+        default=1_000_000,
+        help="MemoryManager history cap; small values exercise concurrent compaction.",
+    )
+    args = parser.parse_args()
+    raise SystemExit(0 if run(args.writers, args.turns, args.max_history) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,37 +8,259 @@ BeaconExtractor
   * Local Logic: outputs, dependency closure, validation filter, reduction
   * Global Logic: call graph, entry-driven aggregation
 - Adds structural "Beacon Tree" (derivation-tree-like) visualization.
+- Nodes are numbered densely; per-node data lives in array-backed columns
+  (NodeTable) and the dependency graph in CSR form (CSRGraph).
+- The visitor dispatches through a node-type table and covers async functions,
+  class methods (named "Class.method"), augmented / annotated assignments,
+  "with ... as x" bindings, yields and comprehension scopes.
+
+- Project mode (src/beacon/project.py): analyzes a directory in a process pool
+  and merges the files into a cross-module call graph.
+- Streaming export (src/beacon/export.py): results as JSON Lines or compact
+  binary records, written one at a time.
+- Incremental mode (BeaconExtractor.reanalyze / IncrementalBeacon): a new
+  revision of analyzed code re-parses and re-visits only what changed.
+- Result cache (src/beacon/cache.py): analyze_source results keyed by a hash of
+  the source and options, in memory and optionally in SQLite.
+- Server mode (src/beacon/server.py): a long-running worker answering JSON Lines
+  requests on stdin/stdout or a Unix socket, batches fanned out to a process pool.
 
 Usage:
-    python beacon_extractor_pro_v4.py your_file.py
-    python beacon_extractor_pro_v4.py your_file.py --mode full --json beacons.json --tree
+    python src/Beacon.py your_file.py --mode full --json beacons.json --tree
+    (the command line interface is src/beacon/cli.py, which lists all modes)
 """
 
 import ast
+import os
+import re
 import sys
-import argparse
+import hashlib
 import json
-from collections import defaultdict
-from typing import Dict, List, Set, Tuple
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict
+from collections.abc import Mapping
+from typing import IO, TYPE_CHECKING, Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    # Annotations only: src.beacon imports this module, and `python src/Beacon.py`
+    # starts without the project root on sys.path
+    from src.beacon.cache import BeaconResultCache
+
+
+# Node kinds stored in NodeTable.kind
+KIND_OTHER = 0
+KIND_FUNCTION = 1
+KIND_ASSIGN = 2
+KIND_RETURN = 3
+KIND_EXPR = 4
+KIND_CALL = 5
+KIND_NAME = 6
+KIND_YIELD = 7
+
+_KIND_OF = {
+    ast.FunctionDef: KIND_FUNCTION,
+    ast.AsyncFunctionDef: KIND_FUNCTION,
+    ast.Assign: KIND_ASSIGN,
+    ast.AugAssign: KIND_ASSIGN,
+    ast.AnnAssign: KIND_ASSIGN,
+    ast.With: KIND_ASSIGN,
+    ast.AsyncWith: KIND_ASSIGN,
+    ast.Return: KIND_RETURN,
+    ast.Expr: KIND_EXPR,
+    ast.Call: KIND_CALL,
+    ast.Name: KIND_NAME,
+}
+
+# Reduction score per kind (see BeaconExtractor._score_node); Assign depends on its value
+_KIND_SCORE = {
+    KIND_OTHER: 10,
+    KIND_FUNCTION: 10,
+    KIND_ASSIGN: 50,
+    KIND_RETURN: 100,
+    KIND_EXPR: 10,
+    KIND_CALL: 90,
+    KIND_NAME: 10,
+    KIND_YIELD: 100,
+}
+
+_FUNCTION_DEFS = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+# Comprehensions bind their loop variables in their own scope
+_COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+NO_LINE = -1
+
+# Line breaks as the tokenizer sees them (str.splitlines also splits on \f, \v, \x1c, ...)
+_NEWLINE_RE = re.compile(r"\r\n|\r|\n")
+
+# Attribute used to attach the dense node id to an AST node while visiting
+_NID_ATTR = "_beacon_nid"
+
+
+class NodeTable:
+    """
+    Dense node numbering (0..n-1) with array-backed columns:
+    line, function index, node kind and reduction score.
+    """
+
+    __slots__ = ("line", "func", "kind", "score")
+
+    def __init__(self):
+        self.line = array("i")
+        self.func = array("i")
+        self.kind = array("B")
+        self.score = array("B")
+
+    def __len__(self) -> int:
+        return len(self.line)
+
+    def add(self, line: int, func: int, kind: int, score: int) -> int:
+        self.line.append(line)
+        self.func.append(func)
+        self.kind.append(kind)
+        self.score.append(score)
+        return len(self.line) - 1
+
+
+class CSRGraph(Mapping):
+    """
+    Compressed sparse row adjacency: the neighbours of node i are
+    indices[indptr[i]:indptr[i + 1]] (sorted, deduplicated).
+    Read-only Mapping view node -> tuple of neighbours, non-empty rows only.
+    """
+
+    def __init__(self, n: int, src: array, dst: array):
+        keys = sorted({s * n + d for s, d in zip(src, dst)}) if n else []
+        indptr = array("i", bytes(4 * (n + 1)))
+        for k in keys:
+            indptr[k // n + 1] += 1
+        for i in range(n):
+            indptr[i + 1] += indptr[i]
+        self.n = n
+        self.indptr = indptr
+        self.indices = array("i", [k % n for k in keys])
+
+    def neighbors(self, nid: int) -> array:
+        return self.indices[self.indptr[nid]:self.indptr[nid + 1]]
+
+    def __getitem__(self, nid: int) -> Tuple[int, ...]:
+        if not (0 <= nid < self.n) or self.indptr[nid] == self.indptr[nid + 1]:
+            raise KeyError(nid)
+        return tuple(self.neighbors(nid))
+
+    def __iter__(self) -> Iterator[int]:
+        indptr = self.indptr
+        return (i for i in range(self.n) if indptr[i] != indptr[i + 1])
+
+    def __len__(self) -> int:
+        indptr = self.indptr
+        return sum(1 for i in range(self.n) if indptr[i] != indptr[i + 1])
+
+
+class _LineView(Mapping):
+    """Read-only Mapping node_id -> lineno over NodeTable.line."""
+
+    def __init__(self, nodes: NodeTable):
+        self._nodes = nodes
+
+    def __getitem__(self, nid: int) -> int:
+        line = self._nodes.line
+        if not (0 <= nid < len(line)) or line[nid] == NO_LINE:
+            raise KeyError(nid)
+        return line[nid]
+
+    def __iter__(self) -> Iterator[int]:
+        line = self._nodes.line
+        return (i for i in range(len(line)) if line[i] != NO_LINE)
+
+    def __len__(self) -> int:
+        return sum(1 for v in self._nodes.line if v != NO_LINE)
+
+
+class _FuncView(Mapping):
+    """Read-only Mapping node_id -> function name over NodeTable.func."""
+
+    def __init__(self, nodes: NodeTable, func_names: List[str]):
+        self._nodes = nodes
+        self._names = func_names
+
+    def __getitem__(self, nid: int) -> str:
+        if not (0 <= nid < len(self._nodes)):
+            raise KeyError(nid)
+        return self._names[self._nodes.func[nid]]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self._nodes)))
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+
+def _dotted_name(node: ast.AST) -> Optional[str]:
+    """"a.b.c" for an Attribute chain rooted at a Name, else None."""
+    parts: List[str] = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
 
 
 class BeaconExtractor(ast.NodeVisitor):
     """Beacon Extractor implementing Local + Global Beacon Logic with tree view."""
 
-    def __init__(self, source_code: str):
+    def __init__(self, source_code: str, parse: bool = True):
         self.source_code = source_code.splitlines()
-        self.tree = ast.parse(source_code)
-
-        # Node bookkeeping
-        self.node_lines: Dict[int, int] = {}        # node_id -> lineno
-        self.node_func: Dict[int, str] = {}         # node_id -> function name (or "<module>")
-        self.node_ast: Dict[int, ast.AST] = {}      # node_id -> AST node
+        self._source = source_code
+        self._lines: Optional[List[str]] = None
+        # parse=False defers parsing until `tree` is accessed (used by reanalyze)
+        self._tree: Optional[ast.Module] = ast.parse(source_code) if parse else None
 
-        # Function ranges: name -> (start_line, end_line)
+        # Module-related
+        self.module_name = "<module>"
+        self.current_func: str = self.module_name
+        # "Outer.Inner." while directly inside class bodies (methods are named Class.method)
+        self._scope_prefix = ""
+        # Class of the method being visited (for self.m() / cls.m() calls), nested functions included
+        self.current_class: Optional[str] = None
+
+        # Node bookkeeping: dense node ids with array-backed columns.
+        # node_lines / node_func are read-only Mapping views over the columns.
+        self.nodes = NodeTable()
+        self.func_names: List[str] = [self.module_name]       # func index -> name
+        self.func_index: Dict[str, int] = {self.module_name: 0}
+        self.node_lines = _LineView(self.nodes)                # node_id -> lineno
+        self.node_func = _FuncView(self.nodes, self.func_names)  # node_id -> function name
+
+        # Callee name of Call nodes whose func is a plain Name: node_id -> callee
+        self.call_targets: Dict[int, str] = {}
+
+        # Function ranges: name -> (start_line, end_line); methods as "Class.method"
         self.func_ranges: Dict[str, Tuple[int, int]] = {}
 
-        # Dependency graph: consumer_node -> set(producer_node)
-        self.dep_graph: Dict[int, Set[int]] = defaultdict(set)
+        # Class ranges: qualified class name -> (start_line, end_line)
+        self.class_ranges: Dict[str, Tuple[int, int]] = {}
+
+        # Dependency edges (consumer -> producer), compressed into a CSR graph on demand
+        self._edge_src = array("i")
+        self._edge_dst = array("i")
+        self._csr: Optional[CSRGraph] = None
+
+        # Closure memoization, rebuilt whenever the CSR graph is rebuilt.
+        # _local_memo: (max_per_func, mode) -> func -> reduced local beacons (filled lazily)
+        self._visited = False
+        self._memo_graph: Optional[CSRGraph] = None
+        self._local_memo: Dict[Tuple[Optional[int], str], Dict[str, List[int]]] = {}
+        self._reach_memo: Dict[int, FrozenSet[int]] = {}
+        self._reach_memo_size = 0
+        self._reach_memo_budget = 0
+        self._module_comp = array("i")
+        self._module_comps: List[List[int]] = []
+        self._module_escapes = False
 
         # Output nodes per function: func -> set(node_id)
         self.output_nodes: Dict[str, Set[int]] = defaultdict(set)
@@ -49,29 +271,71 @@ class BeaconExtractor(ast.NodeVisitor):
         # Call graph: func -> set(callee_names)
         self.calls: Dict[str, Set[str]] = defaultdict(set)
 
+        # Dotted attribute calls (e.g. "np.mean", "utils.load"): func -> set(dotted names)
+        self.attr_calls: Dict[str, Set[str]] = defaultdict(set)
+
+        # Imported names: local alias -> imported dotted name (relative imports keep leading dots)
+        self.imports: Dict[str, str] = {}
+
         # Variable definitions: func -> var_name -> list[node_id of Assign]
         self.var_defs: Dict[str, Dict[str, List[int]]] = defaultdict(
             lambda: defaultdict(list)
         )
 
-        # Module-related
-        self.module_name = "<module>"
-        self.current_func: str = self.module_name
+        # Incremental bookkeeping (see reanalyze):
+        # top-level function -> (first node id, end node id, module nodes recorded before it)
+        self.segments: Dict[str, Tuple[int, int, int]] = {}
+        self._module_nids = array("i")          # module-level node ids in visit order
+        self._import_log: List[Tuple[str, str]] = []
+        self._import_spans: Dict[str, Tuple[int, int]] = {}
+        self._duplicate_funcs = False            # a function name is defined more than once
+        self._top_level: Optional[List["_PendingStmt"]] = None
+        self._reuse: Optional["_ReusePlan"] = None
+        self.reused_functions: List[str] = []
 
     # =========================================================
     # Utility helpers
     # =========================================================
 
-    def _id(self, node: ast.AST) -> int:
-        return id(node)
+    @property
+    def tree(self) -> ast.Module:
+        if self._tree is None:
+            self._tree = ast.parse(self._source)
+        return self._tree
 
-    def _record_node(self, node: ast.AST):
-        nid = self._id(node)
-        self.node_ast[nid] = node
+    def _id(self, node: ast.AST) -> int:
+        """Dense node id of a recorded AST node (records it on first use)."""
+        nid = getattr(node, _NID_ATTR, None)
+        if nid is None:
+            nid = self._record_node(node)
+        return nid
+
+    def _func_idx(self, func: str) -> int:
+        idx = self.func_index.get(func)
+        if idx is None:
+            idx = len(self.func_names)
+            self.func_names.append(func)
+            self.func_index[func] = idx
+        return idx
+
+    def _record_node(self, node: ast.AST, kind: Optional[int] = None) -> int:
+        nid = getattr(node, _NID_ATTR, None)
+        if nid is not None:
+            return nid
         lineno = getattr(node, "lineno", None)
-        if lineno is not None:
-            self.node_lines[nid] = lineno
-        self.node_func[nid] = self.current_func
+        if kind is None:
+            kind = _KIND_OF.get(type(node), KIND_OTHER)
+        score = _KIND_SCORE[kind] if kind != KIND_ASSIGN else self._score_node(node)
+        nid = self.nodes.add(
+            NO_LINE if lineno is None else lineno,
+            self._func_idx(self.current_func),
+            kind,
+            score,
+        )
+        setattr(node, _NID_ATTR, nid)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            self.call_targets[nid] = node.func.id
+        return nid
 
     def _safe_get_line(self, node_id: int) -> str:
         lineno = self.node_lines.get(node_id)
@@ -81,55 +345,189 @@ class BeaconExtractor(ast.NodeVisitor):
             return self.source_code[lineno - 1].rstrip("\n")
         return ""
 
+    @property
+    def dep_graph(self) -> CSRGraph:
+        """Dependency graph consumer_node -> producers, as a CSR adjacency."""
+        if self._csr is None or self._csr.n != len(self.nodes):
+            self._csr = CSRGraph(len(self.nodes), self._edge_src, self._edge_dst)
+        return self._csr
+
+    def _add_edge(self, consumer: int, producer: int):
+        self._edge_src.append(consumer)
+        self._edge_dst.append(producer)
+        self._csr = None
+
     # =========================================================
     # Dependency helpers
     # =========================================================
 
-    def _extract_identifiers(self, node: ast.AST) -> List[ast.Name]:
-        """Recursively extract all ast.Name nodes inside `node`."""
-        ids: List[ast.Name] = []
-        for child in ast.walk(node):
-            if isinstance(child, ast.Name):
-                ids.append(child)
-        return ids
+    def _collect_uses(self, node: ast.AST, names: List[ast.Name], calls: List[list]):
+        """
+        Single pass over an expression subtree.
+
+        Appends every ast.Name under `node` to `names` (each node is visited once)
+        and every ast.Call to `calls` in pre-order as [call, start, end], where
+        names[start:end] are the identifiers used in the call's args / keywords.
+        """
+        if isinstance(node, ast.Name):
+            names.append(node)
+            return
+        if isinstance(node, ast.Call):
+            entry = [node, 0, 0]
+            calls.append(entry)
+            self._collect_uses(node.func, names, calls)
+            entry[1] = len(names)
+            for arg in node.args:
+                self._collect_uses(arg, names, calls)
+            for kw in node.keywords:
+                self._collect_uses(kw.value, names, calls)
+            entry[2] = len(names)
+            return
+        if isinstance(node, _COMPREHENSIONS):
+            self._collect_comprehension(node, names, calls, frozenset())
+            return
+        for child in ast.iter_child_nodes(node):
+            self._collect_uses(child, names, calls)
+
+    def _collect_comprehension(self, node: ast.AST, names: List[ast.Name], calls: List[list],
+                               bound: FrozenSet[str]):
+        """
+        _collect_uses for a comprehension: its loop variables are local to it, so
+        they are neither uses (targets) nor linked to outer definitions (elt / ifs).
+        The first iterable is evaluated in the enclosing scope.
+        """
+        for gen in node.generators:
+            self._collect_bound(gen.iter, names, calls, bound)
+            bound = bound | {n.id for n in ast.walk(gen.target) if isinstance(n, ast.Name)}
+            for cond in gen.ifs:
+                self._collect_bound(cond, names, calls, bound)
+        if isinstance(node, ast.DictComp):
+            self._collect_bound(node.key, names, calls, bound)
+            self._collect_bound(node.value, names, calls, bound)
+        else:
+            self._collect_bound(node.elt, names, calls, bound)
+
+    def _collect_bound(self, node: ast.AST, names: List[ast.Name], calls: List[list],
+                       bound: FrozenSet[str]):
+        """_collect_uses skipping names bound by enclosing comprehensions."""
+        if not bound:
+            self._collect_uses(node, names, calls)
+            return
+        if isinstance(node, ast.Name):
+            if node.id not in bound:
+                names.append(node)
+            return
+        if isinstance(node, ast.Call):
+            entry = [node, 0, 0]
+            calls.append(entry)
+            self._collect_bound(node.func, names, calls, bound)
+            entry[1] = len(names)
+            for arg in node.args:
+                self._collect_bound(arg, names, calls, bound)
+            for kw in node.keywords:
+                self._collect_bound(kw.value, names, calls, bound)
+            entry[2] = len(names)
+            return
+        if isinstance(node, _COMPREHENSIONS):
+            self._collect_comprehension(node, names, calls, bound)
+            return
+        for child in ast.iter_child_nodes(node):
+            self._collect_bound(child, names, calls, bound)
 
-    def _add_dep(self, node: ast.AST, value: ast.AST):
+    def _add_uses(self, nid: int, name_nodes: List[ast.Name]):
         """
-        Add dependencies: node <- identifiers used in value,
+        Add dependencies: node <- identifiers used,
         and link identifiers to their definitions (var_defs).
 
         This is our over-approximate Dep relation.
         """
-        if value is None:
+        if not name_nodes:
             return
-        nid = self._id(node)
-        for name_node in self._extract_identifiers(value):
-            name_id = self._id(name_node)
+        var_names: Set[str] = set()
+        for name_node in name_nodes:
             # Expression-level dependency: current node depends on this Name occurrence
-            self.dep_graph[nid].add(name_id)
-            self._record_node(name_node)
-
-            var_name = name_node.id
+            self._add_edge(nid, self._record_node(name_node))
+            var_names.add(name_node.id)
 
+        local_defs = self.var_defs[self.current_func]
+        module_defs = self.var_defs[self.module_name]
+        for var_name in var_names:
             # Definitions in current function
-            for def_id in self.var_defs[self.current_func].get(var_name, []):
-                self.dep_graph[nid].add(def_id)
+            for def_id in local_defs.get(var_name, ()):
+                self._add_edge(nid, def_id)
 
             # Definitions at module level (globals / constants)
-            for def_id in self.var_defs[self.module_name].get(var_name, []):
-                self.dep_graph[nid].add(def_id)
+            for def_id in module_defs.get(var_name, ()):
+                self._add_edge(nid, def_id)
+
+    def _process_calls(self, calls: List[list], names: List[ast.Name]):
+        """Record collected calls (outer before inner): outputs, arg dependencies, call graph."""
+        for node, start, end in calls:
+            nid = self._record_node(node)
+
+            # print(...) is treated as output
+            if isinstance(node.func, ast.Name) and node.func.id == "print":
+                self.output_nodes[self.current_func].add(nid)
+
+            # Dependencies from args and keywords
+            self._add_uses(nid, names[start:end])
+
+            # Call graph
+            if isinstance(node.func, ast.Name):
+                callee = node.func.id
+                self.calls[self.current_func].add(callee)
+            elif isinstance(node.func, ast.Attribute):
+                dotted = _dotted_name(node.func)
+                if dotted is not None:
+                    self.attr_calls[self.current_func].add(dotted)
+                    # self.m() / cls.m() inside a method: a call to Class.m
+                    receiver = node.func.value
+                    if (self.current_class is not None and isinstance(receiver, ast.Name)
+                            and receiver.id in ("self", "cls")):
+                        self.calls[self.current_func].add(f"{self.current_class}.{node.func.attr}")
 
     # =========================================================
     # AST visitor methods
     # =========================================================
 
     def visit_Module(self, node: ast.Module):
+        self._visit_top_level(node.body)
+
+    def _visit_top_level(self, stmts: List):
+        """
+        Visit top-level statements in order. Top-level functions are the unit of
+        incremental re-analysis: their node range is kept in `segments`, and during
+        reanalyze an unchanged one is copied instead of visited. Entries may also
+        be _PendingStmt (not parsed yet), which are parsed only if visited.
+        """
+        self._visited = True
         self.current_func = self.module_name
-        self.generic_visit(node)
+        node_func = self.nodes.func
+        reuse = self._reuse
+        for stmt in stmts:
+            lo = len(self.nodes)
+            name = stmt.name if isinstance(stmt, (_PendingStmt, _FUNCTION_DEFS)) else None
+            if name is not None:
+                n_module = len(self._module_nids)
+                imports_lo = len(self._import_log)
+                if reuse is None or not reuse.splice(self, stmt):
+                    self.visit(self._parse_stmt(stmt) if isinstance(stmt, _PendingStmt) else stmt)
+                self.segments[name] = (lo, len(self.nodes), n_module)
+                self._import_spans[name] = (imports_lo, len(self._import_log))
+            else:
+                self.visit(self._parse_stmt(stmt) if isinstance(stmt, _PendingStmt) else stmt)
+                self._module_nids.extend(
+                    nid for nid in range(lo, len(self.nodes)) if node_func[nid] == 0
+                )
 
     def visit_FunctionDef(self, node: ast.FunctionDef):
-        prev_func = self.current_func
-        self.current_func = node.name
+        prev_func, prev_prefix, prev_class = self.current_func, self._scope_prefix, self.current_class
+        name = prev_prefix + node.name
+        if prev_prefix:
+            # a method: Class.method
+            self.current_class = prev_prefix[:-1]
+        self.current_func = name
+        self._scope_prefix = ""
         self._record_node(node)
 
         start = getattr(node, "lineno", None)
@@ -137,10 +535,27 @@ class BeaconExtractor(ast.NodeVisitor):
         if start is not None:
             if end is None:
                 end = start
-            self.func_ranges[node.name] = (start, end)
+            if name in self.func_ranges:
+                self._duplicate_funcs = True
+            self.func_ranges[name] = (start, end)
 
         self.generic_visit(node)
-        self.current_func = prev_func
+        self.current_func, self._scope_prefix, self.current_class = prev_func, prev_prefix, prev_class
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        prefix = self._scope_prefix
+        qualname = prefix + node.name
+        self.class_ranges[qualname] = (node.lineno, node.end_lineno or node.lineno)
+
+        # decorators / bases are evaluated in the enclosing scope, the body in the class scope
+        for child in node.decorator_list + node.bases + [kw.value for kw in node.keywords]:
+            self.visit(child)
+        self._scope_prefix = qualname + "."
+        for stmt in node.body:
+            self.visit(stmt)
+        self._scope_prefix = prefix
 
     def visit_Assign(self, node: ast.Assign):
         """
@@ -148,14 +563,28 @@ class BeaconExtractor(ast.NodeVisitor):
         - simple: x = ...
         - mutable: df[c] = ...  (treated as W(df))
         """
-        self._record_node(node)
-        nid = self._id(node)
+        self._visit_assign(node, node.targets, node.value)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign):
+        # x: T = ...  (a bare annotation "x: T" defines nothing)
+        if node.value is not None:
+            self._visit_assign(node, [node.target], node.value)
 
-        # RHS dependencies
-        self._add_dep(node, node.value)
+    def _visit_assign(self, node: ast.stmt, targets: List[ast.expr], value: ast.expr):
+        nid = self._record_node(node)
+
+        # RHS dependencies (the value subtree is walked once; nested calls are kept for later)
+        names: List[ast.Name] = []
+        calls: List[list] = []
+        self._collect_uses(value, names, calls)
+        self._add_uses(nid, names)
+
+        # y = yield x: the yielded value is observable
+        if isinstance(value, (ast.Yield, ast.YieldFrom)):
+            self.output_nodes[self.current_func].add(nid)
 
         # Record definitions for targets
-        for target in node.targets:
+        for target in targets:
             # simple variable: x = ...
             if isinstance(target, ast.Name):
                 var_name = target.id
@@ -168,11 +597,42 @@ class BeaconExtractor(ast.NodeVisitor):
                 self.var_defs[self.current_func][base_name].append(nid)
                 self._record_node(target.value)
 
-        self.generic_visit(node)
+        # Calls see the new definitions, targets before value (same order as generic_visit)
+        for target in targets:
+            self.visit(target)
+        self._process_calls(calls, names)
+
+    def visit_With(self, node: ast.With):
+        """with ctx as x: binds x like x = ctx; the body is visited as usual."""
+        for item in node.items:
+            if item.optional_vars is None:
+                self.visit(item.context_expr)
+            else:
+                self._visit_assign(node, [item.optional_vars], item.context_expr)
+        for stmt in node.body:
+            self.visit(stmt)
+
+    visit_AsyncWith = visit_With
+
+    def visit_AugAssign(self, node: ast.AugAssign):
+        """x += ... reads and writes x (df[c] += ... reads and writes df)."""
+        nid = self._record_node(node)
+
+        names: List[ast.Name] = []
+        calls: List[list] = []
+        self._collect_uses(node.value, names, calls)
+        self._collect_uses(node.target, names, calls)
+        self._add_uses(nid, names)
+
+        target = node.target
+        if isinstance(target, ast.Name):
+            self.var_defs[self.current_func][target.id].append(nid)
+        elif isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name):
+            self.var_defs[self.current_func][target.value.id].append(nid)
+        self._process_calls(calls, names)
 
     def visit_Return(self, node: ast.Return):
-        self._record_node(node)
-        nid = self._id(node)
+        nid = self._record_node(node)
 
         # Mark as output node (observable behavior)
         self.output_nodes[self.current_func].add(nid)
@@ -184,34 +644,90 @@ class BeaconExtractor(ast.NodeVisitor):
 
         # Dependencies from return expression
         if node.value is not None:
-            self._add_dep(node, node.value)
-
-        self.generic_visit(node)
+            names: List[ast.Name] = []
+            calls: List[list] = []
+            self._collect_uses(node.value, names, calls)
+            self._add_uses(nid, names)
+            self._process_calls(calls, names)
 
     def visit_Expr(self, node: ast.Expr):
-        self._record_node(node)
-        self.generic_visit(node)
-
-    def visit_Call(self, node: ast.Call):
-        self._record_node(node)
-        nid = self._id(node)
-
-        # print(...) is treated as output
-        if isinstance(node.func, ast.Name) and node.func.id == "print":
-            self.output_nodes[self.current_func].add(nid)
-
-        # Dependencies from args and keywords
-        for arg in node.args:
-            self._add_dep(node, arg)
-        for kw in node.keywords:
-            self._add_dep(node, kw.value)
+        value = node.value
+        if not isinstance(value, (ast.Yield, ast.YieldFrom)):
+            self._record_node(node)
+            self.generic_visit(node)
+            return
 
-        # Call graph
-        if isinstance(node.func, ast.Name):
-            callee = node.func.id
-            self.calls[self.current_func].add(callee)
+        # yield x: an output of the generator, like return
+        nid = self._record_node(node, KIND_YIELD)
+        self.output_nodes[self.current_func].add(nid)
+        if value.value is not None:
+            names: List[ast.Name] = []
+            calls: List[list] = []
+            self._collect_uses(value.value, names, calls)
+            self._add_uses(nid, names)
+            self._process_calls(calls, names)
+
+    def _add_import(self, alias: str, target: str):
+        self.imports[alias] = target
+        self._import_log.append((alias, target))
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            if alias.asname:
+                self._add_import(alias.asname, alias.name)
+            else:
+                top = alias.name.split(".")[0]
+                self._add_import(top, top)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        # Relative imports keep their leading dots, e.g. "from .utils import f" -> ".utils.f"
+        base = "." * (node.level or 0) + (node.module or "")
+        for alias in node.names:
+            if alias.name == "*":
+                continue
+            sep = "." if node.module else ""
+            self._add_import(alias.asname or alias.name, f"{base}{sep}{alias.name}")
 
-        self.generic_visit(node)
+    def visit_Call(self, node: ast.Call):
+        # A call reached by generic_visit (e.g. in an Expr / If / For): handle its whole subtree at once
+        names: List[ast.Name] = []
+        calls: List[list] = []
+        self._collect_uses(node, names, calls)
+        self._process_calls(calls, names)
+
+    # Node type -> handler. visit() looks handlers up by type instead of building
+    # "visit_" + class name and calling getattr for every node.
+    _DISPATCH = {
+        ast.Module: visit_Module,
+        ast.FunctionDef: visit_FunctionDef,
+        ast.AsyncFunctionDef: visit_AsyncFunctionDef,
+        ast.ClassDef: visit_ClassDef,
+        ast.Assign: visit_Assign,
+        ast.AnnAssign: visit_AnnAssign,
+        ast.AugAssign: visit_AugAssign,
+        ast.With: visit_With,
+        ast.AsyncWith: visit_AsyncWith,
+        ast.Return: visit_Return,
+        ast.Expr: visit_Expr,
+        ast.Import: visit_Import,
+        ast.ImportFrom: visit_ImportFrom,
+        ast.Call: visit_Call,
+    }
+
+    def visit(self, node: ast.AST):
+        return self._DISPATCH.get(node.__class__, BeaconExtractor.generic_visit)(self, node)
+
+    def generic_visit(self, node: ast.AST):
+        dispatch = self._DISPATCH
+        generic = BeaconExtractor.generic_visit
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        dispatch.get(item.__class__, generic)(self, item)
+            elif isinstance(value, ast.AST):
+                dispatch.get(value.__class__, generic)(self, value)
 
     # =========================================================
     # Local Logic: per-function Beacon closure
@@ -221,40 +737,228 @@ class BeaconExtractor(ast.NodeVisitor):
         """
         Backward closure from outputs of a given function.
         Includes dependencies inside that function and module-level defs.
+
+        The function-local part is a DFS that stops at module-level nodes; the
+        module-level part comes from reach sets memoized per SCC of the module
+        subgraph, shared by all functions that reference the same definitions.
         """
         outputs = self.output_nodes.get(func, set())
-        visited: Set[int] = set()
+        if not outputs:
+            return set()
+
+        self._sync_closure_memo()
+        if func == self.module_name or self._module_escapes:
+            return self._closure_dfs(func)
+
+        graph = self.dep_graph
+        indptr, indices = graph.indptr, graph.indices
+        node_func = self.nodes.func
+        comp = self._module_comp
+        fidx = self.func_index.get(func, -1)
+        visited = bytearray(len(self.nodes))
+        result: List[int] = []
+        entry_comps: Set[int] = set()
         stack: List[int] = list(outputs)
 
         while stack:
             nid = stack.pop()
-            if nid in visited:
+            if visited[nid]:
                 continue
+            visited[nid] = 1
 
-            # Only consider nodes from this function or module
-            f = self.node_func.get(nid, self.module_name)
-            if f not in (func, self.module_name):
+            f = node_func[nid]
+            if f == 0:
+                # Module-level node: its closure is shared through the SCC memo
+                entry_comps.add(comp[nid])
+                continue
+            if f != fidx:
                 continue
 
-            visited.add(nid)
-            for dep in self.dep_graph.get(nid, ()):
-                if dep not in visited:
+            result.append(nid)
+            for k in range(indptr[nid], indptr[nid + 1]):
+                dep = indices[k]
+                if not visited[dep]:
                     stack.append(dep)
 
-        return visited
+        closure = set(result)
+        for c in entry_comps:
+            closure |= self._module_reach(c)
+        return closure
+
+    def _closure_dfs(self, func: str) -> Set[int]:
+        """Reference closure: plain DFS restricted to nodes of `func` and the module."""
+        graph = self.dep_graph
+        indptr, indices = graph.indptr, graph.indices
+        node_func = self.nodes.func
+        fidx = self.func_index.get(func, -1)
+        visited = bytearray(len(self.nodes))
+        result: List[int] = []
+        stack: List[int] = list(self.output_nodes.get(func, ()))
+
+        while stack:
+            nid = stack.pop()
+            if visited[nid]:
+                continue
+
+            # Only consider nodes from this function or module (func index 0)
+            f = node_func[nid]
+            if f != fidx and f != 0:
+                continue
+
+            visited[nid] = 1
+            result.append(nid)
+            for k in range(indptr[nid], indptr[nid + 1]):
+                dep = indices[k]
+                if not visited[dep]:
+                    stack.append(dep)
+
+        return set(result)
+
+    def _sync_closure_memo(self):
+        """(Re)build the module-level SCCs when the dependency graph has changed."""
+        graph = self.dep_graph
+        if self._memo_graph is graph:
+            return
+        self._memo_graph = graph
+        self._local_memo = {}
+        self._reach_memo = {}
+        self._reach_memo_size = 0
+        self._reach_memo_budget = 4 * len(self.nodes) + 4096
+        self._module_comp, self._module_comps, self._module_escapes = self._module_components()
+
+    def _module_components(self) -> Tuple[array, List[List[int]], bool]:
+        """
+        Iterative Tarjan SCC over the module-level subgraph.
+
+        Returns (comp, comps, escapes): comp[nid] is the SCC index of a module-level
+        node (-1 otherwise); comps are emitted in reverse topological order, so every
+        successor SCC has a smaller index (used as memo keys); escapes is True if a module-level node
+        depends on a function-level node (then closures fall back to plain DFS).
+        """
+        graph = self.dep_graph
+        indptr, indices = graph.indptr, graph.indices
+        node_func = self.nodes.func
+        n = len(self.nodes)
+
+        comp = array("i", [-1]) * n
+        index = array("i", [-1]) * n
+        low = array("i", [0]) * n
+        on_stack = bytearray(n)
+        scc_stack: List[int] = []
+        comps: List[List[int]] = []
+        escapes = False
+        counter = 0
+
+        for root in range(n):
+            if node_func[root] != 0 or index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            scc_stack.append(root)
+            on_stack[root] = 1
+            work: List[List[int]] = [[root, indptr[root]]]
+
+            while work:
+                frame = work[-1]
+                v, k = frame
+                end = indptr[v + 1]
+                descended = False
+                while k < end:
+                    w = indices[k]
+                    k += 1
+                    if node_func[w] != 0:
+                        escapes = True
+                        continue
+                    if index[w] == -1:
+                        frame[1] = k
+                        index[w] = low[w] = counter
+                        counter += 1
+                        scc_stack.append(w)
+                        on_stack[w] = 1
+                        work.append([w, indptr[w]])
+                        descended = True
+                        break
+                    if on_stack[w] and index[w] < low[v]:
+                        low[v] = index[w]
+                if descended:
+                    continue
+
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    if low[v] < low[u]:
+                        low[u] = low[v]
+                if low[v] == index[v]:
+                    members: List[int] = []
+                    while True:
+                        w = scc_stack.pop()
+                        on_stack[w] = 0
+                        comp[w] = len(comps)
+                        members.append(w)
+                        if w == v:
+                            break
+                    comps.append(members)
+
+        return comp, comps, escapes
+
+    def _module_reach(self, c: int) -> FrozenSet[int]:
+        """
+        Module-level nodes reachable from SCC `c`, memoized per SCC.
+
+        Only SCCs that functions actually enter are memoized (within a size budget);
+        the DFS reuses the memoized set of any other SCC it runs into instead of
+        walking through it.
+        """
+        memo = self._reach_memo
+        cached = memo.get(c)
+        if cached is not None:
+            return cached
+
+        graph = self.dep_graph
+        indptr, indices = graph.indptr, graph.indices
+        comp = self._module_comp
+        members = self._module_comps[c]
+        reach: Set[int] = set(members)
+        stack: List[int] = list(members)
+
+        while stack:
+            v = stack.pop()
+            for k in range(indptr[v], indptr[v + 1]):
+                w = indices[k]
+                if w in reach:
+                    continue
+                s = comp[w]
+                if s == -1:
+                    continue
+                shared = memo.get(s)
+                if shared is not None:
+                    reach |= shared
+                    continue
+                reach.add(w)
+                stack.append(w)
+
+        result = frozenset(reach)
+        # Keep the memo within a budget proportional to the graph size, so chains of
+        # module-level definitions cannot make it quadratic in memory
+        if self._reach_memo_size + len(result) <= self._reach_memo_budget:
+            memo[c] = result
+            self._reach_memo_size += len(result)
+        return result
 
     def filter_validation_local(self, func: str, beacons: Set[int]) -> Set[int]:
         """Filter validation returns for a given function."""
         valids = self.validation_returns.get(func, set())
         return {nid for nid in beacons if nid not in valids}
 
-    def _score_node(self, node: ast.AST) -> int:
+    @staticmethod
+    def _score_node(node: ast.AST) -> int:
         """
-        Heuristic importance score for reduction:
+        Heuristic importance score for reduction (stored in NodeTable.score):
         - Return: 100
         - Call: 90
         - Assign(Call): 80
         - Assign(Subscript...): 70 (e.g., df[c] = ...)
+        - with ctx as x: scored like x = ctx
         - If / For / While: 40
         - Others: 10
         """
@@ -264,15 +968,21 @@ class BeaconExtractor(ast.NodeVisitor):
         if isinstance(node, ast.Call):
             return 90
 
-        if isinstance(node, ast.Assign):
+        if isinstance(node, (ast.Assign, ast.AugAssign, ast.AnnAssign)):
             if isinstance(node.value, ast.Call):
                 return 80
             # Assign to subscript: df[c] = ...
-            for t in node.targets:
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for t in targets:
                 if isinstance(t, ast.Subscript):
                     return 70
             return 50
 
+        if isinstance(node, (ast.With, ast.AsyncWith)):
+            if any(isinstance(item.context_expr, ast.Call) for item in node.items):
+                return 80
+            return 50
+
         if isinstance(node, (ast.If, ast.For, ast.While)):
             return 40
 
@@ -292,28 +1002,22 @@ class BeaconExtractor(ast.NodeVisitor):
         - Prioritize higher-score nodes
         - In compact mode, drop low-score nodes (noise)
         """
-        line_to_nodes: Dict[int, List[int]] = defaultdict(list)
+        node_line, node_score = self.nodes.line, self.nodes.score
+
+        # line -> (score, node_id) of the best node on that line; ties keep the lowest id
+        best: Dict[int, Tuple[int, int]] = {}
         for nid in beacons:
-            if nid not in self.node_lines:
+            line = node_line[nid]
+            if line == NO_LINE:
                 continue
-            line = self.node_lines[nid]
-            line_to_nodes[line].append(nid)
+            score = node_score[nid]
+            cur = best.get(line)
+            if cur is None or score > cur[0] or (score == cur[0] and nid < cur[1]):
+                best[line] = (score, nid)
 
-        scored: List[Tuple[int, int, int]] = []  # (score, line, node_id)
-
-        for line, nodes in line_to_nodes.items():
-            best_nid = None
-            best_score = -1
-            for nid in nodes:
-                node = self.node_ast.get(nid)
-                if node is None:
-                    continue
-                score = self._score_node(node)
-                if score > best_score:
-                    best_score = score
-                    best_nid = nid
-            if best_nid is not None:
-                scored.append((best_score, line, best_nid))
+        scored: List[Tuple[int, int, int]] = [  # (score, line, node_id)
+            (score, line, nid) for line, (score, nid) in best.items()
+        ]
 
         # Sort by score desc, then by line asc
         scored.sort(key=lambda x: (-x[0], x[1]))
@@ -362,13 +1066,53 @@ class BeaconExtractor(ast.NodeVisitor):
             if f in visited:
                 continue
             visited.add(f)
-            for callee in self.calls.get(f, set()):
-                # Only consider functions we know
-                if callee in self.func_ranges or callee == self.module_name:
-                    stack.append(callee)
+            stack.extend(self._known_callees(f))
 
         return visited
 
+    def _known_callees(self, func: str) -> Iterator[str]:
+        """
+        Functions of this file called by `func`: plain and self./cls. calls,
+        dotted calls naming a known function ("Class.method"), and class
+        instantiation ("Class(...)" -> "Class.__init__").
+        """
+        for callee in self.calls.get(func, ()):
+            # Only consider functions we know
+            if callee in self.func_ranges or callee == self.module_name:
+                yield callee
+            elif callee in self.class_ranges and f"{callee}.__init__" in self.func_ranges:
+                yield f"{callee}.__init__"
+        for dotted in self.attr_calls.get(func, ()):
+            if dotted in self.func_ranges:
+                yield dotted
+            elif dotted in self.class_ranges and f"{dotted}.__init__" in self.func_ranges:
+                yield f"{dotted}.__init__"
+
+    def _ensure_visited(self):
+        if not self._visited:
+            self.visit(self.tree)
+
+    def local_beacons_for(
+        self,
+        func: str,
+        max_per_func: int = 20,
+        mode: str = "compact",
+    ) -> List[int]:
+        """
+        Reduced local beacons of one function, computed on first request.
+        Memoized per (max_per_func, mode) until the dependency graph changes.
+        """
+        self._ensure_visited()
+        self._sync_closure_memo()
+        memo = self._local_memo.setdefault((max_per_func, mode), {})
+        reduced = memo.get(func)
+        if reduced is None:
+            closure = self.compute_local_closure(func)
+            closure = self.filter_validation_local(func, closure)
+            reduced = self.reduce_local(func, closure, max_per_func=max_per_func, mode=mode)
+            memo[func] = reduced
+        return list(reduced)
+
     def compute_all_local_beacons(
         self,
         max_per_func: int = 20,
@@ -376,15 +1120,37 @@ class BeaconExtractor(ast.NodeVisitor):
     ) -> Dict[str, List[int]]:
         """
         Compute reduced local beacons for all functions (including <module>).
+        Functions already computed (e.g. by beacons_for_entry) are taken from the memo.
         """
         all_funcs = set(self.func_ranges.keys()) | {self.module_name}
-        result: Dict[str, List[int]] = {}
-        for func in all_funcs:
-            closure = self.compute_local_closure(func)
-            closure = self.filter_validation_local(func, closure)
-            reduced = self.reduce_local(func, closure, max_per_func=max_per_func, mode=mode)
-            result[func] = reduced
-        return result
+        return {
+            func: self.local_beacons_for(func, max_per_func=max_per_func, mode=mode)
+            for func in all_funcs
+        }
+
+    def beacons_for_entry(
+        self,
+        entry: str,
+        max_per_func: int = 20,
+        mode: str = "compact",
+    ) -> List[int]:
+        """
+        Program-level beacons of one entry: the union of the local beacons of every
+        function reachable from it (plus <module>), ordered by line.
+
+        Only the reachable functions' closures are computed, so the cost follows
+        the size of the reachable part of the program, not of the whole file.
+        """
+        self._ensure_visited()
+        reachable = self.reachable_functions_from(entry)
+        # always include module-level beacons
+        reachable.add(self.module_name)
+
+        collected: Set[int] = set()
+        for f in reachable:
+            if f in self.func_ranges or f == self.module_name:
+                collected.update(self.local_beacons_for(f, max_per_func=max_per_func, mode=mode))
+        return sorted(collected, key=lambda nid: self.node_lines.get(nid, 999999))
 
     def compute_program_beacons(
         self,
@@ -396,26 +1162,14 @@ class BeaconExtractor(ast.NodeVisitor):
         Program-level Beacons:
         - find entry points
         - for each entry, find reachable functions
-        - union their local beacons
+        - union their local beacons (computed lazily, see beacons_for_entry)
         """
-        local_beacons = self.compute_all_local_beacons(max_per_func=max_per_func, mode=mode)
+        self._ensure_visited()
         entries = self.find_entry_points(explicit_entry=explicit_entry)
-
-        program_beacons: Dict[str, List[int]] = {}
-
-        for entry in entries:
-            reachable = self.reachable_functions_from(entry)
-            # always include module-level beacons
-            reachable.add(self.module_name)
-
-            collected: Set[int] = set()
-            for f in reachable:
-                collected.update(local_beacons.get(f, []))
-
-            ordered = sorted(collected, key=lambda nid: self.node_lines.get(nid, 999999))
-            program_beacons[entry] = ordered
-
-        return program_beacons
+        return {
+            entry: self.beacons_for_entry(entry, max_per_func=max_per_func, mode=mode)
+            for entry in entries
+        }
 
     # =========================================================
     # Pretty-print reasoning (flat)
@@ -482,6 +1236,8 @@ class BeaconExtractor(ast.NodeVisitor):
         self,
         program_beacons: Dict[str, List[int]],
         explicit_entry: str | None = None,
+        max_depth: Optional[int] = None,
+        max_children: Optional[int] = None,
     ):
         """
         Print a derivation-tree-like view of program beacons:
@@ -491,136 +1247,220 @@ class BeaconExtractor(ast.NodeVisitor):
         - Call sites annotated with "→ calls f(...)"
         """
         print("\n=== PROGRAM-LEVEL BEACON TREE (derivation-style) ===")
+        sys.stdout.flush()
+        self.write_program_beacon_tree(program_beacons, sys.stdout, explicit_entry=explicit_entry,
+                                       max_depth=max_depth, max_children=max_children)
+
+    def write_program_beacon_tree(
+        self,
+        program_beacons: Dict[str, List[int]],
+        out: IO[str],
+        fmt: str = "text",
+        explicit_entry: Optional[str] = None,
+        max_depth: Optional[int] = None,
+        max_children: Optional[int] = None,
+    ):
+        """
+        Write the Beacon Tree to `out` as "text" (the print_program_beacon_tree view),
+        "json" (nested nodes) or "dot" (Graphviz).
+
+        The tree is built iteratively, so deep dependency chains do not hit the
+        recursion limit. max_depth cuts the dependencies below that depth and
+        max_children keeps the first children of each node by line; what is cut
+        is reported as "... (+N not shown)".
+        """
+        renderer = _TREE_RENDERERS.get(fmt)
+        if renderer is None:
+            raise ValueError(f"unknown tree format {fmt!r}; choose from {', '.join(_TREE_RENDERERS)}")
+        events = self._iter_tree_events(program_beacons, explicit_entry, max_depth, max_children)
+        renderer(self, out).render(events)
+
+    def _iter_tree_events(
+        self,
+        program_beacons: Dict[str, List[int]],
+        explicit_entry: Optional[str],
+        max_depth: Optional[int],
+        max_children: Optional[int],
+    ) -> Iterator[tuple]:
+        """
+        The Beacon Tree in pre-order as flat events, shared by the renderers:
+            ("entry", entry)                      an entry point
+            ("module", nid)                       a module-level beacon of it
+            ("func", func, is_last)               a function subtree
+            ("node", nid, depth, is_last, repeated, callee)
+            ("more", depth, count)                children not shown at `depth`
+        `repeated` nodes were shown earlier in the function and are not expanded;
+        `callee` is set for calls to reachable functions of this file.
+        """
+        line_col, func_col, func_names = self.nodes.line, self.nodes.func, self.func_names
+        by_line = lambda x: 999999 if line_col[x] == NO_LINE else line_col[x]
+        graph = self.dep_graph
+        indptr, indices = graph.indptr, graph.indices
 
         for entry, nodes in program_beacons.items():
             # If user specified entry, skip others
             if explicit_entry is not None and entry != explicit_entry:
                 continue
+            yield ("entry", entry)
 
             entry_nodes = set(nodes)
             reachable = self.reachable_functions_from(entry)
 
-            print(f"\nProgram Beacon Tree (Entry = {entry})")
-            print("──────────────────────────────────────────")
-
             # Partition nodes: module-level vs per-function
-            module_nodes = [nid for nid in entry_nodes
-                            if self.node_func.get(nid, self.module_name) == self.module_name]
-
             func_nodes_map: Dict[str, List[int]] = defaultdict(list)
+            module_nodes = []
             for nid in entry_nodes:
-                func = self.node_func.get(nid, self.module_name)
-                if func != self.module_name:
+                func = func_names[func_col[nid]]
+                if func == self.module_name:
+                    module_nodes.append(nid)
+                else:
                     func_nodes_map[func].append(nid)
 
             # 1. Global config cluster
-            if module_nodes:
-                print("┌─ Global config (module-level beacons)")
-                for nid in sorted(module_nodes, key=lambda x: self.node_lines.get(x, 999999)):
-                    line = self.node_lines.get(nid)
-                    code = self._safe_get_line(nid)
-                    print(f"│    [<module>] line {line}: {code}")
-                print("└─ end of global config\n")
+            for nid in sorted(module_nodes, key=by_line):
+                yield ("module", nid)
 
             # 2. Function subtrees
             funcs_sorted = sorted(func_nodes_map.keys())
-
             for i, func in enumerate(funcs_sorted):
-                is_last_func = (i == len(funcs_sorted) - 1)
-                prefix = "└─" if is_last_func else "├─"
-                print(f"{prefix} Function {func}()")
+                yield ("func", func, i == len(funcs_sorted) - 1)
 
                 local_nodes = set(func_nodes_map[func])
                 # roots: output nodes in local_nodes; fallback: nodes not used as deps
                 outputs = self.output_nodes.get(func, set()) & local_nodes
                 if outputs:
-                    roots = sorted(outputs, key=lambda x: self.node_lines.get(x, 999999))
+                    roots = sorted(outputs, key=by_line)
                 else:
                     # nodes that are never a dependency of others in same function
-                    used_as_dep: Set[int] = set()
-                    for nid in local_nodes:
-                        for dep in self.dep_graph.get(nid, ()):
-                            if dep in local_nodes:
-                                used_as_dep.add(dep)
-                    roots = sorted(
-                        [nid for nid in local_nodes if nid not in used_as_dep],
-                        key=lambda x: self.node_lines.get(x, 999999),
-                    )
-
-                visited: Set[int] = set()
-                # child indent prefix for nodes under this function
-                func_indent = "   " if is_last_func else "│  "
-
-                for j, root in enumerate(roots):
-                    is_last_root = (j == len(roots) - 1)
-                    self._print_node_tree(
-                        root,
-                        local_nodes,
-                        reachable,
-                        visited,
-                        indent=func_indent,
-                        is_last=is_last_root,
-                    )
-
-    def _print_node_tree(
-        self,
-        nid: int,
-        local_nodes: Set[int],
-        reachable_funcs: Set[str],
-        visited: Set[int],
-        indent: str,
-        is_last: bool,
-    ):
-        """
-        Recursively print a small tree for a function:
-        - Node is printed as "[func] line X: code"
-        - Children are its dependencies within local_nodes
-        - Call nodes are annotated with "→ calls f(...)"
-        """
-        if nid in visited:
-            # avoid infinite loops on cycles, just mark
-            line = self.node_lines.get(nid)
-            func = self.node_func.get(nid, self.module_name)
-            print(f"{indent}{'└─' if is_last else '├─'} [visited] [{func}] line {line}")
-            return
+                    used_as_dep = {
+                        indices[k] for nid in local_nodes for k in range(indptr[nid], indptr[nid + 1])
+                    }
+                    roots = sorted([nid for nid in local_nodes if nid not in used_as_dep], key=by_line)
+
+                yield from self._iter_subtree_events(roots, local_nodes, reachable, by_line,
+                                                     max_depth, max_children)
+
+    def _iter_subtree_events(self, roots, local_nodes, reachable_funcs, by_line, max_depth, max_children):
+        """Pre-order events of one function's trees, with an explicit stack instead of recursion."""
+        graph = self.dep_graph
+        indptr, indices = graph.indptr, graph.indices
+        visited: Set[int] = set()
 
-        visited.add(nid)
-        line = self.node_lines.get(nid)
-        func = self.node_func.get(nid, self.module_name)
-        code = self._safe_get_line(nid)
-        node = self.node_ast.get(nid)
+        def limited(children: List[int], depth: int) -> Tuple[List[int], int]:
+            # the children shown at `depth`, and how many of them are cut
+            if max_depth is not None and depth > max_depth:
+                return [], len(children)
+            if max_children is not None and len(children) > max_children:
+                return children[:max_children], len(children) - max_children
+            return children, 0
+
+        # stack of (children, next index, depth, hidden count)
+        shown, hidden = limited(roots, 0)
+        stack = [(shown, 0, 0, hidden)]
+        while stack:
+            children, i, depth, hidden = stack[-1]
+            if i == len(children):
+                stack.pop()
+                if hidden:
+                    yield ("more", depth, hidden)
+                continue
+            stack[-1] = (children, i + 1, depth, hidden)
+            nid = children[i]
+            is_last = i == len(children) - 1 and not hidden
 
-        branch = "└─" if is_last else "├─"
-        # Check if node is a call to another beaconed function
-        call_annot = ""
-        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
-            callee = node.func.id
-            if callee in reachable_funcs and callee in self.func_ranges:
-                call_annot = f"   → calls {callee}(...)"
+            if nid in visited:
+                # avoid infinite loops on cycles, just mark
+                yield ("node", nid, depth, is_last, True, None)
+                continue
+            visited.add(nid)
 
-        print(f"{indent}{branch} [{func}] line {line}: {code}{call_annot}")
+            # Check if node is a call to another beaconed function
+            callee = self.call_targets.get(nid)
+            if callee is not None and not (callee in reachable_funcs and callee in self.func_ranges):
+                callee = None
+            yield ("node", nid, depth, is_last, False, callee)
 
-        # children: dependencies within the same function
-        children = [d for d in self.dep_graph.get(nid, ())
-                    if d in local_nodes and d != nid]
+            # children: dependencies within the same function, sorted by line
+            deps = sorted([d for d in indices[indptr[nid]:indptr[nid + 1]]
+                           if d in local_nodes and d != nid], key=by_line)
+            if deps:
+                shown, hidden_deps = limited(deps, depth + 1)
+                stack.append((shown, 0, depth + 1, hidden_deps))
 
-        if not children:
-            return
+    # =========================================================
+    # Incremental re-analysis
+    # =========================================================
 
-        # sort children by line
-        children = sorted(children, key=lambda x: self.node_lines.get(x, 999999))
-
-        # extend indent for next level
-        child_indent = indent + ("   " if is_last else "│  ")
-        for i, child in enumerate(children):
-            self._print_node_tree(
-                child,
-                local_nodes,
-                reachable_funcs,
-                visited,
-                indent=child_indent,
-                is_last=(i == len(children) - 1),
-            )
+    def _token_lines(self) -> List[str]:
+        """Source lines as the tokenizer numbers them (str.splitlines also splits on \\f etc.)."""
+        if self._lines is None:
+            self._lines = _NEWLINE_RE.split(self._source)
+        return self._lines
+
+    def _describe_stmt(self, stmt: ast.stmt, lines: List[str]) -> "_PendingStmt":
+        start = min([stmt.lineno] + [d.lineno for d in getattr(stmt, "decorator_list", ())])
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{stmt.col_offset}:{stmt.end_col_offset}\0".encode())
+        h.update("\n".join(lines[start - 1:stmt.end_lineno]).encode("utf-8", "surrogatepass"))
+        name = stmt.name if isinstance(stmt, _FUNCTION_DEFS) else None
+        return _PendingStmt(name, start, stmt.lineno, stmt.end_lineno, h.hexdigest())
+
+    def _top_level_stmts(self) -> List["_PendingStmt"]:
+        """Position and source hash of every top-level statement (kept for reanalyze)."""
+        if self._top_level is None:
+            lines = self._token_lines()
+            self._top_level = [self._describe_stmt(stmt, lines) for stmt in self.tree.body]
+        return self._top_level
+
+    def _parse_stmt(self, pending: "_PendingStmt") -> ast.stmt:
+        """Parse one top-level statement from its own lines, with absolute line numbers."""
+        lines = self._token_lines()
+        module = ast.parse("\n".join(lines[pending.start - 1:pending.end]))
+        ast.increment_lineno(module, pending.start - 1)
+        return module.body[0]
+
+    def reanalyze(self, new_source: str) -> "BeaconExtractor":
+        """
+        Analyze a new revision of this (already visited) source incrementally.
+
+        - Parsing: lines shared with the old source at the start and end map to
+          unchanged top-level statements; only the changed region is parsed
+          (the full tree is parsed lazily if `tree` is accessed).
+        - Visiting: top-level functions whose source text is unchanged are not
+          re-visited; their nodes, dependency edges, var_defs, calls, output
+          nodes and reduced local beacons are copied from this extractor, with
+          node ids and line numbers shifted. This is only done while the
+          module-level statements are unchanged, so every function sees the same
+          module-level definitions as in a full run.
+
+        The result is identical to a full run on `new_source` (see
+        exp/check_beacon_incremental.py). Returns a new, visited extractor;
+        this one is left untouched.
+        """
+        new = BeaconExtractor(new_source, parse=False)
+        plan = _ReusePlan(self, new)
+        if plan.stmts is None:
+            new._tree = ast.parse(new_source)
+            new.visit(new._tree)
+            return new
+
+        if plan.candidates:
+            new._reuse = plan
+        try:
+            new._visit_top_level(plan.stmts)
+        finally:
+            new._reuse = None
+            plan.stmts = None
+
+        if new._duplicate_funcs and new.reused_functions:
+            # Same-named functions share var_defs / calls, so a copied function
+            # may have been analyzed against different definitions: start over
+            new = BeaconExtractor(new_source)
+            new.visit(new.tree)
+        elif plan.inherited:
+            new._sync_closure_memo()
+            new._local_memo = plan.inherited
+        return new
 
     # =========================================================
     # JSON export
@@ -660,91 +1500,616 @@ class BeaconExtractor(ast.NodeVisitor):
             "call_graph": call_graph,
         }
 
+    def iter_records(
+        self,
+        local_beacons: Dict[str, List[int]],
+        program_beacons: Dict[str, List[int]],
+    ) -> Iterator[Dict]:
+        """
+        The to_json content as a stream of flat records (see src/beacon/export.py):
+        one per local beacon, program beacon and call edge, produced on demand.
+        """
+        for func in sorted(local_beacons):
+            for nid in local_beacons[func]:
+                yield {"type": "local", "func": func, "line": self.node_lines.get(nid),
+                       "code": self._safe_get_line(nid)}
+        for entry, nodes in program_beacons.items():
+            for nid in nodes:
+                yield {"type": "program", "entry": entry,
+                       "func": self.node_func.get(nid, self.module_name),
+                       "line": self.node_lines.get(nid), "code": self._safe_get_line(nid)}
+        for func in sorted(self.calls):
+            for callee in sorted(self.calls[func]):
+                yield {"type": "call", "caller": func, "callee": callee}
+
 
 # =============================================================
-#  MAIN CLI
+#  Beacon Tree renderers (text / JSON / DOT)
 # =============================================================
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="BeaconExtractor Pro v4 - Beacon Logic implementation for Python files."
-    )
-    parser.add_argument("path", help="Path to the Python file to analyze.")
-    parser.add_argument(
-        "--mode",
-        choices=["compact", "full"],
-        default="compact",
-        help="Reduction mode: 'compact' keeps only high-importance beacons, 'full' keeps more details.",
-    )
-    parser.add_argument(
-        "--max-per-func",
-        type=int,
-        default=20,
-        help="Maximum number of local beacons per function (after reduction).",
-    )
-    parser.add_argument(
-        "--entry",
-        type=str,
-        default=None,
-        help="Explicit entry function name (otherwise heuristic: main or <module>).",
-    )
-    parser.add_argument(
-        "--json",
-        type=str,
-        default=None,
-        help="Optional path to save beacons as JSON.",
-    )
-    parser.add_argument(
-        "--max-dep-print",
-        type=int,
-        default=60,
-        help="Max number of dependency graph nodes to print for reasoning.",
-    )
-    parser.add_argument(
-        "--tree",
-        action="store_true",
-        help="Also print a derivation-style Beacon Tree view.",
-    )
+class _TreeWriter:
+    """Buffers output lines and writes them to `out` in chunks."""
+
+    CHUNK = 4096
+
+    def __init__(self, extractor: BeaconExtractor, out: IO[str]):
+        self.ext = extractor
+        self.out = out
+        self._buf: List[str] = []
+        # direct column access instead of the node_lines / node_func Mapping views
+        self._line = extractor.nodes.line
+        self._func = extractor.nodes.func
+        self._names = extractor.func_names
+        self._source = extractor.source_code
+
+    def emit(self, line: str):
+        self._buf.append(line)
+        if len(self._buf) >= self.CHUNK:
+            self.flush()
+
+    def flush(self):
+        if self._buf:
+            self.out.write("\n".join(self._buf) + "\n")
+            self._buf = []
+
+    def line_of(self, nid: int) -> Optional[int]:
+        line = self._line[nid]
+        return None if line == NO_LINE else line
+
+    def node_label(self, nid: int) -> str:
+        return f"[{self._names[self._func[nid]]}] line {self.line_of(nid)}"
+
+    def code_of(self, nid: int) -> str:
+        # BeaconExtractor._safe_get_line
+        line = self._line[nid]
+        if 1 <= line <= len(self._source):
+            return self._source[line - 1].rstrip("\n")
+        return ""
 
-    args = parser.parse_args()
+    def render(self, events: Iterator[tuple]):
+        raise NotImplementedError
+
+
+class _TextTreeWriter(_TreeWriter):
+    def render(self, events: Iterator[tuple]):
+        # indents[d]: prefix of the nodes at depth d in the current function
+        indents: List[str] = []
+        in_module = False
+        for event in events:
+            kind = event[0]
+            if kind != "module" and in_module:
+                self.emit("└─ end of global config\n")
+                in_module = False
+
+            if kind == "node":
+                _, nid, depth, is_last, repeated, callee = event
+                indent = indents[depth]
+                branch = "└─" if is_last else "├─"
+                del indents[depth + 1:]
+                indents.append(indent + ("   " if is_last else "│  "))
+                if repeated:
+                    self.emit(f"{indent}{branch} [visited] {self.node_label(nid)}")
+                    continue
+                call_annot = f"   → calls {callee}(...)" if callee is not None else ""
+                self.emit(f"{indent}{branch} {self.node_label(nid)}: {self.code_of(nid)}{call_annot}")
+            elif kind == "more":
+                _, depth, count = event
+                self.emit(f"{indents[depth]}└─ ... (+{count} not shown)")
+            elif kind == "func":
+                _, func, is_last = event
+                self.emit(f"{'└─' if is_last else '├─'} Function {func}()")
+                # child indent prefix for nodes under this function
+                indents = ["   " if is_last else "│  "]
+            elif kind == "module":
+                if not in_module:
+                    self.emit("┌─ Global config (module-level beacons)")
+                    in_module = True
+                nid = event[1]
+                self.emit(f"│    [<module>] line {self.line_of(nid)}: {self.code_of(nid)}")
+            elif kind == "entry":
+                self.emit(f"\nProgram Beacon Tree (Entry = {event[1]})")
+                self.emit("──────────────────────────────────────────")
+        if in_module:
+            self.emit("└─ end of global config\n")
+        self.flush()
+
+
+class _JsonTreeWriter(_TreeWriter):
+    """
+    Nested JSON written as the events arrive (no tree in memory, no recursion):
+    {"beacon_tree": [{"entry", "module": [node], "functions": [{"func", "roots": [node]}]}]}
+    with node = {"func", "line", "code", "calls"?, "repeated"?, "children"?, "hidden_children"?}.
+    """
+
+    def _node(self, nid: int) -> str:
+        return (f'{{"func": {json.dumps(self._names[self._func[nid]], ensure_ascii=False)}, '
+                f'"line": {json.dumps(self.line_of(nid))}, '
+                f'"code": {json.dumps(self.code_of(nid), ensure_ascii=False)}')
+
+    def render(self, events: Iterator[tuple]):
+        # per open node: 0 no children yet, 1 children list open, 2 children list closed
+        stack: List[int] = []
+        section = None          # None / "module" / "functions" of the current entry
+        first_entry = first_item = True
+        in_func = False
+        hidden_roots = 0
+
+        def close_nodes(depth: int):
+            while len(stack) > depth:
+                self.emit("]}" if stack.pop() == 1 else "}")
+
+        def close_func():
+            nonlocal in_func
+            if in_func:
+                close_nodes(0)
+                self.emit(f'], "hidden_roots": {hidden_roots}}}' if hidden_roots else "]}")
+                in_func = False
+
+        def close_entry():
+            close_func()
+            if section == "module":
+                self.emit('], "functions": []}')
+            elif section == "functions":
+                self.emit("]}")
+
+        self.emit('{"beacon_tree": [')
+        for event in events:
+            kind = event[0]
+            if kind == "node":
+                _, nid, depth, _, repeated, callee = event
+                close_nodes(depth)
+                if depth == 0:
+                    sep = "" if first_item else ","
+                    first_item = False
+                elif stack[depth - 1] == 0:
+                    sep = ', "children": ['
+                    stack[depth - 1] = 1
+                else:
+                    sep = ","
+                extra = ""
+                if repeated:
+                    extra = ', "repeated": true'
+                elif callee is not None:
+                    extra = f', "calls": {json.dumps(callee, ensure_ascii=False)}'
+                self.emit(sep + self._node(nid) + extra)
+                stack.append(0)
+            elif kind == "more":
+                _, depth, count = event
+                close_nodes(depth)
+                if depth == 0:
+                    hidden_roots = count
+                else:
+                    self.emit(("], " if stack[depth - 1] == 1 else ", ") + f'"hidden_children": {count}')
+                    stack[depth - 1] = 2
+            elif kind == "func":
+                if section == "module":
+                    self.emit('], "functions": [')
+                    section, sep = "functions", ""
+                else:
+                    close_func()
+                    sep = ","
+                self.emit(f'{sep}{{"func": {json.dumps(event[1], ensure_ascii=False)}, "roots": [')
+                in_func, first_item, hidden_roots = True, True, 0
+            elif kind == "module":
+                self.emit(("" if first_item else ",") + self._node(event[1]) + "}")
+                first_item = False
+            elif kind == "entry":
+                close_entry()
+                self.emit(f'{"" if first_entry else ","}{{"entry": {json.dumps(event[1], ensure_ascii=False)}, "module": [')
+                section, first_entry, first_item = "module", False, True
+        close_entry()
+        self.emit("]}")
+        self.flush()
+
+
+class _DotTreeWriter(_TreeWriter):
+    @staticmethod
+    def _quote(text: str) -> str:
+        return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+    def render(self, events: Iterator[tuple]):
+        self.emit("digraph beacon_tree {")
+        self.emit('  node [shape=box, fontname="monospace"];')
+        declared: Set[int] = set()
+        # parents[d]: DOT id of the parent of the nodes at depth d
+        parents: List[str] = []
+        entry_id = ""
+        n_entries = n_funcs = n_more = 0
+        for event in events:
+            kind = event[0]
+            if kind == "node":
+                _, nid, depth, _, _, callee = event
+                if nid not in declared:
+                    declared.add(nid)
+                    label = f"{self.node_label(nid)}: {self.code_of(nid).strip()}"
+                    if callee is not None:
+                        label += f" → {callee}()"
+                    self.emit(f"  n{nid} [label={self._quote(label)}];")
+                self.emit(f"  {parents[depth]} -> n{nid};")
+                del parents[depth + 1:]
+                parents.append(f"n{nid}")
+            elif kind == "more":
+                _, depth, count = event
+                n_more += 1
+                self.emit(f'  more{n_more} [label="+{count} not shown", shape=plaintext];')
+                self.emit(f"  {parents[depth]} -> more{n_more} [style=dashed];")
+            elif kind == "func":
+                n_funcs += 1
+                func_id = f"func{n_funcs}"
+                self.emit(f"  {func_id} [label={self._quote(event[1] + '()')}, shape=ellipse];")
+                self.emit(f"  {entry_id} -> {func_id};")
+                parents = [func_id]
+            elif kind == "module":
+                nid = event[1]
+                if nid not in declared:
+                    declared.add(nid)
+                    label = f"{self.node_label(nid)}: {self.code_of(nid).strip()}"
+                    self.emit(f"  n{nid} [label={self._quote(label)}];")
+                self.emit(f"  {entry_id} -> n{nid} [style=dotted];")
+            elif kind == "entry":
+                n_entries += 1
+                entry_id = f"entry{n_entries}"
+                self.emit(f"  {entry_id} [label={self._quote('entry ' + event[1])}, shape=doubleoctagon];")
+        self.emit("}")
+        self.flush()
+
+
+_TREE_RENDERERS = {"text": _TextTreeWriter, "json": _JsonTreeWriter, "dot": _DotTreeWriter}
+
+
+class _PendingStmt:
+    """A top-level statement known by position and source hash only (parsed on demand)."""
+
+    __slots__ = ("name", "start", "lineno", "end", "digest")
+
+    def __init__(self, name: Optional[str], start: int, lineno: int, end: int, digest: str):
+        self.name = name        # function name, None for other statements
+        self.start = start      # first line, decorators included
+        self.lineno = lineno    # line of the statement itself ("def ...")
+        self.end = end
+        self.digest = digest
+
+    def shifted(self, delta: int) -> "_PendingStmt":
+        return _PendingStmt(self.name, self.start + delta, self.lineno + delta, self.end + delta, self.digest)
+
+
+class _ReusePlan:
+    """
+    Incremental re-analysis of a new revision against a previous extractor (`base`).
+
+    - stmts: the new top-level statements. Statements in the unchanged lines at
+      the start / end of the source are taken from base's statement table as
+      _PendingStmt; only the lines in between are parsed. None if the new
+      source has to be parsed as a whole.
+    - candidates: top-level functions with unchanged source text. One is copied
+      (splice) when the same module-level nodes were recorded before it, so it
+      sees exactly the same module-level definitions as in a full visit.
+    """
+
+    def __init__(self, base: BeaconExtractor, new: BeaconExtractor):
+        self.base = base
+        self.stmts: Optional[List] = None
+        self.candidates: Set[str] = set()
+        # (max_per_func, mode) -> func -> reduced local beacons in new node ids
+        self.inherited: Dict[Tuple[Optional[int], str], Dict[str, List[int]]] = {}
+        self._rank: Optional[array] = None
+        self._groups: Optional[Dict[str, Dict[str, List[str]]]] = None
+
+        if base._tree is None and base._top_level is None:
+            return  # base was never visited
+        new_top = self._stitch(base, new)
+        if new_top is None:
+            return
+        new._top_level = new_top
 
-    with open(args.path, "r", encoding="utf-8") as f:
-        code = f.read()
+        if base._duplicate_funcs or not base.segments:
+            return
+        old_top = base._top_level_stmts()
+        if [s.digest for s in old_top if s.name is None] != [s.digest for s in new_top if s.name is None]:
+            return
+        old_funcs = {s.name: s.digest for s in old_top if s.name is not None}
+        self.candidates = {
+            s.name for s in new_top
+            if s.name is not None and old_funcs.get(s.name) == s.digest and s.name in base.segments
+        }
 
-    extractor = BeaconExtractor(code)
-    extractor.visit(extractor.tree)
+    def _stitch(self, base: BeaconExtractor, new: BeaconExtractor) -> Optional[List["_PendingStmt"]]:
+        """
+        Build self.stmts from base's statements in the common prefix / suffix plus the
+        parsed changed region; returns the new statement table (None: parse everything).
+        """
+        if "__future__" in new._source:
+            return None  # future imports can change how the changed region parses
+        old_lines, new_lines = base._token_lines(), new._token_lines()
+        old_top = base._top_level_stmts()
+        if not old_top:
+            return None
+        n_old, n_new = len(old_lines), len(new_lines)
+
+        limit = min(n_old, n_new)
+        prefix = 0
+        while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old_lines[n_old - 1 - suffix] == new_lines[n_new - 1 - suffix]:
+            suffix += 1
+
+        # Statement i is reused from the prefix if the next statement also starts inside
+        # it: then it is complete and the tokenizer is in the same state as before
+        k = 0
+        while k + 1 < len(old_top) and old_top[k + 1].start <= prefix:
+            k += 1
+        m = k
+        while m < len(old_top) and old_top[m].start <= n_old - suffix:
+            m += 1
+        delta = n_new - n_old
+
+        first = old_top[k].start if k > 0 else 1
+        stop = old_top[m].start + delta if m < len(old_top) else n_new + 1
+        if stop < first:
+            return None
+        try:
+            region = ast.parse("\n".join(new_lines[first - 1:stop - 1]))
+        except SyntaxError:
+            return None  # a full parse decides (and reports the error)
+        ast.increment_lineno(region, first - 1)
+
+        parsed = [new._describe_stmt(stmt, new_lines) for stmt in region.body]
+        table = old_top[:k] + parsed + [s.shifted(delta) for s in old_top[m:]]
+        # Statements sharing a line ("a = 1; b = 2") cannot be parsed on their own
+        for prev, cur in zip(table, table[1:]):
+            if prev.end >= cur.start:
+                return None
+        self.stmts = old_top[:k] + region.body + table[k + len(parsed):]
+        return table
+
+    def _module_rank(self) -> array:
+        """Old node id -> position among module-level nodes (-1 for function nodes)."""
+        if self._rank is None:
+            rank = array("i", [-1]) * len(self.base.nodes)
+            for r, nid in enumerate(self.base._module_nids):
+                rank[nid] = r
+            self._rank = rank
+        return self._rank
+
+    def _segment_groups(self) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Per top-level function, the keys (function names) of each per-function dict
+        of `base` that belong to it, nested functions included, in insertion order.
+        """
+        if self._groups is not None:
+            return self._groups
+        base = self.base
+        spans = sorted((base.func_ranges[name], name) for name in base.segments)
+        starts = [start for (start, _), _ in spans]
+
+        def owner(func: str) -> Optional[str]:
+            r = base.func_ranges.get(func)
+            if r is None:
+                return None
+            i = bisect_right(starts, r[0]) - 1
+            if i < 0 or r[0] > spans[i][0][1]:
+                return None
+            return spans[i][1]
+
+        owners = {func: owner(func) for func in base.func_ranges}
+        groups: Dict[str, Dict[str, List[str]]] = defaultdict(lambda: defaultdict(list))
+        # classes defined inside a top-level function (lines only: class names are not functions)
+        for cls, (start, _) in base.class_ranges.items():
+            i = bisect_right(starts, start) - 1
+            if i >= 0 and start <= spans[i][0][1]:
+                groups[spans[i][1]]["class_ranges"].append(cls)
+        for field in ("func_ranges", "calls", "attr_calls", "output_nodes",
+                      "validation_returns", "var_defs"):
+            for func in getattr(base, field):
+                seg = owners.get(func)
+                if seg is not None:
+                    groups[seg][field].append(func)
+        self._groups = groups
+        return groups
+
+    def splice(self, ext: BeaconExtractor, stmt) -> bool:
+        """Copy the analysis of `stmt` from base into ext; False if it must be visited."""
+        name = stmt.name
+        if name not in self.candidates:
+            return False
+        base = self.base
+        lo, hi, n_module = base.segments[name]
+        if n_module != len(ext._module_nids):
+            return False
+
+        shift = len(ext.nodes) - lo
+        rank = self._module_rank()
+        new_module = ext._module_nids
+
+        def remap(nid: int) -> int:
+            if lo <= nid < hi:
+                return nid + shift
+            r = rank[nid]
+            if r < 0 or r >= n_module:
+                raise KeyError(nid)
+            return new_module[r]
+
+        # Edges first: a dependency outside the function and the module prefix aborts the copy
+        graph = base.dep_graph
+        indptr, indices = graph.indptr, graph.indices
+        src = array("i")
+        dst = array("i")
+        try:
+            for nid in range(lo, hi):
+                for k in range(indptr[nid], indptr[nid + 1]):
+                    src.append(nid + shift)
+                    dst.append(remap(indices[k]))
+        except KeyError:
+            return False
+
+        # Node rows: same kinds / scores, lines shifted, function indices re-interned
+        delta = stmt.lineno - base.func_ranges[name][0]
+        nodes, old = ext.nodes, base.nodes
+        fmap: Dict[int, int] = {}
+        for f in old.func[lo:hi]:
+            if f not in fmap:
+                fmap[f] = ext._func_idx(base.func_names[f])
+        nodes.line.extend(array("i", [
+            line if line == NO_LINE else line + delta for line in old.line[lo:hi]
+        ]))
+        nodes.func.extend(array("i", [fmap[f] for f in old.func[lo:hi]]))
+        nodes.kind.extend(old.kind[lo:hi])
+        nodes.score.extend(old.score[lo:hi])
+        ext._edge_src.extend(src)
+        ext._edge_dst.extend(dst)
+        ext._csr = None
+
+        for nid in range(lo, hi):
+            callee = base.call_targets.get(nid)
+            if callee is not None:
+                ext.call_targets[nid + shift] = callee
+
+        groups = self._segment_groups().get(name, {})
+        for func in groups.get("func_ranges", ()):
+            start, end = base.func_ranges[func]
+            if func in ext.func_ranges:
+                ext._duplicate_funcs = True
+            ext.func_ranges[func] = (start + delta, end + delta)
+        for cls in groups.get("class_ranges", ()):
+            start, end = base.class_ranges[cls]
+            ext.class_ranges[cls] = (start + delta, end + delta)
+        for func in groups.get("calls", ()):
+            ext.calls[func] = set(base.calls[func])
+        for func in groups.get("attr_calls", ()):
+            ext.attr_calls[func] = set(base.attr_calls[func])
+        for func in groups.get("output_nodes", ()):
+            ext.output_nodes[func] = {nid + shift for nid in base.output_nodes[func]}
+        for func in groups.get("validation_returns", ()):
+            ext.validation_returns[func] = {nid + shift for nid in base.validation_returns[func]}
+        for func in groups.get("var_defs", ()):
+            defs = ext.var_defs[func]
+            for var, ids in base.var_defs[func].items():
+                defs[var] = [nid + shift for nid in ids]
+
+        i, j = base._import_spans.get(name, (0, 0))
+        for alias, target in base._import_log[i:j]:
+            ext._add_import(alias, target)
+
+        # Reduced local beacons: unchanged closure, lines shifted in order -> same reduction
+        if base._memo_graph is not None and base._memo_graph is base._csr:
+            for key, memo in base._local_memo.items():
+                inherited = self.inherited.setdefault(key, {})
+                for func in groups.get("func_ranges", ()):
+                    if func in memo:
+                        inherited[func] = [remap(nid) for nid in memo[func]]
+
+        ext.reused_functions.append(name)
+        return True
 
-    print("\n============= BEACON REASONING =============")
-    extractor.print_output_nodes()
-    extractor.print_dep_graph(max_nodes=args.max_dep_print)
-    extractor.print_calls()
 
-    local_beacons = extractor.compute_all_local_beacons(
-        max_per_func=args.max_per_func,
-        mode=args.mode,
-    )
-    extractor.print_local_beacons(local_beacons)
+# =============================================================
+#  Single-source analysis: incremental documents, analyze_source
+# =============================================================
+
 
+class IncrementalBeacon:
+    """
+    Keeps the extractors of the most recently analyzed documents, so that a
+    new revision of one of them (e.g. the code a user keeps editing in one
+    session) goes through BeaconExtractor.reanalyze instead of a full analysis.
+
+    Documents are identified by an explicit id chosen by the caller (such as
+    the session id); a source without an id is always analyzed from scratch.
+    At most `max_documents` extractors are kept, least recently used first out.
+    """
+
+    def __init__(self, max_documents: int = 8):
+        self.max_documents = max_documents
+        self._docs: "OrderedDict[str, BeaconExtractor]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.revisions = 0
+        self.reused_functions = 0
+
+    def extractor_for(self, code: str, doc_id: Optional[str] = None) -> BeaconExtractor:
+        """A visited extractor for `code` (incremental when `doc_id` has a previous revision)."""
+        base = None
+        if doc_id is not None:
+            with self._lock:
+                base = self._docs.pop(doc_id, None)
+
+        if base is not None:
+            extractor = base.reanalyze(code)
+        else:
+            extractor = BeaconExtractor(code)
+            extractor.visit(extractor.tree)
+        if doc_id is None:
+            return extractor
+
+        with self._lock:
+            if base is not None:
+                self.revisions += 1
+                self.reused_functions += len(extractor.reused_functions)
+            self._docs[doc_id] = extractor
+            while len(self._docs) > self.max_documents:
+                self._docs.popitem(last=False)
+        return extractor
+
+
+def _source_key(cache: "BeaconResultCache", code: str, max_per_func: int, mode: str,
+                explicit_entry: Optional[str], include_local: bool) -> str:
+    return cache.make_key(code, max_per_func=max_per_func, mode=mode, entry=explicit_entry,
+                          include_local=include_local)
+
+
+def analyze_source(
+    code: str,
+    max_per_func: int = 20,
+    mode: str = "compact",
+    explicit_entry: Optional[str] = None,
+    cache: Optional["BeaconResultCache"] = None,
+    incremental: Optional[IncrementalBeacon] = None,
+    include_local: bool = True,
+    doc_id: Optional[str] = None,
+) -> Dict:
+    """
+    Full analysis of a source string as a to_json-style dict, plus
+    "reachable": entry -> sorted reachable functions.
+
+    With a cache, identical source + options return the stored result without parsing;
+    with `incremental` and a `doc_id`, a new revision of that document is re-analyzed
+    incrementally against the previous one.
+    include_local=False leaves "local_beacons" empty, so only the functions reachable
+    from the entries are analyzed.
+    """
+    key = None
+    if cache is not None:
+        key = _source_key(cache, code, max_per_func, mode, explicit_entry, include_local)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    if incremental is not None:
+        extractor = incremental.extractor_for(code, doc_id)
+    else:
+        extractor = BeaconExtractor(code)
+        extractor.visit(extractor.tree)
     program_beacons = extractor.compute_program_beacons(
-        max_per_func=args.max_per_func,
-        mode=args.mode,
-        explicit_entry=args.entry,
+        max_per_func=max_per_func,
+        mode=mode,
+        explicit_entry=explicit_entry,
     )
-    print("\n============= BEACON RESULT (PROGRAM LEVEL) =============")
-    extractor.print_program_beacons(program_beacons)
+    local_beacons = (extractor.compute_all_local_beacons(max_per_func=max_per_func, mode=mode)
+                     if include_local else {})
+    result = extractor.to_json(local_beacons, program_beacons)
+    result["reachable"] = {
+        entry: sorted(extractor.reachable_functions_from(entry))
+        for entry in program_beacons
+    }
 
-    if args.tree:
-        extractor.print_program_beacon_tree(
-            program_beacons,
-            explicit_entry=args.entry,
-        )
-
-    if args.json is not None:
-        data = extractor.to_json(local_beacons, program_beacons)
-        with open(args.json, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"\n[INFO] JSON beacons written to {args.json}")
+    if cache is not None:
+        cache.put(key, result)
+    return result
 
 
 if __name__ == "__main__":
+    # Run as a script: the CLI is in the src.beacon package, so put the project root on the path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from src.beacon.cli import main
+
     main()
@@ -1,11 +1,16 @@
 # src/agents/coding_agent.py
+import asyncio
 import re
+from typing import List
 from langchain_core.prompts import ChatPromptTemplate
-from src.config import get_llm
+from src.config import BEACON_BACKGROUND_ENABLED, get_llm
+from src.streaming import stream_llm_text, astream_llm_text
+from src.speculation import take_speculative_answer, atake_speculative_answer
 from src.state import AgentState
-from src.tools import beacon_analyze_code
+from src.prompt_budget import budget_for, format_history, record_prompt_tokens
+from src.tools import start_beacon_job, submit_beacon_analysis, wait_beacon_summary
 
-llm = get_llm(temperature=0.2)
+llm = get_llm(temperature=0.2, node="coding")
 
 coding_prompt = ChatPromptTemplate.from_messages([
     (
@@ -34,71 +39,73 @@ coding_prompt = ChatPromptTemplate.from_messages([
 ])
 
 
-def _extract_first_python_block(text: str) -> str | None:
-    """
-    从 LLM 的回答中提取第一个 Python 代码块。
-    优先匹配 ```python ...```，若没有则匹配第一个 ``` ... ```。
-    """
-    # 优先匹配 ```python ... ``` 形式
-    pattern_py = re.compile(r"```python\s*(.*?)```", re.DOTALL | re.IGNORECASE)
-    m = pattern_py.search(text)
-    if m:
-        code = m.group(1).strip()
-        return code if code else None
-
-    # 退而求其次，匹配任意 ``` ... ``` 代码块
-    pattern_any = re.compile(r"```(.*?)```", re.DOTALL)
-    m = pattern_any.search(text)
-    if m:
-        code = m.group(1).strip()
-        return code if code else None
+# 代码块围栏：```lang ... ```（语言标记可以为空），模块加载时编译一次
+_FENCE_RE = re.compile(r"```([\w+.-]*)[^\n`]*\n(.*?)```", re.DOTALL)
+_PYTHON_LANGS = {"python", "py", "python3"}
 
-    return None
 
-
-def coding_node(state: AgentState) -> AgentState:
+def _extract_python_blocks(text: str) -> List[str]:
     """
-    使用 Qwen 处理与代码相关的问题：
-    - 错误解释
-    - 实现建议
-    - 与 LangChain / LangGraph 相关的问题
-
-    在生成回答后：
-    - 尝试从回答中抽取 Python 代码块
-    - 若成功，调用 beacon_analyze_code 做 Beacon 推理
-    - 将 Beacon summary 附加到回答末尾，作为工程级提醒
+    提取文本中所有 Python 代码块（按出现顺序）。
+    优先取 ```python / ```py 代码块；一个都没有时，退而求其次取不带语言标记的 ``` 代码块。
+    其他语言（如 ```bash）的代码块不会交给 Beacon。
     """
-    query = state.get("query", "").strip()
-    history = state.get("session_history", [])
+    tagged: List[str] = []
+    untagged: List[str] = []
+    for m in _FENCE_RE.finditer(text):
+        code = m.group(2).strip()
+        if not code:
+            continue
+        lang = m.group(1).lower()
+        if lang in _PYTHON_LANGS:
+            tagged.append(code)
+        elif not lang:
+            untagged.append(code)
+    return tagged or untagged
 
-    state.setdefault("tool_calls", [])
-    state.setdefault("activated_agents", [])
+
+def _build_inputs(state: AgentState) -> dict:
+    query = state.get("query", "").strip()
+    history = state.get("agent_history", {}).get("coding", [])
 
     # 将近期历史压缩成一段文本，方便提供上下文
     if history:
-        history_lines = []
-        for turn in history[-5:]:  # 只取最近几条
-            role = turn.get("role", "user")
-            content = turn.get("content", "")
-            history_lines.append(f"{role}: {content}")
-        history_text = "\n".join(history_lines)
+        history_text = format_history(history, budget_for("coding", "history"))
     else:
         history_text = ""
 
-    # 1) 调用 LLM 生成 coding 回答
-    chain = coding_prompt | llm
-    result = chain.invoke({"query": query, "history_text": history_text})
-    answer = result.content
+    inputs = {"query": query, "history_text": history_text}
+    record_prompt_tokens(state, "coding", coding_prompt, inputs)
+    return inputs
+
 
-    # 2) 从回答中提取代码块，调用 Beacon 推理
-    code_block = _extract_first_python_block(answer)
-    if code_block:
+def _postprocess(state: AgentState, answer: str) -> AgentState:
+    """
+    从回答（以及用户 query）中提取所有 Python 代码块，批量调用 Beacon 推理，
+    并把合并后的 Beacon summary 附加到回答末尾。
+
+    只有一个代码块时以 state["session_id"] 作为文档 id，同一会话中修改过的代码走增量分析。
+    BEACON_BACKGROUND_ENABLED 时不等待分析：回答立即返回，任务 id 记在 state["beacon_job"]，
+    summary 由调用方通过 tools.collect_beacon_followup 作为补充消息取回。
+    两种模式下分析都受 BEACON_TIMEOUT / BEACON_MAX_CODE_CHARS 限制。
+    """
+    state.setdefault("tool_calls", [])
+    state.setdefault("activated_agents", [])
+
+    blocks = [("answer", code) for code in _extract_python_blocks(answer)]
+    blocks += [("query", code) for code in _extract_python_blocks(state.get("query", ""))]
+    if blocks:
         try:
-            beacon_summary = beacon_analyze_code(code_block)
-            state["tool_calls"].append("beacon_analyze_code")
+            if BEACON_BACKGROUND_ENABLED:
+                state["beacon_job"] = start_beacon_job(blocks, state.get("session_id"))
+                state["tool_calls"].append("beacon_analyze_code")
+            else:
+                beacon_summary = wait_beacon_summary(
+                    submit_beacon_analysis(blocks, state.get("session_id")))
+                state["tool_calls"].append("beacon_analyze_code")
 
-            # 将 Beacon summary 附加到回答末尾
-            answer = answer.rstrip() + "\n\n---\n" + beacon_summary
+                # 将 Beacon summary 附加到回答末尾
+                answer = answer.rstrip() + "\n\n---\n" + beacon_summary
         except Exception as e:
             # 即使 Beacon 工具异常，也不要让主回答崩掉
             answer = answer.rstrip() + f"\n\n[Beacon] Failed to analyze code: {e}"
@@ -106,3 +113,38 @@ def coding_node(state: AgentState) -> AgentState:
     state["partial_answer"] = answer
     state["activated_agents"].append("coding_agent")
     return state
+
+
+def coding_node(state: AgentState) -> AgentState:
+    """
+    使用 Qwen 处理与代码相关的问题：
+    - 错误解释
+    - 实现建议
+    - 与 LangChain / LangGraph 相关的问题
+
+    在生成回答后：
+    - 从回答和用户 query 中抽取所有 Python 代码块
+    - 若有，批量做 Beacon 推理（见 tools.beacon_analyze_blocks）
+    - 将 Beacon summary 附加到回答末尾，作为工程级提醒
+    """
+    # 1) 流式调用 LLM 生成 coding 回答（token 会实时推送给 CLI）；
+    #    投机执行已按同样的输入生成过回答时直接取用（见 src/speculation.py）
+    inputs = _build_inputs(state)
+    answer = take_speculative_answer(state, "coding", inputs)
+    if answer is None:
+        answer = stream_llm_text(coding_prompt, llm, inputs)
+
+    # 2) 流结束后再提取代码块，调用 Beacon 推理
+    return _postprocess(state, answer)
+
+
+async def acoding_node(state: AgentState) -> AgentState:
+    """
+    coding_node 的异步版本：
+    LLM 调用受全局并发信号量限制，Beacon 分析放到线程池中执行，避免阻塞事件循环。
+    """
+    inputs = _build_inputs(state)
+    answer = await atake_speculative_answer(state, "coding", inputs)
+    if answer is None:
+        answer = await astream_llm_text(coding_prompt, llm, inputs)
+    return await asyncio.to_thread(_postprocess, state, answer)
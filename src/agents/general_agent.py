@@ -1,9 +1,12 @@
 # src/agents/general_agent.py
 from langchain_core.prompts import ChatPromptTemplate
 from src.config import get_llm
+from src.streaming import stream_llm_text, astream_llm_text
+from src.speculation import take_speculative_answer, atake_speculative_answer
 from src.state import AgentState
+from src.prompt_budget import budget_for, format_history, record_prompt_tokens
 
-llm = get_llm(temperature=0.3)
+llm = get_llm(temperature=0.3, node="general")
 
 general_prompt = ChatPromptTemplate.from_messages([
     (
@@ -27,29 +30,44 @@ general_prompt = ChatPromptTemplate.from_messages([
 ])
 
 
-def general_node(state: AgentState) -> AgentState:
-    """
-    兜底助手：
-    - 处理无法被 Router 明确分类的问题
-    - 提供与学习/生产力相关的通用建议
-    """
+def _build_inputs(state: AgentState) -> dict:
     query = state.get("query", "").strip()
-    history = state.get("session_history", [])
+    history = state.get("agent_history", {}).get("general", [])
 
     if history:
-        history_lines = []
-        for turn in history[-5:]:
-            role = turn.get("role", "user")
-            content = turn.get("content", "")
-            history_lines.append(f"{role}: {content}")
-        history_text = "\n".join(history_lines)
+        history_text = format_history(history, budget_for("general", "history"))
     else:
         history_text = ""
 
-    chain = general_prompt | llm
-    result = chain.invoke({"query": query, "history_text": history_text})
+    inputs = {"query": query, "history_text": history_text}
+    record_prompt_tokens(state, "general", general_prompt, inputs)
+    return inputs
+
 
-    state["partial_answer"] = result.content
+def _finish(state: AgentState, answer: str) -> AgentState:
+    state["partial_answer"] = answer
     state.setdefault("activated_agents", []).append("general_agent")
     state.setdefault("tool_calls", [])
     return state
+
+
+def general_node(state: AgentState) -> AgentState:
+    """
+    兜底助手：
+    - 处理无法被 Router 明确分类的问题
+    - 提供与学习/生产力相关的通用建议
+    """
+    inputs = _build_inputs(state)
+    answer = take_speculative_answer(state, "general", inputs)
+    if answer is None:
+        answer = stream_llm_text(general_prompt, llm, inputs)
+    return _finish(state, answer)
+
+
+async def ageneral_node(state: AgentState) -> AgentState:
+    """general_node 的异步版本，LLM 调用受全局并发信号量限制。"""
+    inputs = _build_inputs(state)
+    answer = await atake_speculative_answer(state, "general", inputs)
+    if answer is None:
+        answer = await astream_llm_text(general_prompt, llm, inputs)
+    return _finish(state, answer)
@@ -1,53 +1,75 @@
 # src/agents/memory_agent.py
-import json
+import asyncio
+import os
+import threading
 from pathlib import Path
 from typing import Dict, Any, List
 
 from src.state import AgentState
+from src.memory_store import MemoryStore
+from src.memory_manager import MemoryManager
+from src.history_selector import select_history_budgets
+from src.prompt_budget import AGENT_BUDGETS
 
 # 项目根目录: .../multi_agent_study_assistant/
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
-MEMORY_PATH = PROJECT_ROOT / "data" / "memory.json"
+DATA_DIR = PROJECT_ROOT / "data"
+# 旧版整体 JSON 格式，仅用于首次运行时迁移
+MEMORY_PATH = DATA_DIR / "memory.json"
 
+# 长期记忆中保留的历史条数；log 超过 2 倍时触发一次压缩。
+# 历史按相关性挑选后再进入 prompt，所以可以保留得比 prompt 能容纳的多
+MAX_HISTORY = int(os.getenv("MEMORY_MAX_HISTORY", "200"))
+# memory_load 时选入 session_history 的历史 token 预算，默认取各 agent history 预算中最大的一个
+HISTORY_TOKEN_BUDGET = int(os.getenv(
+    "HISTORY_TOKEN_BUDGET",
+    str(max(b.get("history", 0) for b in AGENT_BUDGETS.values())),
+))
 
-def _load_memory_file() -> Dict[str, Any]:
+# 各专家的 history 预算。memory_load 与 router 并行、不知道会进入哪个专家，
+# 所以一次打分后为每个预算各装一份，写入 state['agent_history']，专家直接使用
+AGENT_HISTORY_BUDGETS: Dict[str, int] = {
+    agent: budgets["history"] for agent, budgets in AGENT_BUDGETS.items() if budgets.get("history")
+}
+
+# 后台线程把新记录追加到磁盘的合并间隔（秒）
+FLUSH_INTERVAL = 0.2
+
+_manager: MemoryManager | None = None
+_manager_lock = threading.Lock()
+
+
+def get_memory_manager() -> MemoryManager:
     """
-    从 data/memory.json 加载长期记忆。
-    如果文件不存在，则返回一个空模板。
+    懒加载进程级的 MemoryManager（首次打开时自动从 memory.json 迁移）。
+    memory_load 与 memory_update 共享同一份内存中的 profile / history / notes；
+    其他模块（如 router 的快速路由训练）也通过它读取长期记忆。
     """
-    if not MEMORY_PATH.exists():
-        return {
-            "user_profile": {},
-            "history": [],
-            "notes": []
-        }
-
-    try:
-        with open(MEMORY_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        # 如果文件损坏，回退到空模板，避免整个系统崩溃
-        return {
-            "user_profile": {},
-            "history": [],
-            "notes": []
-        }
-
-
-def _save_memory_file(data: Dict[str, Any]) -> None:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            store = MemoryStore(DATA_DIR, legacy_path=MEMORY_PATH)
+            _manager = MemoryManager(store, max_history=MAX_HISTORY,
+                                     flush_interval=FLUSH_INTERVAL)
+        return _manager
+
+
+def _load_memory_file(max_history: int = MAX_HISTORY) -> Dict[str, Any]:
     """
-    将长期记忆写回 data/memory.json。
+    返回长期记忆的内存副本，结构与旧版 memory.json 相同：
+    {"user_profile": ..., "history": [...], "notes": [...]}。
+    只有当磁盘文件被其他进程修改过时才会重新读取。
     """
-    MEMORY_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(MEMORY_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    return get_memory_manager().snapshot(max_history)
 
 
 def memory_load_node(state: AgentState) -> AgentState:
     """
     在图的入口被调用：
-    - 从 memory.json 中读取 user_profile / history / notes
-    - 将最近若干条历史写入 state['session_history']
+    - 从进程内的 MemoryManager 读取 user_profile / history / notes
+    - 按与当前 query 的相关性（BM25 + 近因）挑选历史：
+      HISTORY_TOKEN_BUDGET 以内的写入 state['session_history']，
+      各专家预算以内的写入 state['agent_history'][agent]
     """
     data = _load_memory_file()
 
@@ -55,11 +77,16 @@ def memory_load_node(state: AgentState) -> AgentState:
     history: List[Dict[str, str]] = data.get("history", [])
     notes: List[str] = data.get("notes", [])
 
-    # 可以只保留最近 N 条历史，避免 prompt 太长
-    recent_history = history[-2:]
+    # 只保留与当前问题相关的历史，避免 prompt 被无关轮次撑长；
+    # 预算不够时丢掉的是相关性最低的 exchange，而不是最旧的
+    selected = select_history_budgets(
+        state.get("query", ""), history,
+        {"session": HISTORY_TOKEN_BUDGET, **AGENT_HISTORY_BUDGETS},
+    )
 
     state["user_profile"] = user_profile
-    state["session_history"] = recent_history
+    state["session_history"] = selected.pop("session")
+    state["agent_history"] = selected
     state["notes"] = notes
 
     state.setdefault("activated_agents", []).append("memory_load")
@@ -68,19 +95,28 @@ def memory_load_node(state: AgentState) -> AgentState:
 
 
 def memory_update_node(state: AgentState) -> AgentState:
-    data = _load_memory_file()
-    history: List[Dict[str, str]] = data.get("history", [])
-
+    """
+    在专家回答之后被调用：把本轮 Q/A 交给 MemoryManager，
+    内存立即更新，磁盘追加由后台线程完成。
+    """
     query = state.get("query", "")
     answer = state.get("final_answer") or state.get("partial_answer") or ""
 
+    new_turns: List[Dict[str, str]] = []
     if query:
-        history.append({"role": "user", "content": query})
+        # route 标签同时作为本地快速路由模型的训练样本；
+        # route_source 记录标签来源（"llm" / "fast"），训练时只使用 LLM Router 给出的标签
+        user_turn = {"role": "user", "content": query}
+        if state.get("route"):
+            user_turn["route"] = state["route"]
+            if state.get("route_source"):
+                user_turn["route_source"] = state["route_source"]
+        new_turns.append(user_turn)
     if answer:
-        history.append({"role": "assistant", "content": answer})
+        new_turns.append({"role": "assistant", "content": answer})
 
-    # 控制文件中的历史长度
-    data["history"] = history[-50:]
+    # 每轮只追加新记录；log 过长时由 MemoryManager 压缩到最近 MAX_HISTORY 条
+    get_memory_manager().append_turns(new_turns)
 
     # ✅ 同时更新当前 state 的 session_history（满足“state fields accumulate previous Q/A”）
     state_history = state.get("session_history", [])
@@ -90,11 +126,15 @@ def memory_update_node(state: AgentState) -> AgentState:
         state_history.append({"role": "assistant", "content": answer})
     state["session_history"] = state_history[-10:]
 
-    data.setdefault("user_profile", state.get("user_profile", {}))
-    data.setdefault("notes", state.get("notes", []))
-
-    _save_memory_file(data)
-
     state.setdefault("activated_agents", []).append("memory_update")
     return state
 
+
+async def amemory_load_node(state: AgentState) -> AgentState:
+    """memory_load_node 的异步版本：可能的磁盘重新加载放到线程池中执行。"""
+    return await asyncio.to_thread(memory_load_node, state)
+
+
+async def amemory_update_node(state: AgentState) -> AgentState:
+    """memory_update_node 的异步版本：放到线程池中执行，避免锁竞争阻塞事件循环。"""
+    return await asyncio.to_thread(memory_update_node, state)
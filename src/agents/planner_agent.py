@@ -1,9 +1,12 @@
 # src/agents/planner_agent.py
 from langchain_core.prompts import ChatPromptTemplate
 from src.config import get_llm
+from src.streaming import stream_llm_text, astream_llm_text
+from src.speculation import take_speculative_answer, atake_speculative_answer
 from src.state import AgentState
+from src.prompt_budget import budget_for, format_history, format_profile, record_prompt_tokens
 
-llm = get_llm(temperature=0.4)
+llm = get_llm(temperature=0.4, node="planning")
 
 planner_prompt = ChatPromptTemplate.from_messages([
     (
@@ -32,47 +35,58 @@ planner_prompt = ChatPromptTemplate.from_messages([
 ])
 
 
-def planner_node(state: AgentState) -> AgentState:
-    """
-    将用户的学习/工作目标拆解为计划：
-    - 使用 user_profile 中的信息（专业、当前课程、目标等）
-    - 参考最近的 session_history（如已有提到的任务）
-    """
+def _build_inputs(state: AgentState) -> dict:
     query = state.get("query", "").strip()
     user_profile = state.get("user_profile", {})
-    history = state.get("session_history", [])
+    history = state.get("agent_history", {}).get("planning", [])
 
     # 将 user_profile 转为简单文本
     if user_profile:
-        profile_lines = [f"{k}: {v}" for k, v in user_profile.items()]
-        profile_text = "\n".join(profile_lines)
+        profile_text = format_profile(user_profile, budget_for("planning", "profile"))
     else:
         profile_text = "No profile information available."
 
     # 将近期历史压缩成一段文本
     if history:
-        history_lines = []
-        for turn in history[-5:]:
-            role = turn.get("role", "user")
-            content = turn.get("content", "")
-            history_lines.append(f"{role}: {content}")
-        history_text = "\n".join(history_lines)
+        history_text = format_history(history, budget_for("planning", "history"))
     else:
         history_text = "No recent history."
 
-    chain = planner_prompt | llm
-    result = chain.invoke(
-        {
-            "query": query,
-            "profile_text": profile_text,
-            "history_text": history_text,
-        }
-    )
+    inputs = {
+        "query": query,
+        "profile_text": profile_text,
+        "history_text": history_text,
+    }
+    record_prompt_tokens(state, "planning", planner_prompt, inputs)
+    return inputs
+
 
-    plan_text = result.content
+def _finish(state: AgentState, plan_text: str) -> AgentState:
     state["plan"] = plan_text
     state["partial_answer"] = plan_text
 
     state.setdefault("activated_agents", []).append("planner_agent")
     state.setdefault("tool_calls", [])
     return state
+
+
+def planner_node(state: AgentState) -> AgentState:
+    """
+    将用户的学习/工作目标拆解为计划：
+    - 使用 user_profile 中的信息（专业、当前课程、目标等）
+    - 参考最近的 session_history（如已有提到的任务）
+    """
+    inputs = _build_inputs(state)
+    answer = take_speculative_answer(state, "planning", inputs)
+    if answer is None:
+        answer = stream_llm_text(planner_prompt, llm, inputs)
+    return _finish(state, answer)
+
+
+async def aplanner_node(state: AgentState) -> AgentState:
+    """planner_node 的异步版本，LLM 调用受全局并发信号量限制。"""
+    inputs = _build_inputs(state)
+    answer = await atake_speculative_answer(state, "planning", inputs)
+    if answer is None:
+        answer = await astream_llm_text(planner_prompt, llm, inputs)
+    return _finish(state, answer)
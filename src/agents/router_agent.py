@@ -1,9 +1,16 @@
 # src/agents/router_agent.py
+import threading
+import time
+from typing import Optional
+
 from langchain_core.prompts import ChatPromptTemplate
-from src.config import get_llm
+from src.config import get_llm, llm_semaphore, FAST_ROUTER_ENABLED, FAST_ROUTER_THRESHOLD
 from src.state import AgentState
+from src.prompt_budget import record_prompt_tokens
+from src.fast_router import FastRouter
+from src.agents.memory_agent import get_memory_manager
 
-llm = get_llm(temperature=0.0)
+llm = get_llm(temperature=0.0, node="router")
 
 router_prompt = ChatPromptTemplate.from_messages([
     (
@@ -22,25 +29,119 @@ router_prompt = ChatPromptTemplate.from_messages([
 ])
 
 
+def _labeled_history_samples():
+    """
+    从长期记忆的历史中取出由 LLM Router 打标签的用户提问（route_source == "llm"），
+    作为本地快速路由模型的训练样本。快速路由自己给出的标签（以及没有来源记录的旧数据）
+    不参与训练，避免模型在自己的猜测上再训练、把误判越强化越多。
+    """
+    history = get_memory_manager().snapshot().get("history", [])
+    return [
+        (turn.get("content", ""), turn.get("route", ""))
+        for turn in history
+        if turn.get("role") == "user" and turn.get("route")
+        and turn.get("route_source") == "llm"
+    ]
+
+
+_fast_router: Optional[FastRouter] = None
+_fast_router_lock = threading.Lock()
+
+
+def _get_fast_router() -> FastRouter:
+    """懒加载本地快速路由器：第一次使用时才读取历史并训练（导入模块时不做 I/O）。"""
+    global _fast_router
+    with _fast_router_lock:
+        if _fast_router is None:
+            router = FastRouter(threshold=FAST_ROUTER_THRESHOLD)
+            if FAST_ROUTER_ENABLED:
+                router.fit(_labeled_history_samples())
+            _fast_router = router
+        return _fast_router
+
+
+def _try_fast_route(state: AgentState, query: str):
+    """本地快速路由；命中时返回标签并写 trace，否则返回 None。"""
+    if not FAST_ROUTER_ENABLED:
+        return None
+    fast_router = _get_fast_router()
+    fast = fast_router.classify(query)
+    if fast is None:
+        return None
+    label, confidence, source = fast
+    state["tool_calls"].append(
+        f"fast_router[{source} conf={confidence:.2f}; {fast_router.stats_text()}]"
+    )
+    state["route_source"] = "fast"
+    return label
+
+
+def _finish_llm_route(state: AgentState, query: str, content: str, start: float) -> str:
+    """规范化 LLM 输出的标签，并更新快速路由的统计与训练样本。"""
+    label = content.strip().lower()
+
+    if label not in ["theory", "coding", "planning", "general"]:
+        label = "general"
+    state["route_source"] = "llm"
+
+    if FAST_ROUTER_ENABLED:
+        fast_router = _get_fast_router()
+        fast_router.record_llm_call(time.perf_counter() - start)
+        fast_router.add_sample(query, label)
+        state["tool_calls"].append(
+            f"fast_router[miss -> llm; {fast_router.stats_text()}]"
+        )
+    return label
+
+
 def router_node(state: AgentState) -> AgentState:
     """
-    读取 state['query']，调用 Qwen 进行分类，
+    读取 state['query']，先尝试本地快速路由；
+    置信度不足时再调用 Qwen 进行分类，
     将结果写入 state['route']，并记录当前节点。
+    快速路由的命中率和估算节省的延迟记录在 state['tool_calls'] 中。
     """
     query = state.get("query", "").strip()
+    state.setdefault("tool_calls", [])
+
     if not query:
         # 没有 query 时直接走 general
         state["route"] = "general"  # type: ignore
+        state["route_source"] = "default"
     else:
-        chain = router_prompt | llm
-        result = chain.invoke({"query": query})
-        label = result.content.strip().lower()
-
-        if label not in ["theory", "coding", "planning", "general"]:
-            label = "general"
+        label = _try_fast_route(state, query)
+        if label is None:
+            start = time.perf_counter()
+            record_prompt_tokens(state, "router", router_prompt, {"query": query})
+            chain = router_prompt | llm
+            result = chain.invoke({"query": query})
+            label = _finish_llm_route(state, query, result.content, start)
 
         state["route"] = label  # type: ignore
 
     state.setdefault("activated_agents", []).append("router")
+    return state
+
+
+async def arouter_node(state: AgentState) -> AgentState:
+    """router_node 的异步版本，LLM 调用受全局并发信号量限制。"""
+    query = state.get("query", "").strip()
     state.setdefault("tool_calls", [])
+
+    if not query:
+        state["route"] = "general"  # type: ignore
+        state["route_source"] = "default"
+    else:
+        label = _try_fast_route(state, query)
+        if label is None:
+            start = time.perf_counter()
+            record_prompt_tokens(state, "router", router_prompt, {"query": query})
+            chain = router_prompt | llm
+            async with llm_semaphore():
+                result = await chain.ainvoke({"query": query})
+            label = _finish_llm_route(state, query, result.content, start)
+
+        state["route"] = label  # type: ignore
+
+    state.setdefault("activated_agents", []).append("router")
     return state
@@ -1,10 +1,15 @@
 # src/agents/theory_agent.py
+import asyncio
+
 from langchain_core.prompts import ChatPromptTemplate
 from src.config import get_llm
+from src.streaming import stream_llm_text, astream_llm_text
+from src.speculation import take_speculative_answer, atake_speculative_answer
 from src.state import AgentState
+from src.prompt_budget import budget_for, record_prompt_tokens
 from src.tools import search_notes, save_markdown_note
 
-llm = get_llm(temperature=0.3)
+llm = get_llm(temperature=0.3, node="theory")
 
 theory_prompt = ChatPromptTemplate.from_messages([
     (
@@ -32,32 +37,28 @@ theory_prompt = ChatPromptTemplate.from_messages([
 ])
 
 
-def theory_node(state: AgentState) -> AgentState:
-    """
-    使用 Qwen 解释 MAS / LLM / ML / RL 等相关理论问题。
-    如果 state['notes'] 中有相关内容，则先用 search_notes 做简单检索，
-    将结果注入到 prompt 中。
-    回答生成后，调用 save_markdown_note 将解释内容保存为一份 markdown 笔记。
-    """
+def _build_inputs(state: AgentState) -> dict:
     query = state.get("query", "").strip()
     notes_list = state.get("notes", [])
 
     state.setdefault("tool_calls", [])
     state.setdefault("activated_agents", [])
 
-    # 1) 检索 notes
-    notes_text = ""
-    if notes_list:
-        notes_text = search_notes(query, notes_list, max_results=2)
-        if notes_text:
-            state["tool_calls"].append("search_notes")
-
-    # 2) 调用 LLM 生成理论解释
-    chain = theory_prompt | llm
-    result = chain.invoke({"query": query, "notes_text": notes_text})
-    answer = result.content
-
-    # 3) 保存为 markdown 笔记
+    # 检索 notes（notes/ 目录下的 markdown 笔记 + memory 中的 notes）
+    # 每篇笔记按 theory 的 notes 预算截断，避免整篇长笔记注入 prompt
+    notes_text = search_notes(query, notes_list, max_results=2,
+                              max_tokens=budget_for("theory", "notes"))
+    if notes_text:
+        state["tool_calls"].append("search_notes")
+
+    inputs = {"query": query, "notes_text": notes_text}
+    record_prompt_tokens(state, "theory", theory_prompt, inputs)
+    return inputs
+
+
+def _postprocess(state: AgentState, answer: str) -> AgentState:
+    """将回答保存为 markdown 笔记，并写回 state。"""
+    query = state.get("query", "").strip()
     try:
         # 用 query 作为标题（简单处理）
         title = query if query else "Theory_Notes"
@@ -75,3 +76,32 @@ def theory_node(state: AgentState) -> AgentState:
     state["partial_answer"] = answer
     state["activated_agents"].append("theory_agent")
     return state
+
+
+def theory_node(state: AgentState) -> AgentState:
+    """
+    使用 Qwen 解释 MAS / LLM / ML / RL 等相关理论问题。
+    先用 search_notes 在笔记索引（notes/ 目录 + state['notes']）中检索，
+    将相关笔记注入到 prompt 中。
+    回答生成后，调用 save_markdown_note 将解释内容保存为一份 markdown 笔记。
+    """
+    # 1) 检索 notes
+    inputs = _build_inputs(state)
+
+    # 2) 流式调用 LLM 生成理论解释（token 会实时推送给 CLI）；
+    #    投机执行已按同样的输入生成过回答时直接取用（见 src/speculation.py）
+    answer = take_speculative_answer(state, "theory", inputs)
+    if answer is None:
+        answer = stream_llm_text(theory_prompt, llm, inputs)
+
+    # 3) 流结束后再保存为 markdown 笔记
+    return _postprocess(state, answer)
+
+
+async def atheory_node(state: AgentState) -> AgentState:
+    """theory_node 的异步版本：LLM 调用受并发信号量限制，笔记写盘放到线程池。"""
+    inputs = _build_inputs(state)
+    answer = await atake_speculative_answer(state, "theory", inputs)
+    if answer is None:
+        answer = await astream_llm_text(theory_prompt, llm, inputs)
+    return await asyncio.to_thread(_postprocess, state, answer)
@@ -0,0 +1,30 @@
+# src/beacon/__init__.py
+"""
+Beacon infrastructure built around the extractor core in src/Beacon.py.
+
+- cache: BeaconResultCache, analysis results keyed by source + options
+  (in-memory LRU, optional shared SQLite table)
+- export: streaming export of results as JSON Lines or compact binary records
+  (BeaconRecordWriter, read_records, export_results)
+- project: BeaconProject, directory analysis in a process pool merged into a
+  cross-module call graph
+- server: BeaconServer, the long-running JSON Lines analysis service, and its
+  killable worker pool (BeaconWorkerPool)
+- cli: command line interface (`python src/Beacon.py ...`, `python -m src.beacon.cli ...`)
+"""
+
+from src.beacon.cache import BeaconResultCache
+from src.beacon.export import BeaconRecordWriter, export_results, read_records
+from src.beacon.project import BeaconProject, analyze_file
+from src.beacon.server import BeaconServer, BeaconWorkerPool
+
+__all__ = [
+    "BeaconProject",
+    "BeaconRecordWriter",
+    "BeaconResultCache",
+    "BeaconServer",
+    "BeaconWorkerPool",
+    "analyze_file",
+    "export_results",
+    "read_records",
+]
@@ -0,0 +1,119 @@
+# src/beacon/cache.py
+"""
+Beacon result cache: analysis results keyed by a hash of the source and the
+analysis options, in an in-memory LRU with an optional shared SQLite table.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+# Bump when the analysis output changes, so cached results are not reused
+CACHE_VERSION = 3
+
+
+class BeaconResultCache:
+    """
+    Cache of analysis results keyed by sha256(source) plus the analysis options.
+
+    - In memory: LRU with at most `max_entries` results.
+    - On disk (optional): a SQLite table shared across runs / processes; memory
+      misses fall back to it and are promoted into the LRU.
+
+    Cached results are shared; callers must treat them as read-only.
+    """
+
+    def __init__(self, max_entries: int = 256, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self._lru: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS beacon_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(code: str, **options) -> str:
+        h = hashlib.sha256()
+        h.update(f"v{CACHE_VERSION}".encode())
+        for name in sorted(options):
+            h.update(f"\0{name}={options[name]!r}".encode("utf-8"))
+        h.update(b"\0\0")
+        h.update(code.encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            result = self._lru.get(key)
+            if result is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return result
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value FROM beacon_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    try:
+                        result = json.loads(row[0])
+                    except ValueError:
+                        result = None
+                    if result is not None:
+                        self.hits += 1
+                        self.disk_hits += 1
+                        self._remember(key, result)
+                        return result
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, result: Dict):
+        with self._lock:
+            self._remember(key, result)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO beacon_cache (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(result, ensure_ascii=False), time.time()),
+                )
+                self._conn.commit()
+
+    def _remember(self, key: str, result: Dict):
+        self._lru[key] = result
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._lru),
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,245 @@
+# src/beacon/cli.py
+"""
+Command line interface of the Beacon extractor.
+
+Usage (from the project root):
+    python src/Beacon.py your_file.py
+    python src/Beacon.py your_file.py --mode full --json beacons.json --tree
+    python src/Beacon.py your_file.py --tree-out tree.dot --tree-format dot --tree-depth 6
+    python src/Beacon.py your_project/ --workers 8 --json beacons.json
+    python src/Beacon.py your_project/ --json beacons.jsonl --format jsonl
+    python src/Beacon.py --serve --workers 4 < requests.jsonl
+    python src/Beacon.py --socket /tmp/beacon.sock
+
+`python -m src.beacon.cli ...` is equivalent.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from src.Beacon import BeaconExtractor
+from src.beacon.cache import BeaconResultCache
+from src.beacon.export import export_results
+from src.beacon.project import BeaconProject
+from src.beacon.server import BeaconServer
+
+def run_project(args):
+    """Project mode: analyze every .py file under a directory."""
+    start = time.perf_counter()
+    cache = BeaconResultCache(path=args.cache, max_entries=1 << 16) if args.cache else None
+    project = BeaconProject(
+        args.path,
+        max_per_func=args.max_per_func,
+        mode=args.mode,
+        workers=args.workers,
+        cache=cache,
+    ).analyze()
+    elapsed = time.perf_counter() - start
+
+    n_edges = sum(len(c) for c in project.calls.values())
+    print("\n============= BEACON PROJECT =============")
+    print(f"{len(project.modules)} modules, {len(project.func_ranges)} functions, "
+          f"{n_edges} call edges ({elapsed:.2f}s, {project.workers} workers)")
+    for path, error in sorted(project.errors.items()):
+        print(f"  [skipped] {path}: {error}")
+    if cache is not None:
+        stats = cache.stats()
+        print(f"[cache] {stats['hits']} files reused, {stats['misses']} analyzed "
+              f"(hit rate {stats['hit_rate']:.0%})")
+        cache.close()
+
+    program_beacons = project.compute_program_beacons(explicit_entry=args.entry)
+    project.print_program_beacons(program_beacons)
+
+    if args.json is not None:
+        export_results(args.json, args.format,
+                       lambda: project.to_json(program_beacons),
+                       lambda: project.iter_records(explicit_entry=args.entry),
+                       source=project.root)
+        print(f"\n[INFO] {args.format} beacons written to {args.json}")
+
+
+def run_server(args):
+    """Server mode: JSON Lines requests on stdin/stdout, or on a Unix socket."""
+    cache = BeaconResultCache(path=args.cache, max_entries=4096) if args.cache else None
+    with BeaconServer(workers=args.workers, cache=cache) as server:
+        if args.socket is not None:
+            print(f"[INFO] Beacon server listening on {args.socket} ({server.workers} workers)",
+                  file=sys.stderr)
+            try:
+                server.serve_unix(args.socket)
+            except KeyboardInterrupt:
+                pass
+        else:
+            server.serve_stream(sys.stdin, sys.stdout)
+    if cache is not None:
+        cache.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Beacon Logic extractor for Python files and projects."
+    )
+    parser.add_argument(
+        "path",
+        nargs="?",
+        help="Path to the Python file to analyze, or a directory for project mode.",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["compact", "full"],
+        default="compact",
+        help="Reduction mode: 'compact' keeps only high-importance beacons, 'full' keeps more details.",
+    )
+    parser.add_argument(
+        "--max-per-func",
+        type=int,
+        default=20,
+        help="Maximum number of local beacons per function (after reduction).",
+    )
+    parser.add_argument(
+        "--entry",
+        type=str,
+        default=None,
+        help="Explicit entry function name (otherwise heuristic: main or <module>).",
+    )
+    parser.add_argument(
+        "--json",
+        type=str,
+        default=None,
+        help="Optional path to save beacons as JSON.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "jsonl", "binary"],
+        default="json",
+        help="Format of the --json output: one JSON document, or streamed records "
+             "(JSON Lines / compact binary, see read_records).",
+    )
+    parser.add_argument(
+        "--max-dep-print",
+        type=int,
+        default=60,
+        help="Max number of dependency graph nodes to print for reasoning.",
+    )
+    parser.add_argument(
+        "--tree",
+        action="store_true",
+        help="Also print a derivation-style Beacon Tree view.",
+    )
+    parser.add_argument(
+        "--tree-depth",
+        type=int,
+        default=None,
+        help="Beacon Tree: expand dependencies at most this many levels below the outputs.",
+    )
+    parser.add_argument(
+        "--tree-width",
+        type=int,
+        default=None,
+        help="Beacon Tree: show at most this many children per node (by line).",
+    )
+    parser.add_argument(
+        "--tree-out",
+        type=str,
+        default=None,
+        help="Write the Beacon Tree to this file instead of stdout (implies --tree).",
+    )
+    parser.add_argument(
+        "--tree-format",
+        choices=["text", "json", "dot"],
+        default="text",
+        help="Format of --tree-out: text, nested JSON, or Graphviz DOT.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Project / server mode: number of worker processes (default: CPU count).",
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        default=None,
+        help="Project / server mode: SQLite file caching results by content hash.",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Server mode: answer JSON Lines analysis requests from stdin on stdout.",
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        help="Server mode: listen on this Unix socket instead of stdin/stdout.",
+    )
+
+    args = parser.parse_args()
+
+    if args.serve or args.socket is not None:
+        run_server(args)
+        return
+    if args.path is None:
+        parser.error("path is required unless --serve / --socket is given")
+
+    if os.path.isdir(args.path):
+        run_project(args)
+        return
+
+    with open(args.path, "r", encoding="utf-8") as f:
+        code = f.read()
+
+    extractor = BeaconExtractor(code)
+    extractor.visit(extractor.tree)
+
+    print("\n============= BEACON REASONING =============")
+    extractor.print_output_nodes()
+    extractor.print_dep_graph(max_nodes=args.max_dep_print)
+    extractor.print_calls()
+
+    local_beacons = extractor.compute_all_local_beacons(
+        max_per_func=args.max_per_func,
+        mode=args.mode,
+    )
+    extractor.print_local_beacons(local_beacons)
+
+    program_beacons = extractor.compute_program_beacons(
+        max_per_func=args.max_per_func,
+        mode=args.mode,
+        explicit_entry=args.entry,
+    )
+    print("\n============= BEACON RESULT (PROGRAM LEVEL) =============")
+    extractor.print_program_beacons(program_beacons)
+
+    if args.tree_out is not None:
+        with open(args.tree_out, "w", encoding="utf-8") as f:
+            extractor.write_program_beacon_tree(
+                program_beacons,
+                f,
+                fmt=args.tree_format,
+                explicit_entry=args.entry,
+                max_depth=args.tree_depth,
+                max_children=args.tree_width,
+            )
+        print(f"\n[INFO] {args.tree_format} Beacon Tree written to {args.tree_out}")
+    elif args.tree:
+        extractor.print_program_beacon_tree(
+            program_beacons,
+            explicit_entry=args.entry,
+            max_depth=args.tree_depth,
+            max_children=args.tree_width,
+        )
+
+    if args.json is not None:
+        export_results(args.json, args.format,
+                       lambda: extractor.to_json(local_beacons, program_beacons),
+                       lambda: extractor.iter_records(local_beacons, program_beacons),
+                       source=args.path)
+        print(f"\n[INFO] {args.format} beacons written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+# src/beacon/export.py
+"""
+Beacon streaming export: analysis results written one record at a time as
+JSON Lines or compact binary records, and read back with read_records.
+"""
+
+import json
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# Record type -> fields, in binary field order
+RECORD_FIELDS = {
+    "meta": ("format", "version", "source"),
+    "module": ("module", "path"),
+    "error": ("path", "error"),
+    "local": ("module", "func", "line", "code"),
+    "program": ("entry", "module", "func", "line", "code"),
+    "call": ("caller", "callee"),
+}
+RECORD_VERSION = 1
+
+# Binary format: magic, then records. A record is a type byte (0 defines the
+# next interned string) followed by one tagged value per field of its type.
+BINARY_MAGIC = b"BEACONB\x01"
+_RECORD_TYPES = list(RECORD_FIELDS)
+_RECORD_CODE = {name: i + 1 for i, name in enumerate(_RECORD_TYPES)}
+_INTERNED_FIELDS = {"format", "source", "module", "func", "entry", "caller", "callee"}
+_TAG_NULL, _TAG_INT, _TAG_REF, _TAG_STR = 0, 1, 2, 3
+
+
+def _put_varint(buf: bytearray, n: int):
+    while n >= 0x80:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+class BeaconRecordWriter:
+    """
+    Writes beacon records one at a time through a buffered file, so exporting
+    never holds more than one record in memory.
+
+    - "jsonl":  one compact JSON object per line
+    - "binary": varint-encoded records; names (func, module, entry, ...) are
+      interned, so each distinct name is stored once
+
+    Fields that are None are omitted; read_records gives back the same dicts
+    for both formats.
+    """
+
+    def __init__(self, path: str, fmt: str = "jsonl", source: Optional[str] = None):
+        if fmt not in ("jsonl", "binary"):
+            raise ValueError(f"unknown record format: {fmt!r}")
+        self.fmt = fmt
+        self.count = 0
+        self._file = open(path, "wb", buffering=1 << 16)
+        self._encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+        self._strings: Dict[str, int] = {}
+        if fmt == "binary":
+            self._file.write(BINARY_MAGIC)
+        self.write({"type": "meta", "format": "beacon-records", "version": RECORD_VERSION,
+                    "source": source})
+
+    def write(self, record: Dict):
+        fields = RECORD_FIELDS[record["type"]]
+        if self.fmt == "jsonl":
+            row = {"type": record["type"]}
+            for name in fields:
+                value = record.get(name)
+                if value is not None:
+                    row[name] = value
+            self._file.write(self._encode(row).encode("utf-8"))
+            self._file.write(b"\n")
+        else:
+            self._file.write(self._encode_binary(record, fields))
+        self.count += 1
+
+    def write_all(self, records) -> int:
+        for record in records:
+            self.write(record)
+        return self.count
+
+    def _encode_binary(self, record: Dict, fields: Tuple[str, ...]) -> bytes:
+        buf = bytearray()
+        values = bytearray()
+        for name in fields:
+            value = record.get(name)
+            if value is None:
+                values.append(_TAG_NULL)
+            elif isinstance(value, int):
+                values.append(_TAG_INT)
+                _put_varint(values, value << 1 if value >= 0 else (-value << 1) - 1)  # zigzag
+            elif name in _INTERNED_FIELDS:
+                ref = self._strings.get(value)
+                if ref is None:
+                    # define the string first: type 0, length, utf-8 bytes
+                    data = value.encode("utf-8", "surrogatepass")
+                    buf.append(0)
+                    _put_varint(buf, len(data))
+                    buf += data
+                    ref = self._strings[value] = len(self._strings)
+                values.append(_TAG_REF)
+                _put_varint(values, ref)
+            else:
+                data = str(value).encode("utf-8", "surrogatepass")
+                values.append(_TAG_STR)
+                _put_varint(values, len(data))
+                values += data
+        buf.append(_RECORD_CODE[record["type"]])
+        buf += values
+        return bytes(buf)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self) -> "BeaconRecordWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _ByteReader:
+    """Chunked reads over a binary file for the record decoder."""
+
+    def __init__(self, f, chunk: int = 1 << 16):
+        self._f = f
+        self._chunk = chunk
+        self._buf = b""
+        self._pos = 0
+
+    def _fill(self, n: int) -> bool:
+        if self._pos + n <= len(self._buf):
+            return True
+        more = self._f.read(max(self._chunk, n))
+        self._buf = self._buf[self._pos:] + more
+        self._pos = 0
+        return n <= len(self._buf)
+
+    def byte(self) -> Optional[int]:
+        if not self._fill(1):
+            return None
+        b = self._buf[self._pos]
+        self._pos += 1
+        return b
+
+    def varint(self) -> int:
+        shift = result = 0
+        while True:
+            b = self.byte()
+            if b is None:
+                raise ValueError("truncated beacon record")
+            result |= (b & 0x7F) << shift
+            if b < 0x80:
+                return result
+            shift += 7
+
+    def read(self, n: int) -> bytes:
+        if not self._fill(n):
+            raise ValueError("truncated beacon record")
+        data = self._buf[self._pos:self._pos + n]
+        self._pos += n
+        return data
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    """Stream records back from a file written by BeaconRecordWriter (either format)."""
+    with open(path, "rb") as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            f.seek(0)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        reader = _ByteReader(f)
+        strings: List[str] = []
+        while True:
+            code = reader.byte()
+            if code is None:
+                return
+            if code == 0:
+                strings.append(reader.read(reader.varint()).decode("utf-8", "surrogatepass"))
+                continue
+            rtype = _RECORD_TYPES[code - 1]
+            record: Dict = {"type": rtype}
+            for name in RECORD_FIELDS[rtype]:
+                tag = reader.byte()
+                if tag == _TAG_INT:
+                    n = reader.varint()
+                    record[name] = (n >> 1) ^ -(n & 1)
+                elif tag == _TAG_REF:
+                    record[name] = strings[reader.varint()]
+                elif tag == _TAG_STR:
+                    record[name] = reader.read(reader.varint()).decode("utf-8", "surrogatepass")
+                elif tag != _TAG_NULL:
+                    raise ValueError(f"bad value tag {tag!r} in beacon record")
+            yield record
+
+
+def export_results(path: str, fmt: str, data_fn, records_fn, source: Optional[str] = None):
+    """Write results to `path`: "json" dumps data_fn(), other formats stream records_fn()."""
+    if fmt == "json":
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data_fn(), f, ensure_ascii=False, indent=2)
+        return
+    with BeaconRecordWriter(path, fmt, source=source) as writer:
+        writer.write_all(records_fn())
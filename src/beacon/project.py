@@ -0,0 +1,333 @@
+# src/beacon/project.py
+"""
+Beacon project mode: analyzes every .py file under a directory in a process
+pool and merges the per-file results into a cross-module call graph.
+"""
+
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from src.Beacon import BeaconExtractor
+from src.beacon.cache import BeaconResultCache
+
+
+def analyze_file(path: str, max_per_func: int = 20, mode: str = "compact") -> Dict:
+    """
+    Analyze one file (runs inside a worker process).
+
+    Returns a small picklable summary instead of the extractor itself:
+    functions, call graph, imports and reduced local beacons as (line, func, code).
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            code = f.read()
+        extractor = BeaconExtractor(code)
+        extractor.visit(extractor.tree)
+        local = extractor.compute_all_local_beacons(max_per_func=max_per_func, mode=mode)
+    except (SyntaxError, ValueError, RecursionError, UnicodeDecodeError, OSError) as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+
+    return {
+        "path": path,
+        "func_ranges": dict(extractor.func_ranges),
+        "calls": {f: sorted(c) for f, c in extractor.calls.items() if c},
+        "attr_calls": {f: sorted(c) for f, c in extractor.attr_calls.items() if c},
+        "imports": dict(extractor.imports),
+        "local_beacons": {
+            func: [
+                (extractor.node_lines.get(nid), extractor.node_func.get(nid), extractor._safe_get_line(nid))
+                for nid in nodes
+            ]
+            for func, nodes in local.items()
+        },
+    }
+
+
+def _analyze_task(task: Tuple[str, int, str]) -> Dict:
+    return analyze_file(*task)
+
+
+class BeaconProject:
+    """
+    Multi-file Beacon analysis.
+
+    Every .py file under `root` is analyzed by analyze_file in a process pool;
+    the per-file results are merged into one call graph over qualified names
+    ("pkg.mod.func", module-level code as "pkg.mod.<module>"), resolving
+    `import` / `from ... import` (including relative imports) between files.
+    """
+
+    SKIP_DIRS = {"__pycache__", "venv", "env", "node_modules", "site-packages"}
+
+    def __init__(
+        self,
+        root: str,
+        max_per_func: int = 20,
+        mode: str = "compact",
+        workers: Optional[int] = None,
+        cache: Optional[BeaconResultCache] = None,
+    ):
+        self.root = os.path.abspath(root)
+        self.max_per_func = max_per_func
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        # Per-file summaries keyed by file content: unchanged files are not re-analyzed
+        self.cache = cache
+        self.module_name = "<module>"
+
+        # module -> analyze_file result (plus "is_package")
+        self.modules: Dict[str, Dict] = {}
+        # path -> error message for files that could not be analyzed
+        self.errors: Dict[str, str] = {}
+
+        # Qualified function -> (module, start_line, end_line)
+        self.func_ranges: Dict[str, Tuple[str, int, int]] = {}
+        # Cross-module call graph over qualified names
+        self.calls: Dict[str, Set[str]] = defaultdict(set)
+        # Qualified function -> reduced local beacons [(line, func, code)]
+        self.local_beacons: Dict[str, List[Tuple[int, str, str]]] = {}
+
+    # ---------------------------------------------------------
+    # Discovery + parallel analysis
+    # ---------------------------------------------------------
+
+    def _import_base(self) -> str:
+        """Directory that module names are relative to (above any enclosing packages)."""
+        base = self.root
+        while os.path.exists(os.path.join(base, "__init__.py")):
+            parent = os.path.dirname(base)
+            if parent == base:
+                break
+            base = parent
+        return base
+
+    def discover(self) -> List[str]:
+        files: List[str] = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(
+                d for d in dirnames if not d.startswith(".") and d not in self.SKIP_DIRS
+            )
+            files.extend(os.path.join(dirpath, f) for f in sorted(filenames) if f.endswith(".py"))
+        return files
+
+    def module_name_for(self, path: str, base: str) -> str:
+        rel = os.path.relpath(path, base)[:-3]
+        parts = rel.split(os.sep)
+        if parts[-1] == "__init__":
+            parts = parts[:-1]
+        return ".".join(parts) or os.path.basename(base)
+
+    def _file_key(self, path: str) -> Optional[str]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                code = f.read()
+        except (OSError, UnicodeDecodeError):
+            return None
+        return self.cache.make_key(code, kind="file", max_per_func=self.max_per_func, mode=self.mode)
+
+    def analyze(self) -> "BeaconProject":
+        files = self.discover()
+
+        results: List[Dict] = []
+        keys: Dict[str, str] = {}
+        if self.cache is not None:
+            pending = []
+            for path in files:
+                key = self._file_key(path)
+                cached = self.cache.get(key) if key is not None else None
+                if cached is not None:
+                    results.append(dict(cached, path=path))
+                else:
+                    pending.append(path)
+                    if key is not None:
+                        keys[path] = key
+            files = pending
+
+        tasks = [(path, self.max_per_func, self.mode) for path in files]
+        if self.workers == 1 or len(tasks) < 2:
+            fresh = [_analyze_task(task) for task in tasks]
+        else:
+            chunksize = max(1, len(tasks) // (self.workers * 8))
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                fresh = list(pool.map(_analyze_task, tasks, chunksize=chunksize))
+
+        for result in fresh:
+            key = keys.get(result["path"])
+            if key is not None and "error" not in result:
+                self.cache.put(key, {k: v for k, v in result.items() if k != "path"})
+        results.extend(fresh)
+        results.sort(key=lambda r: r["path"])
+
+        base = self._import_base()
+        for result in results:
+            path = result["path"]
+            if "error" in result:
+                self.errors[path] = result["error"]
+                continue
+            module = self.module_name_for(path, base)
+            result["is_package"] = os.path.basename(path) == "__init__.py"
+            self.modules[module] = result
+
+        self._merge()
+        return self
+
+    # ---------------------------------------------------------
+    # Merging: qualified names + import resolution
+    # ---------------------------------------------------------
+
+    def _merge(self):
+        for module, info in self.modules.items():
+            for func, (start, end) in info["func_ranges"].items():
+                self.func_ranges[f"{module}.{func}"] = (module, start, end)
+            for func, beacons in info["local_beacons"].items():
+                self.local_beacons[f"{module}.{func}"] = beacons
+
+        for module, info in self.modules.items():
+            for func, callees in info["calls"].items():
+                caller = f"{module}.{func}"
+                for callee in callees:
+                    target = self._resolve(module, info, callee)
+                    if target is not None:
+                        self.calls[caller].add(target)
+            for func, dotted_names in info["attr_calls"].items():
+                caller = f"{module}.{func}"
+                for dotted in dotted_names:
+                    target = self._resolve(module, info, dotted)
+                    if target is not None:
+                        self.calls[caller].add(target)
+
+    def _absolute(self, module: str, is_package: bool, target: str) -> str:
+        """Turn a relative import target (leading dots) into an absolute dotted name."""
+        if not target.startswith("."):
+            return target
+        level = len(target) - len(target.lstrip("."))
+        rest = target[level:]
+        parts = module.split(".")
+        if not is_package:
+            parts = parts[:-1]
+        if level > 1:
+            parts = parts[:max(0, len(parts) - (level - 1))]
+        return ".".join(parts + ([rest] if rest else []))
+
+    def _resolve(self, module: str, info: Dict, name: str) -> Optional[str]:
+        """Resolve a called name ("f" or "a.b.f") inside `module` to a known qualified function."""
+        head, _, tail = name.partition(".")
+
+        # functions and methods ("Class.method") of this module; Class(...) runs Class.__init__
+        if name in info["func_ranges"]:
+            return f"{module}.{name}"
+        if f"{name}.__init__" in info["func_ranges"]:
+            return f"{module}.{name}.__init__"
+
+        imported = info["imports"].get(head)
+        if imported is None:
+            return None
+        target = self._absolute(module, info["is_package"], imported)
+        if tail:
+            target = f"{target}.{tail}"
+        if target in self.func_ranges:
+            return target
+        target = f"{target}.__init__"
+        return target if target in self.func_ranges else None
+
+    # ---------------------------------------------------------
+    # Global logic across modules
+    # ---------------------------------------------------------
+
+    def find_entry_points(self, explicit_entry: Optional[str] = None) -> List[str]:
+        """
+        - explicit_entry: a qualified name, or a bare function name matched in every module
+        - else every `main` function
+        - else the module-level code of every module
+        """
+        if explicit_entry is not None:
+            if explicit_entry in self.func_ranges:
+                return [explicit_entry]
+            matches = sorted(f for f in self.func_ranges if f.rsplit(".", 1)[-1] == explicit_entry)
+            if matches:
+                return matches
+
+        mains = sorted(f for f in self.func_ranges if f.rsplit(".", 1)[-1] == "main")
+        if mains:
+            return mains
+        return sorted(f"{module}.{self.module_name}" for module in self.modules)
+
+    def reachable_functions_from(self, entry: str) -> Set[str]:
+        """DFS on the cross-module call graph starting from entry."""
+        visited: Set[str] = set()
+        stack: List[str] = [entry]
+        while stack:
+            f = stack.pop()
+            if f in visited:
+                continue
+            visited.add(f)
+            stack.extend(c for c in self.calls.get(f, ()) if c not in visited)
+        return visited
+
+    def _module_of(self, qualified: str) -> str:
+        info = self.func_ranges.get(qualified)
+        if info is not None:
+            return info[0]
+        return qualified.rsplit(".", 1)[0]
+
+    def compute_program_beacons(self, explicit_entry: Optional[str] = None) -> Dict[str, List[Dict]]:
+        """
+        Program-level Beacons across files: for each entry, union the local beacons
+        of every reachable function plus the module-level beacons of their modules.
+        """
+        program: Dict[str, List[Dict]] = {}
+        for entry in self.find_entry_points(explicit_entry):
+            program[entry] = [
+                {"module": module, "func": func, "line": line, "code": code}
+                for module, line, func, code in self._entry_beacons(entry)
+            ]
+        return program
+
+    def _entry_beacons(self, entry: str) -> List[Tuple[str, int, str, str]]:
+        """Sorted (module, line, func, code) beacons of everything reachable from entry."""
+        reachable = self.reachable_functions_from(entry)
+        reachable |= {f"{self._module_of(f)}.{self.module_name}" for f in reachable}
+
+        collected: Set[Tuple[str, int, str, str]] = set()
+        for qualified in reachable:
+            module = self._module_of(qualified)
+            for line, func, code in self.local_beacons.get(qualified, ()):
+                collected.add((module, line, func, code))
+        return sorted(collected)
+
+    def iter_records(self, explicit_entry: Optional[str] = None) -> Iterator[Dict]:
+        """
+        The to_json content as a stream of flat records (see src/beacon/export.py).
+        Program beacons are produced one entry at a time, so only a single
+        entry's beacons are held in memory.
+        """
+        for module in sorted(self.modules):
+            yield {"type": "module", "module": module, "path": self.modules[module]["path"]}
+        for path, error in sorted(self.errors.items()):
+            yield {"type": "error", "path": path, "error": error}
+        for entry in self.find_entry_points(explicit_entry):
+            for module, line, func, code in self._entry_beacons(entry):
+                yield {"type": "program", "entry": entry, "module": module,
+                       "func": func, "line": line, "code": code}
+        for caller in sorted(self.calls):
+            for callee in sorted(self.calls[caller]):
+                yield {"type": "call", "caller": caller, "callee": callee}
+
+    def to_json(self, program_beacons: Dict[str, List[Dict]]) -> Dict:
+        return {
+            "root": self.root,
+            "modules": sorted(self.modules),
+            "errors": self.errors,
+            "program_beacons": program_beacons,
+            "call_graph": {f: sorted(c) for f, c in sorted(self.calls.items())},
+        }
+
+    def print_program_beacons(self, program_beacons: Dict[str, List[Dict]]):
+        print("\n=== PROGRAM-LEVEL BEACONS (cross-module) ===")
+        for entry, beacons in program_beacons.items():
+            reachable = self.reachable_functions_from(entry)
+            print(f"\n[Entry: {entry}]  (reachable functions: {len(reachable)})")
+            for b in beacons:
+                print(f"  [{b['module']}.{b['func']}] line {b['line']}: {b['code']}")
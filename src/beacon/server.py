@@ -0,0 +1,426 @@
+# src/beacon/server.py
+"""
+Beacon server mode: a long-running worker answering JSON Lines analysis
+requests on stdin/stdout or a Unix socket. Batches are fanned out to killable
+worker processes (BeaconWorkerPool) with an optional per-batch deadline.
+"""
+
+import io
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+from typing import IO, Dict, List, Optional, Tuple
+
+from src.Beacon import IncrementalBeacon, _source_key, analyze_source
+from src.beacon.cache import BeaconResultCache
+
+
+class _BadRequest(ValueError):
+    pass
+
+
+def _request_options(request: Dict) -> Dict:
+    """analyze_source keyword arguments of one request (raises _BadRequest)."""
+    code = request.get("code")
+    if not isinstance(code, str):
+        raise _BadRequest("request needs a string 'code' field")
+    mode = request.get("mode", "compact")
+    if mode not in ("compact", "full"):
+        raise _BadRequest(f"unknown mode {mode!r}")
+    max_per_func = request.get("max_per_func", 20)
+    if not isinstance(max_per_func, int) or max_per_func < 1:
+        raise _BadRequest("max_per_func must be a positive integer")
+    entry = request.get("entry")
+    if entry is not None and not isinstance(entry, str):
+        raise _BadRequest("entry must be a string")
+    return {
+        "code": code,
+        "max_per_func": max_per_func,
+        "mode": mode,
+        "explicit_entry": entry,
+        "include_local": bool(request.get("include_local", True)),
+    }
+
+
+_process_incremental: Optional[IncrementalBeacon] = None
+
+
+def _request_doc_id(request: Dict) -> Optional[str]:
+    """The "doc_id" of a request (raises _BadRequest); None when absent."""
+    doc_id = request.get("doc_id")
+    if doc_id is not None and not isinstance(doc_id, str):
+        raise _BadRequest("doc_id must be a string")
+    return doc_id
+
+
+def _analyze_request_task(options: Dict) -> Dict:
+    """
+    One analysis inside a worker: {"result": ...} or {"error": ...}.
+    With options["doc_id"], revisions of that document go through the process's
+    IncrementalBeacon.
+    """
+    global _process_incremental
+    incremental = None
+    if options.get("doc_id") is not None:
+        if _process_incremental is None:
+            _process_incremental = IncrementalBeacon()
+        incremental = _process_incremental
+    try:
+        return {"result": analyze_source(**options, incremental=incremental)}
+    except (SyntaxError, ValueError, RecursionError) as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+def _worker_loop(conn) -> None:
+    """Worker process body: analyze the options received on `conn` until None or EOF."""
+    while True:
+        try:
+            options = conn.recv()
+        except EOFError:
+            return
+        if options is None:
+            return
+        conn.send(_analyze_request_task(options))
+
+
+class _Worker:
+    """One worker process and the parent end of its pipe."""
+
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_loop, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=1.0)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class BeaconWorkerPool:
+    """
+    Up to `workers` analysis processes, each handling one request at a time.
+
+    Unlike a ProcessPoolExecutor, a worker still running when the deadline of
+    its batch passes is killed (and replaced lazily by the next batch), so a
+    pathological snippet costs at most `timeout` seconds of CPU and never keeps
+    a slot busy.
+
+    A task with a "doc_id" goes to the worker that analyzed the previous revision
+    of that document when it is idle, so the revision is re-analyzed against the
+    extractor kept there; otherwise (worker busy or killed) it runs on any worker,
+    which then holds the document. Other tasks reuse the most recently released
+    worker first.
+    """
+
+    # documents whose worker is remembered, least recently used first out
+    max_documents = 1024
+
+    def __init__(self, workers: int, mp_context=None):
+        self.workers = workers
+        self._ctx = mp_context if mp_context is not None else multiprocessing.get_context()
+        self._slots = threading.BoundedSemaphore(workers)
+        self._idle: List[_Worker] = []
+        self._doc_workers: "OrderedDict[str, _Worker]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.timeouts = 0
+        self.restarts = 0
+
+    def _acquire(self, timeout: Optional[float], doc_id: Optional[str] = None) -> Optional[_Worker]:
+        if timeout is not None and timeout <= 0:
+            acquired = self._slots.acquire(blocking=False)
+        else:
+            acquired = self._slots.acquire(timeout=timeout)
+        if not acquired:
+            return None
+        with self._lock:
+            holder = self._doc_workers.get(doc_id) if doc_id is not None else None
+            if holder is not None and holder in self._idle:
+                self._idle.remove(holder)
+                return holder
+            if self._idle:
+                return self._idle.pop()
+        try:
+            return _Worker(self._ctx)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, worker: _Worker):
+        with self._lock:
+            self._idle.append(worker)
+        self._slots.release()
+
+    def _discard(self, worker: _Worker):
+        worker.kill()
+        with self._lock:
+            self.restarts += 1
+            for doc_id in [d for d, w in self._doc_workers.items() if w is worker]:
+                del self._doc_workers[doc_id]
+        self._slots.release()
+
+    def _assign(self, doc_id: str, worker: _Worker):
+        with self._lock:
+            self._doc_workers.pop(doc_id, None)
+            self._doc_workers[doc_id] = worker
+            while len(self._doc_workers) > self.max_documents:
+                self._doc_workers.popitem(last=False)
+
+    def run(self, tasks: List[Dict], timeout: Optional[float] = None) -> List[Optional[Dict]]:
+        """
+        _analyze_request_task outcomes of `tasks`, in order. Tasks not finished
+        within `timeout` seconds get {"error": "timeout ..."}; a task whose worker
+        died gets None (the caller decides how to retry it).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        outcomes: List[Optional[Dict]] = [None] * len(tasks)
+        running: Dict = {}  # conn -> (task index, worker)
+        # tasks with a doc_id start first, before other tasks can take their workers
+        order = sorted(range(len(tasks)), key=lambda i: tasks[i].get("doc_id") is None)
+        next_task = 0
+        while next_task < len(tasks) or running:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            # start as many tasks as there are free slots; block for one only when nothing runs
+            while next_task < len(tasks) and remaining != 0.0:
+                index = order[next_task]
+                doc_id = tasks[index].get("doc_id")
+                worker = self._acquire(0 if running else remaining, doc_id)
+                if worker is None:
+                    break
+                try:
+                    worker.conn.send(tasks[index])
+                except OSError:
+                    self._discard(worker)
+                    continue
+                if doc_id is not None:
+                    self._assign(doc_id, worker)
+                running[worker.conn] = (index, worker)
+                next_task += 1
+            if not running:
+                break  # no slot freed up before the deadline
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready = multiprocessing.connection.wait(list(running), timeout=remaining)
+            if not ready:
+                break  # deadline passed
+            for conn in ready:
+                index, worker = running.pop(conn)
+                try:
+                    outcomes[index] = conn.recv()
+                except (EOFError, OSError):
+                    self._discard(worker)
+                else:
+                    self._release(worker)
+
+        if running or next_task < len(tasks):
+            for index, worker in running.values():
+                self._discard(worker)
+            unfinished = [index for index, _ in running.values()] + order[next_task:]
+            for index in unfinished:
+                outcomes[index] = {"error": f"timeout: analysis did not finish within {timeout:g}s"}
+            with self._lock:
+                self.timeouts += len(unfinished)
+        return outcomes
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._doc_workers.clear()
+        for worker in idle:
+            worker.close()
+
+
+class BeaconServer:
+    """
+    Long-running Beacon worker: answers analysis requests without paying
+    interpreter startup, imports and argument parsing per snippet.
+
+    A request is a JSON object
+        {"id": ..., "code": "...", "mode": "compact", "max_per_func": 20,
+         "entry": null, "include_local": true, "doc_id": null}
+    and its response {"id": ..., "result": <analyze_source dict>} or
+    {"id": ..., "error": "..."}. {"op": "stats"} returns counters instead.
+
+    Requests are first looked up in the result cache (identical snippets in a
+    batch are analyzed once); the remaining ones run inline when there is a
+    single one (no IPC round trip) or less than `parallel_min_chars` of code,
+    else fan out to a BeaconWorkerPool that is kept for the lifetime of the
+    server. `mp_context` selects how the pool starts its workers (e.g.
+    "forkserver" when embedded in a multi-threaded process). A batch with a
+    timeout always runs in the pool, so that analyses still running at the
+    deadline can be killed; they are answered with a "timeout" error.
+    A request with a "doc_id" is analyzed through the worker's IncrementalBeacon:
+    a new revision of that document re-analyzes only what changed. In the pool,
+    requests of one document are routed to the worker holding it.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        cache: Optional[BeaconResultCache] = None,
+        parallel_min_chars: int = 0,
+        mp_context=None,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = cache if cache is not None else BeaconResultCache(max_entries=4096)
+        self.parallel_min_chars = parallel_min_chars
+        self.mp_context = mp_context
+        self._pool: Optional[BeaconWorkerPool] = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def __enter__(self) -> "BeaconServer":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+
+    def _get_pool(self) -> BeaconWorkerPool:
+        with self._lock:
+            if self._pool is None:
+                self._pool = BeaconWorkerPool(self.workers, mp_context=self.mp_context)
+            return self._pool
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = {"requests": self.requests, "errors": self.errors, "workers": self.workers}
+            pool = self._pool
+        if pool is not None:
+            counters.update(timeouts=pool.timeouts, restarts=pool.restarts)
+        return dict(counters, cache=self.cache.stats())
+
+    # ---------------------------------------------------------
+    # Requests
+    # ---------------------------------------------------------
+
+    def analyze_batch(self, requests: List[Dict], timeout: Optional[float] = None) -> List[Dict]:
+        """
+        Responses to `requests`, in order. With a timeout (seconds), analyses
+        still running after it are killed and answered with a "timeout" error.
+        """
+        responses: List[Optional[Dict]] = [None] * len(requests)
+        # cache key -> (task options, indices of the requests waiting for it)
+        pending: Dict[str, Tuple[Dict, List[int]]] = {}
+        for i, request in enumerate(requests):
+            if not isinstance(request, dict):
+                responses[i] = {"id": None, "error": "request must be a JSON object"}
+                continue
+            if request.get("op") == "stats":
+                responses[i] = {"id": request.get("id"), "stats": self.stats()}
+                continue
+            try:
+                options = _request_options(request)
+                doc_id = _request_doc_id(request)
+            except _BadRequest as e:
+                responses[i] = {"id": request.get("id"), "error": str(e)}
+                continue
+            key = _source_key(self.cache, **options)
+            if key in pending:
+                pending[key][1].append(i)
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                responses[i] = {"id": request.get("id"), "result": cached}
+            else:
+                pending[key] = (dict(options, doc_id=doc_id), [i])
+
+        jobs = list(pending.items())
+        tasks = [options for _, (options, _) in jobs]
+        pending_chars = sum(len(options["code"]) for options in tasks)
+        if timeout is None and (len(jobs) == 1 or self.workers == 1
+                                or pending_chars < self.parallel_min_chars):
+            outcomes = [_analyze_request_task(options) for options in tasks]
+        elif tasks:
+            outcomes = self._get_pool().run(tasks, timeout=timeout)
+            for j, outcome in enumerate(outcomes):
+                if outcome is not None:
+                    continue
+                # the worker died: retry inline unless the caller bounded the time
+                outcomes[j] = (_analyze_request_task(tasks[j]) if timeout is None
+                               else {"error": "Beacon worker exited unexpectedly"})
+        else:
+            outcomes = []
+
+        for (key, (_, indices)), outcome in zip(jobs, outcomes):
+            if "result" in outcome:
+                self.cache.put(key, outcome["result"])
+            for i in indices:
+                responses[i] = {"id": requests[i].get("id"), **outcome}
+
+        with self._lock:
+            self.requests += len(requests)
+            self.errors += sum(1 for r in responses if "error" in r)
+        return responses
+
+    def handle_line(self, line: str) -> List[Dict]:
+        """Responses to one input line: a request object or a JSON list of them."""
+        try:
+            payload = json.loads(line)
+        except ValueError as e:
+            with self._lock:
+                self.requests += 1
+                self.errors += 1
+            return [{"id": None, "error": f"invalid JSON: {e}"}]
+        return self.analyze_batch(payload if isinstance(payload, list) else [payload])
+
+    # ---------------------------------------------------------
+    # Transports
+    # ---------------------------------------------------------
+
+    def serve_stream(self, infile: IO[str], outfile: IO[str]):
+        """Answer JSON Lines requests until EOF; one response line per request, flushed per input line."""
+        for line in iter(infile.readline, ""):
+            if not line.strip():
+                continue
+            for response in self.handle_line(line):
+                outfile.write(json.dumps(response, ensure_ascii=False) + "\n")
+            outfile.flush()
+
+    def serve_unix(self, path: str):
+        """Serve the same protocol on a Unix socket, one thread per connection."""
+        if not hasattr(socketserver, "ThreadingUnixStreamServer"):
+            raise OSError("Unix sockets are not available on this platform")
+        if os.path.exists(path):
+            os.unlink(path)
+        with _BeaconSocketServer(path, _BeaconRequestHandler) as server:
+            server.beacon = self
+            try:
+                server.serve_forever()
+            finally:
+                os.unlink(path)
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _BeaconSocketServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+        beacon: BeaconServer
+
+
+class _BeaconRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        reader = io.TextIOWrapper(self.rfile, encoding="utf-8")
+        writer = io.TextIOWrapper(self.wfile, encoding="utf-8")
+        self.server.beacon.serve_stream(reader, writer)
@@ -1,5 +1,10 @@
 # src/config.py
+import asyncio
 import os
+import weakref
+from pathlib import Path
+from typing import Dict, Optional
+
 from langchain_openai import ChatOpenAI
 
 # 基础配置：与学院 vLLM / liteLLM 服务保持一致
@@ -7,21 +12,132 @@ BASE_URL = os.getenv("LITELLM_BASE_URL", "http://a6k2.dgx:34000/v1")
 API_KEY = os.getenv("LITELLM_API_KEY", "sk-3ytNnX-OUrY4WQmGwJBmQA")  # 建议通过环境变量提供真实 Token
 MODEL_NAME = os.getenv("MODEL_NAME", "qwen3-32b")
 
+# Router 本地快速路径：置信度不低于阈值时跳过 LLM 分类调用
+FAST_ROUTER_ENABLED = os.getenv("FAST_ROUTER_ENABLED", "1") != "0"
+FAST_ROUTER_THRESHOLD = float(os.getenv("FAST_ROUTER_THRESHOLD", "0.85"))
+
+# LLM 响应缓存：temperature == 0.0 的调用（Router）默认缓存，
+# 其他节点需要在 LLM_CACHE_NODES 中显式列出（逗号分隔，如 "theory,coding"）
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_PATH = Path(os.getenv(
+    "LLM_CACHE_PATH",
+    str(Path(__file__).resolve().parents[1] / "data" / "llm_cache.sqlite"),
+))
+LLM_CACHE_NODES = {n.strip() for n in os.getenv("LLM_CACHE_NODES", "").split(",") if n.strip()}
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Beacon 分析结果缓存（按源码内容哈希）：默认只在内存中做 LRU，
+# 设置 BEACON_CACHE_PATH 时同时持久化到 SQLite，跨进程 / 跨运行复用
+BEACON_CACHE_ENABLED = os.getenv("BEACON_CACHE_ENABLED", "1") != "0"
+BEACON_CACHE_MAX_ENTRIES = int(os.getenv("BEACON_CACHE_MAX_ENTRIES", "256"))
+BEACON_CACHE_PATH = os.getenv("BEACON_CACHE_PATH") or None
+
+# 对同一段代码的后续修改版本做增量 Beacon 分析（只重新分析改动过的函数）
+BEACON_INCREMENTAL_ENABLED = os.getenv("BEACON_INCREMENTAL_ENABLED", "1") != "0"
+
+# Beacon 分析不阻塞 coding 回答：开启后回答立即返回，summary 在后台线程池中计算，
+# 由调用方（CLI / 并发入口）作为补充消息取回。两种模式都受超时（秒）和代码块大小（字符数）限制
+BEACON_BACKGROUND_ENABLED = os.getenv("BEACON_BACKGROUND_ENABLED", "0") != "0"
+BEACON_TIMEOUT = float(os.getenv("BEACON_TIMEOUT", "5.0"))
+BEACON_MAX_CODE_CHARS = int(os.getenv("BEACON_MAX_CODE_CHARS", "50000"))
+BEACON_WORKERS = int(os.getenv("BEACON_WORKERS", "2"))
+# 一次回答里有多个代码块时，未缓存的代码总量达到这个字符数才分发到多进程（否则进程间通信不划算）
+BEACON_PARALLEL_MIN_CHARS = int(os.getenv("BEACON_PARALLEL_MIN_CHARS", "20000"))
+
+# 投机执行（opt-in）：LLM Router 分类期间，按本地快速路由的最佳猜测提前启动 specialist 的 LLM 调用，
+# 路由不一致时取消。猜测置信度低于 SPECULATIVE_MIN_CONFIDENCE 时不投机（避免浪费 LLM 请求）
+SPECULATIVE_ROUTING_ENABLED = os.getenv("SPECULATIVE_ROUTING_ENABLED", "0") != "0"
+SPECULATIVE_MIN_CONFIDENCE = float(os.getenv("SPECULATIVE_MIN_CONFIDENCE", "0.5"))
+
+# 异步执行时同时发往 vLLM 的最大请求数
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
 
-def get_llm(temperature: float = 0.2) -> ChatOpenAI:
+_llm_cache_backend = None
+_llm_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_cache_backend():
+    """懒加载共享的 SQLite 缓存，避免没有启用缓存时创建数据库文件。"""
+    global _llm_cache_backend
+    if _llm_cache_backend is None:
+        from src.llm_cache import SQLiteLLMCache
+        _llm_cache_backend = SQLiteLLMCache(
+            LLM_CACHE_PATH,
+            max_entries=LLM_CACHE_MAX_ENTRIES,
+            max_bytes=LLM_CACHE_MAX_BYTES,
+            ttl=LLM_CACHE_TTL if LLM_CACHE_TTL > 0 else None,
+        )
+    return _llm_cache_backend
+
+
+def get_cache_stats() -> Dict[str, Dict[str, int]]:
+    """
+    返回每个节点的缓存命中统计：node -> {"hits": int, "misses": int}。
+    """
+    if _llm_cache_backend is None:
+        return {}
+    return {node: dict(s) for node, s in _llm_cache_backend.stats.items()}
+
+
+def set_llm_max_concurrency(limit: int) -> None:
+    """修改异步 LLM 调用的并发上限（在启动事件循环之前调用）。"""
+    global LLM_MAX_CONCURRENCY
+    LLM_MAX_CONCURRENCY = max(1, limit)
+    _llm_semaphores.clear()
+
+
+def llm_max_concurrency() -> int:
+    """当前的 LLM 并发上限（包括 set_llm_max_concurrency 修改后的值）。"""
+    return LLM_MAX_CONCURRENCY
+
+
+def llm_semaphore() -> asyncio.Semaphore:
+    """
+    返回当前事件循环上的 LLM 并发信号量。
+    所有异步节点在 `await chain.ainvoke(...)` 外层都通过它限流。
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _llm_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        _llm_semaphores[loop] = semaphore
+    return semaphore
+
+
+def get_llm(temperature: float = 0.2,
+            node: str = "default",
+            cache: Optional[bool] = None) -> ChatOpenAI:
     """
     返回一个配置好的 ChatOpenAI 实例。
     后续所有 Agent 统一通过这个函数获取 LLM。
+
+    参数:
+        temperature: 采样温度
+        node: 调用方节点名，用于缓存的 opt-in 判断和命中统计
+        cache: 是否启用响应缓存；None 表示按默认策略
+               （temperature == 0.0 或 node 在 LLM_CACHE_NODES 中）
     """
     if not API_KEY:
         # 这里不直接抛错，而是让调用方在第一次调用时发现问题并修复
         # 实际开发中也可以改成 raise RuntimeError("LITELLM_API_KEY is not set")
         print("[config] Warning: LITELLM_API_KEY is empty, please set environment variable.")
 
+    if cache is None:
+        cache = temperature == 0.0 or node in LLM_CACHE_NODES
+    llm_cache = None
+    if cache and LLM_CACHE_ENABLED:
+        from src.llm_cache import NodeLLMCache
+        llm_cache = NodeLLMCache(_get_cache_backend(), node)
+
     llm = ChatOpenAI(
         model=MODEL_NAME,
         openai_api_base=BASE_URL,   # 使用 OpenAI 兼容的 base URL
         openai_api_key=API_KEY,
         temperature=temperature,
+        cache=llm_cache,
     )
     return llm
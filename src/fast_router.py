@@ -0,0 +1,231 @@
+# src/fast_router.py
+"""
+本地快速路由（fast-path router）。
+
+在调用 Qwen 做分类之前，先用两级本地分类器尝试给出路由标签：
+1) 关键词 / 正则规则：对明显的查询（报错栈、学习计划、"what is ..."）直接命中；
+2) TF-IDF + Logistic Regression：用 memory.json 历史中已经带有 route 标签的
+   用户提问训练的小模型。
+
+只有当置信度达到阈值时才采用本地结果，否则回退到 LLM Router。
+同时记录命中率和节省的延迟，供 router_node 写入 trace 字段。
+"""
+
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# scikit-learn 是可选依赖：缺失时只使用规则分类
+try:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+except Exception:
+    TfidfVectorizer = None
+    LogisticRegression = None
+
+ROUTE_LABELS = ("theory", "coding", "planning", "general")
+
+# (label, pattern, weight)：weight 越高说明该模式越能单独决定类别
+_RULES: List[Tuple[str, str, float]] = [
+    # coding：报错、代码片段、库 / API
+    ("coding", r"```|traceback \(most recent call last\)", 0.95),
+    ("coding", r"\b\w+(error|exception)\b", 0.9),
+    ("coding", r"\b(bug|debug|stack ?trace|segfault|compile|refactor)\b", 0.7),
+    ("coding", r"\b(def|import|class|lambda|pip install|venv)\b", 0.6),
+    ("coding", r"\b(python|pytorch|tensorflow|numpy|pandas|langchain|langgraph|api)\b", 0.4),
+    ("coding", r"\b(fix|implement|code|function)\b", 0.4),
+    # planning：计划、日程、时间安排
+    ("planning", r"\b(study|learning|weekly|daily|revision|exam) (plan|schedule|routine)\b", 0.95),
+    ("planning", r"\b\d+[- ](day|week|month)s?\b.*\bplan\b|\bplan\b.*\b\d+[- ](day|week|month)s?\b", 0.9),
+    ("planning", r"\b(schedule|timetable|deadline|routine|to-?do list|prioriti[sz]e)\b", 0.7),
+    ("planning", r"\b\d+ hours? (per|a|each) (day|week)\b", 0.7),
+    ("planning", r"\b(plan|organi[sz]e my|productiv\w*)\b", 0.4),
+    # theory：概念解释、定义、对比
+    ("theory", r"^\s*(what is|what are|what's)\b", 0.7),
+    ("theory", r"\b(difference between|compare|versus|vs\.?)\b", 0.6),
+    ("theory", r"\b(explain|definition of|define|intuition|concept|theory|why does)\b", 0.6),
+    ("theory", r"\b(reinforcement learning|multi-agent|mas|transformer|attention|gradient descent|"
+               r"backpropagation|policy gradient|markov)\b", 0.4),
+]
+
+_COMPILED_RULES = [(label, re.compile(p, re.IGNORECASE), w) for label, p, w in _RULES]
+
+
+def rule_scores(query: str) -> Dict[str, float]:
+    """
+    对 query 运行所有规则，按 noisy-OR 合并同一类别的命中权重。
+    返回 label -> score（0~1），未命中的类别不出现在结果中。
+    """
+    misses: Dict[str, float] = {}
+    for label, pattern, weight in _COMPILED_RULES:
+        if pattern.search(query):
+            misses[label] = misses.get(label, 1.0) * (1.0 - weight)
+    return {label: 1.0 - miss for label, miss in misses.items()}
+
+
+class FastRouter:
+    """
+    规则 + 小模型的本地路由器。
+
+    classify() 返回 (label, confidence, source)，source 为 "rule" / "model"；
+    置信度不足时返回 None，由调用方回退到 LLM。
+    """
+
+    def __init__(self,
+                 threshold: float = 0.85,
+                 min_samples: int = 20,
+                 retrain_every: int = 10):
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.retrain_every = retrain_every
+
+        self._samples: List[Tuple[str, str]] = []
+        self._pending = 0
+        self._vectorizer = None
+        self._model = None
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.total = 0
+        self.hits = 0
+        self.rule_hits = 0
+        self.model_hits = 0
+        self.llm_calls = 0
+        self.llm_latency_total = 0.0
+        self.fast_latency_total = 0.0
+
+    # -------------------------
+    # 训练
+    # -------------------------
+
+    def fit(self, samples: Iterable[Tuple[str, str]]) -> bool:
+        """
+        用 (query, label) 样本训练 TF-IDF + LR。
+        样本不足、类别少于 2 个或 sklearn 不可用时返回 False（仅使用规则）。
+        """
+        with self._lock:
+            self._samples = [(q, l) for q, l in samples if q and l in ROUTE_LABELS]
+            self._pending = 0
+            return self._fit_locked()
+
+    def add_sample(self, query: str, label: str) -> None:
+        """记录一次 LLM 分类结果，积累到 retrain_every 条后重新训练。"""
+        if not query or label not in ROUTE_LABELS:
+            return
+        with self._lock:
+            self._samples.append((query, label))
+            self._pending += 1
+            if self._pending >= self.retrain_every:
+                self._pending = 0
+                self._fit_locked()
+
+    def _fit_locked(self) -> bool:
+        self._vectorizer = None
+        self._model = None
+        if TfidfVectorizer is None or LogisticRegression is None:
+            return False
+        if len(self._samples) < self.min_samples:
+            return False
+        texts = [q for q, _ in self._samples]
+        labels = [l for _, l in self._samples]
+        if len(set(labels)) < 2:
+            return False
+
+        vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, min_df=1)
+        features = vectorizer.fit_transform(texts)
+        model = LogisticRegression(max_iter=200)
+        model.fit(features, labels)
+
+        self._vectorizer = vectorizer
+        self._model = model
+        return True
+
+    # -------------------------
+    # 分类
+    # -------------------------
+
+    def _classify_model(self, query: str) -> Optional[Tuple[str, float]]:
+        vectorizer, model = self._vectorizer, self._model
+        if vectorizer is None or model is None:
+            return None
+        proba = model.predict_proba(vectorizer.transform([query]))[0]
+        best = int(proba.argmax())
+        return str(model.classes_[best]), float(proba[best])
+
+    def classify(self, query: str) -> Optional[Tuple[str, float, str]]:
+        """
+        尝试本地分类。命中时返回 (label, confidence, source)，否则返回 None。
+        """
+        start = time.perf_counter()
+        result: Optional[Tuple[str, float, str]] = None
+
+        scores = rule_scores(query)
+        if scores:
+            ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+            label, top = ranked[0]
+            second = ranked[1][1] if len(ranked) > 1 else 0.0
+            # 存在竞争类别时按其强度打折
+            confidence = top * (1.0 - second)
+            if confidence >= self.threshold:
+                result = (label, confidence, "rule")
+
+        if result is None:
+            predicted = self._classify_model(query)
+            if predicted is not None and predicted[1] >= self.threshold:
+                result = (predicted[0], predicted[1], "model")
+
+        # 分类本身不持锁；统计计数在锁内更新，避免并发请求丢失计数
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.total += 1
+            if result is not None:
+                self.hits += 1
+                self.fast_latency_total += elapsed
+                if result[2] == "rule":
+                    self.rule_hits += 1
+                else:
+                    self.model_hits += 1
+        return result
+
+    def guess(self, query: str) -> Optional[Tuple[str, float]]:
+        """
+        不设阈值的最佳猜测 (label, confidence)，不计入命中统计。
+        用于投机执行（见 src/speculation.py）：在 LLM Router 返回之前先启动最可能的 specialist。
+        """
+        best: Optional[Tuple[str, float]] = None
+        scores = rule_scores(query)
+        if scores:
+            ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+            second = ranked[1][1] if len(ranked) > 1 else 0.0
+            best = (ranked[0][0], ranked[0][1] * (1.0 - second))
+        predicted = self._classify_model(query)
+        if predicted is not None and (best is None or predicted[1] > best[1]):
+            best = predicted
+        return best
+
+    def record_llm_call(self, latency: float) -> None:
+        """记录一次回退到 LLM 的耗时，用于估算 fast path 节省的延迟。"""
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_latency_total += latency
+
+    # -------------------------
+    # 统计
+    # -------------------------
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.total if self.total else 0.0
+
+    @property
+    def latency_saved(self) -> float:
+        """估算节省的秒数：命中次数 × LLM 平均耗时 − 本地分类耗时。"""
+        if not self.llm_calls:
+            return 0.0
+        avg_llm = self.llm_latency_total / self.llm_calls
+        return max(0.0, self.hits * avg_llm - self.fast_latency_total)
+
+    def stats_text(self) -> str:
+        return (f"hit_rate={self.hits}/{self.total} ({self.hit_rate:.0%}), "
+                f"saved≈{self.latency_saved:.2f}s")
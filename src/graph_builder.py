@@ -1,14 +1,55 @@
 # src/graph_builder.py
 from typing import Callable
 
-from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import StateGraph, START, END
+from src.config import SPECULATIVE_ROUTING_ENABLED
 from src.state import AgentState
-from src.agents.memory_agent import memory_load_node, memory_update_node
-from src.agents.router_agent import router_node
-from src.agents.theory_agent import theory_node
-from src.agents.coding_agent import coding_node
-from src.agents.planner_agent import planner_node
-from src.agents.general_agent import general_node
+from src.agents.memory_agent import (
+    memory_load_node,
+    memory_update_node,
+    amemory_load_node,
+    amemory_update_node,
+)
+from src.agents.router_agent import router_node, arouter_node
+from src.agents.theory_agent import theory_node, atheory_node
+from src.agents.coding_agent import coding_node, acoding_node
+from src.agents.planner_agent import planner_node, aplanner_node
+from src.agents.general_agent import general_node, ageneral_node
+from src.speculation import speculative_router_node, aspeculative_router_node
+
+
+def _dual(func: Callable, afunc: Callable) -> RunnableLambda:
+    """
+    将同步 / 异步两个版本的节点函数包装成一个 Runnable：
+    app.invoke 走同步版本，app.ainvoke / app.astream 走异步版本。
+    """
+    return RunnableLambda(func, afunc=afunc, name=func.__name__)
+
+
+def _branch_input(state: AgentState) -> AgentState:
+    """并行分支的输入副本：列表 / 字典字段也复制一份，两个分支原地修改时互不影响。"""
+    return {k: (v.copy() if isinstance(v, (list, dict)) else v)  # type: ignore[return-value]
+            for k, v in state.items()}
+
+
+def _branch_updates(state: AgentState, result: AgentState) -> dict:
+    """只返回节点新增或修改过的字段，避免两个并行分支在同一步写同一个字段（如 query）。"""
+    return {k: v for k, v in result.items() if k not in state or state[k] != v}
+
+
+def _parallel(func: Callable, afunc: Callable) -> RunnableLambda:
+    """
+    与 _dual 相同，但用于并行执行的节点：节点在状态副本上运行，只把改动写回图。
+    activated_agents / tool_calls 的追加由 AgentState 中的 merge_trace 合并。
+    """
+    def run(state: AgentState) -> dict:
+        return _branch_updates(state, func(_branch_input(state)))
+
+    async def arun(state: AgentState) -> dict:
+        return _branch_updates(state, await afunc(_branch_input(state)))
+
+    return RunnableLambda(run, afunc=arun, name=func.__name__)
 
 
 def route_selector(state: AgentState) -> str:
@@ -36,39 +77,46 @@ def output_node(state: AgentState) -> AgentState:
 
 def build_graph():
     """
-    新的工作流结构（符合最新设计）：
-
-        router
-            → memory_load
-                → theory/coding/planning/general
-                    → memory_update
-                        → output
-                            → END
+    工作流结构：router 与 memory_load 并行执行（fan-out），
+    两者都完成后（同一个 superstep 结束，fan-in）按 route 进入专家节点：
+
+        START ─┬→ router ──────┬→ theory/coding/planning/general
+               └→ memory_load ─┘      → memory_update
+                                          → output
+                                              → END
+
+    memory_load 不依赖路由结果，因此记忆读取与 Router 的 LLM 调用重叠；
+    Router 仍然只看当前 query，不受记忆影响。
+
+    SPECULATIVE_ROUTING_ENABLED 时 router 节点换成 speculative_router_node：
+    在 LLM Router 分类期间提前启动最可能的专家，路由不一致时取消（见 src/speculation.py）。
     """
 
     graph = StateGraph(AgentState)
 
-    # 注册节点
-    graph.add_node("router", router_node)
-    graph.add_node("memory_load", memory_load_node)
+    # 注册节点（同时提供同步与异步实现）；router / memory_load 并行执行，只写回各自的改动
+    if SPECULATIVE_ROUTING_ENABLED:
+        graph.add_node("router", _parallel(speculative_router_node, aspeculative_router_node))
+    else:
+        graph.add_node("router", _parallel(router_node, arouter_node))
+    graph.add_node("memory_load", _parallel(memory_load_node, amemory_load_node))
 
-    graph.add_node("theory", theory_node)
-    graph.add_node("coding", coding_node)
-    graph.add_node("planning", planner_node)
-    graph.add_node("general", general_node)
+    graph.add_node("theory", _dual(theory_node, atheory_node))
+    graph.add_node("coding", _dual(coding_node, acoding_node))
+    graph.add_node("planning", _dual(planner_node, aplanner_node))
+    graph.add_node("general", _dual(general_node, ageneral_node))
 
-    graph.add_node("memory_update", memory_update_node)
+    graph.add_node("memory_update", _dual(memory_update_node, amemory_update_node))
     graph.add_node("output", output_node)
 
-    # 入口节点 → router（防止 memory 污染 Router 的判断）
-    graph.set_entry_point("router")
-
-    # router → memory_load
-    graph.add_edge("router", "memory_load")
+    # 入口 → router 与 memory_load 同时开始
+    graph.add_edge(START, "router")
+    graph.add_edge(START, "memory_load")
 
-    # memory_load → 条件路由（根据分类跳转正确专家）
+    # router → 条件路由（根据分类跳转正确专家）。
+    # 专家节点在下一个 superstep 执行，此时 memory_load 已经完成并写入记忆字段
     graph.add_conditional_edges(
-        "memory_load",
+        "router",
         route_selector,
         {
             "theory": "theory",
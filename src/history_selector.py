@@ -0,0 +1,145 @@
+# src/history_selector.py
+"""
+按相关性选择历史，而不是固定截取最近 N 条。
+
+- 把历史按“用户提问 + 助手回答”分组成一个个 exchange；
+- 用 BM25 对当前 query 给所有 exchange 打分，并叠加一个随时间衰减的近因分，
+  保证“继续刚才的话题”这类追问仍能拿到上一轮；
+- 按得分从高到低装入 token 预算（用 prompt_budget.count_tokens 计数），最后按时间顺序返回；
+- 每个 exchange 的分词结果按内容哈希缓存在一个常驻的 BM25 索引里，
+  历史只追加时每轮只需为新 exchange 分词，打分开销只与查询词的 posting list 有关。
+"""
+
+import hashlib
+import math
+import threading
+from typing import Dict, List, Tuple
+
+from src.prompt_budget import HISTORY_TURN_MAX_TOKENS, count_tokens, truncate_to_tokens
+from src.retrieval import BM25Index, tokenize
+
+
+def turn_tokens(turn: Dict[str, str], per_turn_max: int = HISTORY_TURN_MAX_TOKENS) -> int:
+    """单条 turn 在 prompt 中的 token 数（与 prompt_budget.format_history 的截断一致）。"""
+    content = truncate_to_tokens(turn.get("content", ""), per_turn_max)
+    return count_tokens(f"{turn.get('role', 'user')}: {content}")
+
+
+def group_exchanges(history: List[Dict[str, str]]) -> List[List[Dict[str, str]]]:
+    """把扁平的 turn 列表分组：每个 user turn 与其后的非 user turn 组成一个 exchange。"""
+    exchanges: List[List[Dict[str, str]]] = []
+    for turn in history:
+        if turn.get("role") == "user" or not exchanges:
+            exchanges.append([turn])
+        else:
+            exchanges[-1].append(turn)
+    return exchanges
+
+
+def _exchange_key(exchange: List[Dict[str, str]]) -> str:
+    h = hashlib.sha1()
+    for turn in exchange:
+        h.update(turn.get("role", "").encode("utf-8"))
+        h.update(b"\x00")
+        h.update(turn.get("content", "").encode("utf-8"))
+        h.update(b"\x01")
+    return h.hexdigest()
+
+
+class HistorySelector:
+    """维护 exchange 的分词缓存与 BM25 索引，并在 token 预算内挑选相关历史。"""
+
+    def __init__(self, recency_weight: float = 0.3, recency_decay: float = 2.0):
+        self.recency_weight = recency_weight
+        self.recency_decay = recency_decay
+        self._index = BM25Index()
+        self._token_counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _sync(self, keyed: List[Tuple[str, List[Dict[str, str]]]]) -> None:
+        """增量同步索引：加入新的 exchange，移除已不在历史中的 exchange。"""
+        live = {key for key, _ in keyed}
+        for key in [k for k in self._token_counts if k not in live]:
+            self._index.remove(key)
+            del self._token_counts[key]
+        for key, exchange in keyed:
+            if key in self._token_counts:
+                continue
+            text = "\n".join(turn.get("content", "") for turn in exchange)
+            self._index.add(key, tokenize(text))
+            self._token_counts[key] = sum(turn_tokens(turn) for turn in exchange)
+
+    def select(self,
+               query: str,
+               history: List[Dict[str, str]],
+               token_budget: int = 1024) -> List[Dict[str, str]]:
+        """
+        返回在 token_budget 以内、与 query 最相关的历史 turn（按时间顺序）。
+        与 query 无关且不是最近几轮的 exchange 不会被选入。
+        """
+        return self.select_budgets(query, history, {"": token_budget})[""]
+
+    def select_budgets(self,
+                       query: str,
+                       history: List[Dict[str, str]],
+                       budgets: Dict[str, int]) -> Dict[str, List[Dict[str, str]]]:
+        """
+        与 select 相同，但对多个 token 预算只打一次分：返回 name -> 该预算下选中的 turn。
+        相同的预算只装箱一次，结果共享同一个列表。
+        """
+        exchanges = group_exchanges(history)
+        if not exchanges:
+            return {name: [] for name in budgets}
+        keyed = [(_exchange_key(ex), ex) for ex in exchanges]
+
+        with self._lock:
+            self._sync(keyed)
+            relevance = dict(self._index.search(tokenize(query), k=len(keyed)))
+            token_counts = dict(self._token_counts)
+
+        top = max(relevance.values(), default=0.0)
+        n = len(keyed)
+        scored: List[Tuple[float, int]] = []
+        for pos, (key, _) in enumerate(keyed):
+            rel = relevance.get(key, 0.0) / top if top > 0 else 0.0
+            age = n - 1 - pos
+            recency = self.recency_weight * math.exp(-age / self.recency_decay)
+            score = rel + recency
+            # 过滤掉既不相关、也不够新的 exchange
+            if rel > 0 or recency >= self.recency_weight * 0.5:
+                scored.append((score, pos))
+
+        scored.sort(key=lambda x: (-x[0], -x[1]))
+        packed: Dict[int, List[Dict[str, str]]] = {}
+        for token_budget in set(budgets.values()):
+            chosen: List[int] = []
+            used = 0
+            for _, pos in (scored if token_budget > 0 else []):
+                cost = token_counts[keyed[pos][0]]
+                if used + cost > token_budget:
+                    continue
+                chosen.append(pos)
+                used += cost
+
+            selected: List[Dict[str, str]] = []
+            for pos in sorted(chosen):
+                selected.extend(keyed[pos][1])
+            packed[token_budget] = selected
+        return {name: packed[token_budget] for name, token_budget in budgets.items()}
+
+
+_selector = HistorySelector()
+
+
+def select_history(query: str,
+                   history: List[Dict[str, str]],
+                   token_budget: int = 1024) -> List[Dict[str, str]]:
+    """使用进程级的 HistorySelector（共享分词缓存）挑选历史。"""
+    return _selector.select(query, history, token_budget=token_budget)
+
+
+def select_history_budgets(query: str,
+                           history: List[Dict[str, str]],
+                           budgets: Dict[str, int]) -> Dict[str, List[Dict[str, str]]]:
+    """使用进程级的 HistorySelector，按多个预算各挑一份历史（只打一次分）。"""
+    return _selector.select_budgets(query, history, budgets)
@@ -0,0 +1,231 @@
+# src/llm_cache.py
+"""
+LLM 响应的持久化缓存（SQLite）。
+
+通过 LangChain 的 BaseCache 接口挂在 ChatOpenAI 上：
+- key = sha256(渲染后的 messages + llm_string)，
+  其中 llm_string 已包含 MODEL_NAME、temperature 等调用参数；
+- LRU：命中时刷新 last_access，超过条目数 / 字节数上限时淘汰最久未访问的条目；
+- TTL：超过 ttl 秒的条目视为未命中并删除；过期条目的批量清理按 sweep_interval 周期进行；
+- 条目数 / 字节数在内存中维护（启动时扫描一次），put 时不再全表统计；
+- 每个节点（router / theory / ...）各有一个 NodeLLMCache 视图，
+  共享同一个数据库，但分别统计 hit / miss。
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+
+def _dump_generations(return_val: RETURN_VAL_TYPE) -> str:
+    items = []
+    for gen in return_val:
+        if isinstance(gen, ChatGeneration):
+            items.append({"message": message_to_dict(gen.message)})
+        else:
+            items.append({"text": gen.text})
+    return json.dumps(items, ensure_ascii=False)
+
+
+def _load_generations(value: str) -> RETURN_VAL_TYPE:
+    generations = []
+    for item in json.loads(value):
+        if "message" in item:
+            message = messages_from_dict([item["message"]])[0]
+            generations.append(ChatGeneration(message=message))
+        else:
+            generations.append(Generation(text=item["text"]))
+    return generations
+
+
+class SQLiteLLMCache:
+    """
+    所有节点共享的 SQLite 存储。
+    一个进程内只需要一个实例（见 src.config.get_llm）。
+    """
+
+    def __init__(self,
+                 path: Path,
+                 max_entries: int = 5000,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 ttl: Optional[float] = 7 * 24 * 3600,
+                 sweep_interval: float = 600.0):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created_at)"
+        )
+        self._conn.commit()
+
+        # 运行中的条目数 / 字节数：只在启动时全表统计一次，之后随 put / delete 增量更新。
+        # 假设同一数据库只被一个进程写入（与 get_llm 的单例约定一致）。
+        self._entries, self._bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()
+        self._last_sweep = 0.0
+        with self._lock:
+            self._sweep_expired_locked(time.time())
+            self._conn.commit()
+
+        # node -> {"hits": int, "misses": int}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def _count(self, node: str, field: str) -> None:
+        node_stats = self.stats.setdefault(node, {"hits": 0, "misses": 0})
+        node_stats[field] += 1
+
+    def get(self, node: str, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self.make_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._delete_key_locked(key)
+                self._conn.commit()
+                row = None
+            generations = None
+            if row is not None:
+                try:
+                    generations = _load_generations(row[0])
+                except Exception:
+                    # 反序列化失败（例如消息格式变化）按未命中处理
+                    generations = None
+            if generations is None:
+                self._count(node, "misses")
+                return None
+
+            self._conn.execute(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self._count(node, "hits")
+            return generations
+
+    def put(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self.make_key(prompt, llm_string)
+        value = _dump_generations(return_val)
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            if old is None:
+                self._entries += 1
+            else:
+                self._bytes -= old[0]
+            self._bytes += size
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep_expired_locked(now)
+            self._evict_locked()
+            self._conn.commit()
+
+    def _delete_key_locked(self, key: str) -> None:
+        row = self._conn.execute(
+            "SELECT size FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return
+        self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+        self._entries -= 1
+        self._bytes -= row[0]
+
+    def _sweep_expired_locked(self, now: float) -> None:
+        """周期性清理过期条目（走 created_at 索引，只触及过期行）。"""
+        self._last_sweep = now
+        if self.ttl is None:
+            return
+        cutoff = now - self.ttl
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache WHERE created_at < ?",
+            (cutoff,),
+        ).fetchone()
+        if count:
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (cutoff,))
+            self._entries -= count
+            self._bytes -= total
+
+    def _evict_locked(self) -> None:
+        """按 LRU 淘汰到条目数 / 字节数上限以内；未超限时不访问数据库。"""
+        if self._entries <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+
+        to_delete = []
+        cursor = self._conn.execute(
+            "SELECT key, size FROM llm_cache ORDER BY last_access ASC"
+        )
+        for key, size in cursor:
+            if self._entries <= self.max_entries and self._bytes <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            self._entries -= 1
+            self._bytes -= size
+        cursor.close()
+        self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", to_delete)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._entries = 0
+            self._bytes = 0
+
+
+class NodeLLMCache(BaseCache):
+    """
+    某个节点使用的缓存视图：读写共享的 SQLiteLLMCache，
+    命中统计记在 node 名下。
+    """
+
+    def __init__(self, backend: SQLiteLLMCache, node: str):
+        self.backend = backend
+        self.node = node
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        return self.backend.get(self.node, prompt, llm_string)
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self.backend.put(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs) -> None:
+        self.backend.clear()
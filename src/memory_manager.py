@@ -0,0 +1,172 @@
+# src/memory_manager.py
+"""
+进程级的长期记忆缓存。
+
+memory_load / memory_update 共享同一个 MemoryManager：
+- profile / history / notes 常驻内存，读取时只做一次 os.stat，
+  发现文件的 inode / mtime / size 变化（被其他进程改写）时才重新加载；
+- 新的对话记录先进入内存和待写队列，由后台线程批量追加到 MemoryStore（write-behind）；
+- 进程退出时（atexit）保证把待写队列刷到磁盘；
+- 刷盘在 MemoryStore 的进程间排他锁内进行，多进程同时运行时记录会合并而不是互相覆盖。
+"""
+
+import atexit
+import copy
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.memory_store import MemoryStore
+
+_Signature = Tuple[Optional[Tuple[int, int, int]], Optional[Tuple[int, int, int]]]
+
+
+class MemoryManager:
+    """MemoryStore 之上的内存缓存 + 后台写线程。"""
+
+    def __init__(self,
+                 store: MemoryStore,
+                 max_history: int = 50,
+                 flush_interval: float = 0.2):
+        self.store = store
+        self.max_history = max_history
+        self.flush_interval = flush_interval
+
+        self._lock = threading.RLock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pending: List[Dict[str, Any]] = []
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+
+        if not self.store.meta_path.exists():
+            # 空合并即可在锁内创建元数据文件，不会覆盖其他进程刚写入的内容
+            self.store.update_meta()
+
+        self._profile: Dict[str, Any] = {}
+        self._notes: List[str] = []
+        self._history: List[Dict[str, Any]] = []
+        self._signature: _Signature = (None, None)
+        self._reload()
+
+        atexit.register(self.close)
+
+    # =========================
+    # 缓存失效
+    # =========================
+
+    @staticmethod
+    def _stat(path) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _current_signature(self) -> _Signature:
+        return self._stat(self.store.log_path), self._stat(self.store.meta_path)
+
+    def _reload(self) -> None:
+        """从磁盘重新加载，并把尚未落盘的记录重新接到 history 末尾。"""
+        meta = self.store.load_meta()
+        self._profile = meta["user_profile"]
+        self._notes = meta["notes"]
+        self._history = self.store.load_recent(self.max_history) + list(self._pending)
+        self._history = self._history[-self.max_history:]
+        self._signature = self._current_signature()
+
+    def _refresh_if_changed(self) -> None:
+        if self._current_signature() != self._signature:
+            self._reload()
+
+    # =========================
+    # 读写接口
+    # =========================
+
+    def snapshot(self, max_history: Optional[int] = None) -> Dict[str, Any]:
+        """
+        返回与旧版 memory.json 相同结构的副本：
+        {"user_profile": ..., "history": [...], "notes": [...]}。
+        """
+        n = self.max_history if max_history is None else max_history
+        with self._lock:
+            self._refresh_if_changed()
+            history = self._history[-n:] if n > 0 else []
+            return {
+                "user_profile": copy.deepcopy(self._profile),
+                "history": [dict(turn) for turn in history],
+                "notes": list(self._notes),
+            }
+
+    def append_turns(self, records: List[Dict[str, Any]]) -> None:
+        """记录立即对后续 snapshot 可见，磁盘写入交给后台线程。"""
+        if not records:
+            return
+        with self._lock:
+            self._refresh_if_changed()
+            self._history.extend(dict(r) for r in records)
+            self._history = self._history[-self.max_history:]
+            self._pending.extend(dict(r) for r in records)
+            self._ensure_writer()
+            self._wakeup.notify()
+
+    def update_meta(self,
+                    profile_updates: Dict[str, Any] | None = None,
+                    new_notes: List[str] | None = None) -> None:
+        """同步写穿元数据（读-合并-写，见 MemoryStore.update_meta），并刷新内存。"""
+        with self._lock:
+            meta = self.store.update_meta(profile_updates, new_notes)
+            self._profile = meta["user_profile"]
+            self._notes = meta["notes"]
+            self._signature = self._current_signature()
+
+    def flush(self) -> None:
+        """把待写记录追加到 log（必要时压缩），并记录新的文件签名。"""
+        with self._lock, self.store.lock.hold():
+            if not self._pending:
+                return
+            # 在进程间排他锁内比较签名：写入前文件已被其他进程改动时，
+            # 写完后重新加载，把对方的记录合并进内存视图
+            external_change = self._current_signature() != self._signature
+            self.store.append_turns(self._pending)
+            self._pending = []
+            if self.store.count() > 2 * self.max_history:
+                self.store.compact(self.max_history)
+            if external_change:
+                self._reload()
+            else:
+                self._signature = self._current_signature()
+
+    def close(self) -> None:
+        """停止后台线程并刷盘；进程退出时由 atexit 调用。"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        if self._writer is not None and self._writer is not threading.current_thread():
+            self._writer.join(timeout=5)
+        self.flush()
+
+    # =========================
+    # 后台写线程
+    # =========================
+
+    def _ensure_writer(self) -> None:
+        if self._writer is None or not self._writer.is_alive():
+            self._closed = False
+            self._writer = threading.Thread(
+                target=self._writer_loop, name="memory-writer", daemon=True
+            )
+            self._writer.start()
+
+    def _writer_loop(self) -> None:
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                # 稍等片刻，把同一时间段内的多次追加合并成一次写入
+                self._wakeup.wait(timeout=self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[memory] Warning: failed to flush memory log: {e}")
@@ -0,0 +1,305 @@
+# src/memory_store.py
+"""
+追加写（append-only）的长期记忆存储。
+
+替代原先每轮整体重写 data/memory.json 的做法：
+- data/memory_log.jsonl : 每轮对话追加一行 JSON（一条 turn 记录）
+- data/memory_log.idx   : 每条记录在 log 中的起始字节偏移（uint64 小端），
+                          读取最近 N 条时只需 seek 到对应偏移，不必解析整个文件
+- data/memory_meta.json : user_profile 与 notes（体积小、很少变化，变化时才写）
+
+compact() 只保留最近若干条记录并重建索引；
+首次打开时如果只有旧版 memory.json，会自动迁移（旧文件保留作为备份）。
+
+多进程安全：
+- 所有写操作都持有 data/memory.lock 上的排他 flock，读操作持有共享锁；
+- 追加在锁内进行，log 与索引的顺序始终一致，并发进程的记录按到达顺序交错合并，
+  不会互相覆盖；
+- 压缩 / 迁移 / 元数据写入都先写临时文件、fsync，再 os.replace 原子替换；
+- 元数据写入是读-合并-写：profile 按键合并，notes 取并集。
+"""
+
+import json
+import os
+import struct
+import sys
+import threading
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# fcntl 仅在 POSIX 系统可用；缺失时退化为进程内锁
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_OFFSET = struct.Struct("<Q")
+
+
+class FileLock:
+    """
+    基于 flock 的进程间咨询锁，在同一进程内可重入。
+
+    flock 作用于打开的文件描述，同一进程对同一文件 open 两次也会互相阻塞，
+    所以这里用计数保证每个进程只持有一个描述符。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    @contextmanager
+    def hold(self, exclusive: bool = True) -> Iterator[None]:
+        with self._local:
+            if self._depth == 0:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    if fcntl is not None:
+                        fcntl.flock(self._fd, fcntl.LOCK_UN)
+                    os.close(self._fd)
+                    self._fd = None
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """写临时文件并 fsync，然后用 os.replace 原子替换目标文件。"""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class MemoryStore:
+    """JSONL 追加日志 + 偏移索引 + 元数据文件。"""
+
+    def __init__(self, data_dir: Path, legacy_path: Path | None = None):
+        self.data_dir = Path(data_dir)
+        self.log_path = self.data_dir / "memory_log.jsonl"
+        self.idx_path = self.data_dir / "memory_log.idx"
+        self.meta_path = self.data_dir / "memory_meta.json"
+        self.legacy_path = Path(legacy_path) if legacy_path is not None else None
+
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.lock = FileLock(self.data_dir / "memory.lock")
+        with self.lock.hold():
+            self.migrate_legacy()
+            if not self._index_is_valid():
+                self.rebuild_index()
+
+    # =========================
+    # 迁移 / 索引维护
+    # =========================
+
+    def migrate_legacy(self) -> bool:
+        """
+        如果 log 不存在而旧版 memory.json 存在，则把旧格式导入新存储。
+        返回是否发生了迁移。
+        """
+        with self.lock.hold():
+            if (self.log_path.exists() or self.legacy_path is None
+                    or not self.legacy_path.exists()):
+                return False
+            try:
+                with open(self.legacy_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception:
+                # 旧文件损坏时不迁移，从空存储开始
+                data = {}
+
+            self.save_meta(data.get("user_profile", {}), data.get("notes", []))
+            self._write_log(data.get("history", []))
+            return True
+
+    def _write_log(self, records: List[Dict[str, Any]]) -> None:
+        """
+        用 records 整体替换 log 与索引（迁移和压缩时使用）。
+        调用方需持有排他锁；两个文件分别原子替换，读者持有共享锁，不会看到中间状态。
+        """
+        offsets = array("Q")
+        chunks: List[bytes] = []
+        pos = 0
+        for record in records:
+            data = self._encode(record)
+            offsets.append(pos)
+            chunks.append(data)
+            pos += len(data)
+
+        atomic_write_bytes(self.log_path, b"".join(chunks))
+        atomic_write_bytes(self.idx_path, self._pack(offsets))
+
+    def _index_is_valid(self) -> bool:
+        """
+        快速校验索引：文件长度是 8 的整数倍，
+        且最后一个偏移恰好落在 log 中某一行的开头。
+        """
+        if not self.log_path.exists():
+            return not self.idx_path.exists() or self.idx_path.stat().st_size == 0
+        if not self.idx_path.exists():
+            return False
+        idx_size = self.idx_path.stat().st_size
+        if idx_size % _OFFSET.size:
+            return False
+        log_size = self.log_path.stat().st_size
+        if idx_size == 0:
+            return log_size == 0
+
+        with open(self.idx_path, "rb") as f:
+            f.seek(idx_size - _OFFSET.size)
+            (last,) = _OFFSET.unpack(f.read(_OFFSET.size))
+        if last >= log_size:
+            return False
+        if last == 0:
+            return True
+        with open(self.log_path, "rb") as f:
+            f.seek(last - 1)
+            return f.read(1) == b"\n"
+
+    def rebuild_index(self) -> None:
+        """顺序扫描 log，重新生成偏移索引。"""
+        with self.lock.hold():
+            offsets = array("Q")
+            if self.log_path.exists():
+                with open(self.log_path, "rb") as f:
+                    pos = 0
+                    for line in f:
+                        if line.strip():
+                            offsets.append(pos)
+                        pos += len(line)
+            atomic_write_bytes(self.idx_path, self._pack(offsets))
+
+    # =========================
+    # 读写
+    # =========================
+
+    @staticmethod
+    def _encode(record: Dict[str, Any]) -> bytes:
+        return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+    @staticmethod
+    def _pack(offsets: array) -> bytes:
+        if offsets.itemsize != _OFFSET.size:
+            raise RuntimeError("array('Q') must be 8 bytes on this platform")
+        data = array("Q", offsets)
+        if sys.byteorder != "little":
+            data.byteswap()
+        return data.tobytes()
+
+    def count(self) -> int:
+        """log 中的记录条数（来自索引，不读取 log）。"""
+        if not self.idx_path.exists():
+            return 0
+        return self.idx_path.stat().st_size // _OFFSET.size
+
+    def append_turns(self, records: List[Dict[str, Any]]) -> None:
+        """
+        在排他锁内追加若干条记录：log 先写，索引后写。
+        偏移以加锁后的文件末尾为准，因此多个进程的追加会按顺序合并。
+        """
+        if not records:
+            return
+        offsets = array("Q")
+        chunks: List[bytes] = []
+        with self.lock.hold():
+            with open(self.log_path, "a+b") as f:
+                pos = f.seek(0, os.SEEK_END)
+                # 上一次写入如果在中途崩溃，先补上换行，避免和新记录粘在同一行
+                if pos > 0:
+                    f.seek(pos - 1)
+                    if f.read(1) != b"\n":
+                        chunks.append(b"\n")
+                        pos += 1
+                for record in records:
+                    data = self._encode(record)
+                    offsets.append(pos)
+                    chunks.append(data)
+                    pos += len(data)
+                f.write(b"".join(chunks))
+            with open(self.idx_path, "ab") as f:
+                f.write(self._pack(offsets))
+
+    def load_recent(self, n: int) -> List[Dict[str, Any]]:
+        """
+        通过索引定位倒数第 n 条记录的偏移，只读取并解析最后 n 条。
+        损坏的行会被跳过。
+        """
+        with self.lock.hold(exclusive=False):
+            total = self.count()
+            if n <= 0 or total == 0:
+                return []
+            n = min(n, total)
+            with open(self.idx_path, "rb") as f:
+                f.seek((total - n) * _OFFSET.size)
+                (start,) = _OFFSET.unpack(f.read(_OFFSET.size))
+            with open(self.log_path, "rb") as f:
+                f.seek(start)
+                raw = f.read()
+
+        records: List[Dict[str, Any]] = []
+        for line in raw.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        return records[-n:]
+
+    def load_all(self) -> List[Dict[str, Any]]:
+        with self.lock.hold(exclusive=False):
+            return self.load_recent(self.count())
+
+    def load_meta(self) -> Dict[str, Any]:
+        """读取 user_profile / notes；文件缺失或损坏时返回空模板。"""
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except Exception:
+            meta = {}
+        return {
+            "user_profile": meta.get("user_profile", {}),
+            "notes": meta.get("notes", []),
+        }
+
+    def save_meta(self, user_profile: Dict[str, Any], notes: List[str]) -> None:
+        """整体替换元数据（原子写）。"""
+        data = json.dumps({"user_profile": user_profile, "notes": notes},
+                          ensure_ascii=False, indent=2)
+        with self.lock.hold():
+            atomic_write_bytes(self.meta_path, data.encode("utf-8"))
+
+    def update_meta(self,
+                    profile_updates: Dict[str, Any] | None = None,
+                    new_notes: List[str] | None = None) -> Dict[str, Any]:
+        """
+        读-合并-写元数据：profile 按键覆盖，notes 追加尚不存在的条目。
+        在排他锁内完成，不会丢失其他进程同时写入的修改。
+        """
+        with self.lock.hold():
+            meta = self.load_meta()
+            meta["user_profile"].update(profile_updates or {})
+            for note in new_notes or []:
+                if note not in meta["notes"]:
+                    meta["notes"].append(note)
+            self.save_meta(meta["user_profile"], meta["notes"])
+            return meta
+
+    def compact(self, keep_last: int) -> None:
+        """
+        只保留最近 keep_last 条记录，重写 log 并重建索引。
+        在锁内重新读取尾部，因此其他进程在此之前追加的记录都会被保留。
+        """
+        with self.lock.hold():
+            self._write_log(self.load_recent(keep_last))
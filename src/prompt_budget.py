@@ -0,0 +1,202 @@
+# src/prompt_budget.py
+"""
+Prompt 的 token 预算。
+
+- count_tokens：优先使用 Qwen 自己的 tokenizer（tokenizers / transformers 加载 PROMPT_TOKENIZER），
+  不可用时退化为 tiktoken 的 cl100k_base（BPE 与 Qwen 不同，计数只是近似，
+  中文文本通常偏高），再不可用时按字符估算；tokenizer_name() 给出当前使用的是哪一种；
+- 每个 agent 对 history / profile / notes 各有一份预算（AGENT_BUDGETS），
+  超出时截断单条内容、丢弃最旧的历史；
+- record_prompt_tokens：渲染最终 prompt 并记录本次 LLM 调用的 token 数，
+  写入 state['prompt_tokens']，由 run_cli 在每轮结束时打印，方便观察 vLLM 的 prefill 开销。
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# tokenizers / transformers / tiktoken 都是可选依赖
+try:
+    from tokenizers import Tokenizer
+except Exception:
+    Tokenizer = None
+
+try:
+    from transformers import AutoTokenizer
+except Exception:
+    AutoTokenizer = None
+
+try:
+    import tiktoken
+except Exception:
+    tiktoken = None
+
+# Qwen tokenizer：HuggingFace 仓库名，或本地的 tokenizer.json / 模型目录
+TOKENIZER_NAME = os.getenv("PROMPT_TOKENIZER", "Qwen/Qwen3-32B")
+# Qwen tokenizer 加载失败时使用的 tiktoken 编码（近似计数）
+TOKENIZER_FALLBACK_ENCODING = os.getenv("PROMPT_TOKENIZER_FALLBACK", "cl100k_base")
+
+# 单条历史消息（通常是很长的助手回答）的 token 上限
+HISTORY_TURN_MAX_TOKENS = int(os.getenv("HISTORY_TURN_MAX_TOKENS", "300"))
+
+# 每个 agent 各上下文段落的 token 预算
+AGENT_BUDGETS: Dict[str, Dict[str, int]] = {
+    "theory": {"notes": 1500},
+    "coding": {"history": 1200},
+    "planning": {"profile": 300, "history": 1000},
+    "general": {"history": 1000},
+}
+
+TRUNCATION_MARKER = " …[truncated]"
+
+# (name, encode, decode)：encode(text) -> token id 列表，decode(ids) -> text
+_Encoder = Tuple[str, Callable[[str], List[int]], Callable[[List[int]], str]]
+
+_encoder: Optional[_Encoder] = None
+_encoder_loaded = False
+_encoder_lock = threading.Lock()
+
+
+def _load_qwen_tokenizer() -> Optional[_Encoder]:
+    path = Path(TOKENIZER_NAME)
+    if Tokenizer is not None:
+        try:
+            if path.is_dir():
+                path = path / "tokenizer.json"
+            tok = Tokenizer.from_file(str(path)) if path.is_file() else Tokenizer.from_pretrained(TOKENIZER_NAME)
+            return (TOKENIZER_NAME,
+                    lambda text: tok.encode(text, add_special_tokens=False).ids,
+                    tok.decode)
+        except Exception:
+            pass
+    if AutoTokenizer is not None:
+        try:
+            hf_tok = AutoTokenizer.from_pretrained(TOKENIZER_NAME)
+            return (TOKENIZER_NAME,
+                    lambda text: hf_tok.encode(text, add_special_tokens=False),
+                    hf_tok.decode)
+        except Exception:
+            pass
+    return None
+
+
+def _load_tiktoken() -> Optional[_Encoder]:
+    if tiktoken is None:
+        return None
+    try:
+        enc = tiktoken.get_encoding(TOKENIZER_FALLBACK_ENCODING)
+    except Exception:
+        return None
+    return (f"{TOKENIZER_FALLBACK_ENCODING} (approx.)",
+            lambda text: enc.encode(text, disallowed_special=()),
+            enc.decode)
+
+
+def _get_encoder() -> Optional[_Encoder]:
+    """懒加载编码器：Qwen tokenizer → tiktoken 近似 → None（按字符估算）；只尝试一次。"""
+    global _encoder, _encoder_loaded
+    if _encoder_loaded:
+        return _encoder
+    with _encoder_lock:
+        if not _encoder_loaded:
+            _encoder = _load_qwen_tokenizer()
+            if _encoder is None:
+                _encoder = _load_tiktoken()
+                print(f"[prompt_budget] Warning: Qwen tokenizer {TOKENIZER_NAME!r} unavailable, "
+                      f"prompt token counts are approximate "
+                      f"({_encoder[0] if _encoder else 'character estimate'}).")
+            _encoder_loaded = True
+    return _encoder
+
+
+def tokenizer_name() -> str:
+    """当前用于计数的 tokenizer 名称（带 "(approx.)" 的表示只是近似）。"""
+    encoder = _get_encoder()
+    return encoder[0] if encoder is not None else "character estimate (approx.)"
+
+
+def _estimate_tokens(text: str) -> int:
+    """无编码器时的估算：ASCII 约 4 字符一个 token，其余字符（如中文）按 1 个 token 计。"""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return (len(text) - non_ascii + 3) // 4 + non_ascii
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder[1](text))
+    return _estimate_tokens(text)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """保留开头 max_tokens 个 token，超出部分用截断标记代替。"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    encoder = _get_encoder()
+    if encoder is not None:
+        head = encoder[2](encoder[1](text)[:max_tokens])
+        return head.rstrip() + TRUNCATION_MARKER
+
+    # 估算模式：二分查找满足预算的最长前缀
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if _estimate_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo].rstrip() + TRUNCATION_MARKER
+
+
+def format_history(history: List[Dict[str, str]],
+                   budget: int,
+                   per_turn_max: int = HISTORY_TURN_MAX_TOKENS) -> str:
+    """
+    把历史格式化为 "role: content" 文本：
+    每条消息截断到 per_turn_max，总量超过 budget 时优先丢弃最旧的消息。
+    """
+    lines: List[str] = []
+    used = 0
+    for turn in reversed(history):
+        role = turn.get("role", "user")
+        content = truncate_to_tokens(turn.get("content", ""), per_turn_max)
+        line = f"{role}: {content}"
+        cost = count_tokens(line)
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(reversed(lines))
+
+
+def format_profile(user_profile: Dict[str, Any], budget: int) -> str:
+    """把 user_profile 转为 "key: value" 文本，并截断到 budget。"""
+    text = "\n".join(f"{k}: {v}" for k, v in user_profile.items())
+    return truncate_to_tokens(text, budget)
+
+
+def budget_for(agent: str, section: str, default: int = 1000) -> int:
+    return AGENT_BUDGETS.get(agent, {}).get(section, default)
+
+
+def record_prompt_tokens(state: Dict[str, Any],
+                         node: str,
+                         prompt,
+                         inputs: Dict[str, Any]) -> Optional[int]:
+    """
+    渲染 prompt 并统计本次 LLM 调用的输入 token 数，写入 state['prompt_tokens'][node]。
+    计数不含 chat template 加入的特殊 token，与 vLLM 实际 prefill 的长度相差几个 token。
+    """
+    try:
+        messages = prompt.format_messages(**inputs)
+    except Exception:
+        return None
+    total = sum(count_tokens(m.content) for m in messages if isinstance(m.content, str))
+    state.setdefault("prompt_tokens", {})[node] = total
+    return total
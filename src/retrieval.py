@@ -0,0 +1,247 @@
+# src/retrieval.py
+"""
+笔记检索索引。
+
+- BM25Index：增量维护的倒排索引（term -> {doc_id: tf}），
+  查询只遍历查询词的 posting list，几千篇笔记也能在亚毫秒级返回；
+- HashedEmbeddingIndex（可选，需要 NumPy）：本地的特征哈希词袋向量，
+  存在一个按需扩容的 NumPy 矩阵里，用一次矩阵乘法做余弦 top-k；
+- NotesIndex：把 notes/ 目录下的 markdown 文件与 memory 中的 notes 统一建索引，
+  save_markdown_note 每保存一篇就增量加入，而不是重建。
+"""
+
+import hashlib
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# NumPy 是可选依赖：缺失时只使用 BM25
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_][a-z0-9]+)*|[\u4e00-\u9fff]")
+
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "is", "are",
+    "was", "were", "be", "it", "this", "that", "as", "at", "by", "from", "can", "i",
+    "you", "me", "my", "we", "do", "does", "how", "what", "should", "if", "like",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """小写化后切词（英文单词 / 数字 / 单个汉字），去掉常见停用词。"""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """支持增量增删文档的 BM25 倒排索引。"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_len: Dict[str, int] = {}
+        self.doc_terms: Dict[str, List[str]] = {}
+        self._total_len = 0
+        # 每篇文档的长度归一化项 k1 * (1 - b + b * len / avg_len)，文档集变化后懒重算
+        self._norms: Dict[str, float] = {}
+        self._norms_dirty = True
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.doc_len
+
+    def add(self, doc_id: str, tokens: Iterable[str]) -> None:
+        """加入（或替换）一篇文档。"""
+        if doc_id in self.doc_len:
+            self.remove(doc_id)
+        counts = Counter(tokens)
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        length = sum(counts.values())
+        self.doc_len[doc_id] = length
+        self.doc_terms[doc_id] = list(counts)
+        self._total_len += length
+        self._norms_dirty = True
+
+    def remove(self, doc_id: str) -> None:
+        length = self.doc_len.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_len -= length
+        self._norms_dirty = True
+        for term in self.doc_terms.pop(doc_id, []):
+            docs = self.postings.get(term)
+            if docs is not None and docs.pop(doc_id, None) is not None and not docs:
+                del self.postings[term]
+
+    def _refresh_norms(self) -> None:
+        avg_len = (self._total_len / len(self.doc_len)) or 1.0
+        k1, b = self.k1, self.b
+        self._norms = {doc_id: k1 * (1.0 - b + b * length / avg_len)
+                       for doc_id, length in self.doc_len.items()}
+        self._norms_dirty = False
+
+    def search(self, query_tokens: Iterable[str], k: int = 5) -> List[Tuple[str, float]]:
+        """返回得分最高的 k 篇文档 [(doc_id, score)]，只包含得分 > 0 的文档。"""
+        n_docs = len(self.doc_len)
+        if n_docs == 0:
+            return []
+        if self._norms_dirty:
+            self._refresh_norms()
+        norms = self._norms
+        k1_plus_1 = self.k1 + 1.0
+
+        scores: Dict[str, float] = {}
+        for term in set(query_tokens):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1.0 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * k1_plus_1 / (tf + norms[doc_id])
+        return heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+
+
+class HashedEmbeddingIndex:
+    """
+    本地“嵌入”：把词频通过特征哈希映射到固定维度，再做 L2 归一化。
+    向量按行存放在 NumPy 矩阵里，查询时一次矩阵乘法得到全部余弦相似度。
+    """
+
+    def __init__(self, dim: int = 1024):
+        if np is None:
+            raise RuntimeError("HashedEmbeddingIndex requires numpy")
+        self.dim = dim
+        self.matrix = np.zeros((64, dim), dtype=np.float32)
+        self.doc_ids: List[str] = []
+        self.row_of: Dict[str, int] = {}
+
+    def embed(self, tokens: Iterable[str]):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for term, tf in Counter(tokens).items():
+            h = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+            sign = 1.0 if (h >> 63) & 1 else -1.0
+            vec[h % self.dim] += sign * (1.0 + math.log(tf))
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def add(self, doc_id: str, tokens: Iterable[str]) -> None:
+        vec = self.embed(tokens)
+        row = self.row_of.get(doc_id)
+        if row is None:
+            row = len(self.doc_ids)
+            if row >= self.matrix.shape[0]:
+                grown = np.zeros((self.matrix.shape[0] * 2, self.dim), dtype=np.float32)
+                grown[:row] = self.matrix[:row]
+                self.matrix = grown
+            self.doc_ids.append(doc_id)
+            self.row_of[doc_id] = row
+        self.matrix[row] = vec
+
+    def search(self, query_tokens: Iterable[str], k: int = 5) -> List[Tuple[str, float]]:
+        n = len(self.doc_ids)
+        if n == 0:
+            return []
+        sims = self.matrix[:n] @ self.embed(query_tokens)
+        k = min(k, n)
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(self.doc_ids[i], float(sims[i])) for i in top if sims[i] > 0]
+
+
+class NotesIndex:
+    """
+    notes/ 目录下的 markdown 笔记 + memory 中 notes 的统一检索索引。
+    doc_id：文件笔记为绝对路径，memory 笔记为 "memory:<sha1>"。
+    """
+
+    def __init__(self, notes_dir: Path, use_embeddings: bool = True):
+        self.notes_dir = Path(notes_dir)
+        self.bm25 = BM25Index()
+        self.embeddings = HashedEmbeddingIndex() if (use_embeddings and np is not None) else None
+        self.texts: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def build(self) -> "NotesIndex":
+        """首次使用时扫描 notes/ 目录建立索引。"""
+        if self.notes_dir.exists():
+            for path in sorted(self.notes_dir.glob("*.md")):
+                try:
+                    self.add_document(str(path.resolve()), path.read_text(encoding="utf-8"))
+                except OSError:
+                    continue
+        return self
+
+    def covers(self, path: Path) -> bool:
+        """path 是否属于本索引扫描的范围（notes_dir 下的 *.md，不含子目录）。"""
+        path = Path(path).resolve()
+        return path.suffix == ".md" and path.parent == self.notes_dir.resolve()
+
+    def add_document(self, doc_id: str, text: str) -> None:
+        tokens = tokenize(text)
+        with self._lock:
+            self.texts[doc_id] = text
+            self.bm25.add(doc_id, tokens)
+            if self.embeddings is not None:
+                self.embeddings.add(doc_id, tokens)
+
+    def sync_memory_notes(self, notes: Iterable[str]) -> None:
+        """把 memory 中尚未建索引的 notes 增量加入。"""
+        for note in notes:
+            doc_id = "memory:" + hashlib.sha1(note.encode("utf-8")).hexdigest()
+            if doc_id not in self.bm25:
+                self.add_document(doc_id, note)
+
+    def search(self, query: str, k: int = 2, mode: str = "bm25") -> List[Tuple[str, float]]:
+        """
+        mode:
+            "bm25"      只用倒排索引
+            "embedding" 只用哈希向量余弦（需要 NumPy）
+            "hybrid"    两路结果做 reciprocal rank fusion
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            if mode == "bm25" or self.embeddings is None:
+                return self.bm25.search(tokens, k)
+            if mode == "embedding":
+                return self.embeddings.search(tokens, k)
+
+            fused: Dict[str, float] = {}
+            for ranked in (self.bm25.search(tokens, k * 4), self.embeddings.search(tokens, k * 4)):
+                for rank, (doc_id, _) in enumerate(ranked):
+                    fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (60 + rank)
+            return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+    def text(self, doc_id: str) -> str:
+        return self.texts.get(doc_id, "")
+
+
+_notes_index: Optional[NotesIndex] = None
+_notes_index_lock = threading.Lock()
+
+
+def get_notes_index(notes_dir: Optional[Path] = None) -> NotesIndex:
+    """懒加载进程级的笔记索引（默认目录为项目根目录下的 notes/）。"""
+    global _notes_index
+    with _notes_index_lock:
+        if _notes_index is None:
+            if notes_dir is None:
+                notes_dir = Path(__file__).resolve().parents[1] / "notes"
+            _notes_index = NotesIndex(notes_dir).build()
+        return _notes_index
+
+
+def notes_index_if_loaded() -> Optional[NotesIndex]:
+    """返回已建立的索引；尚未建立时返回 None（下次建立时会扫描到新文件）。"""
+    return _notes_index
@@ -1,18 +1,26 @@
 # src/run_cli.py
-from typing import cast
+import uuid
+from typing import Optional, cast
 
 from src.state import AgentState
 from src.graph_builder import build_graph
+from src.config import get_cache_stats
+from src.prompt_budget import tokenizer_name
+from src.speculation import speculation_stats
+from src.tools import collect_beacon_followup, get_beacon_cache, get_beacon_incremental
+from src.streaming import stream_graph
 
 
-def build_initial_state(query: str) -> AgentState:
+def build_initial_state(query: str, session_id: Optional[str] = None) -> AgentState:
     """
     构造初始的 AgentState。
     对于第一次运行，没有历史记录和用户档案；
     这些会在 memory_load_node 中从 memory.json 填充。
+    session_id 标识同一会话中的多轮 query（Beacon 增量分析用），None 表示各 query 相互独立。
     """
     return {
         "query": query,
+        "session_id": session_id,
         "activated_agents": [],
         "tool_calls": [],
         # 下面三个字段会在 memory_load_node 中覆盖/填充
@@ -22,24 +30,67 @@ def build_initial_state(query: str) -> AgentState:
     }
 
 
-def run_single_query(app, query: str) -> AgentState:
+def run_single_query(app, query: str, session_id: Optional[str] = None) -> AgentState:
     """
     对单个 query 调用 graph，并返回新的 state。
     """
-    init_state = build_initial_state(query)
+    init_state = build_initial_state(query, session_id)
     result = cast(AgentState, app.invoke(init_state))
     return result
 
 
+def run_single_query_streaming(app, query: str, session_id: Optional[str] = None) -> AgentState:
+    """
+    流式运行单个 query：专家节点生成的 token 实时打印，
+    流结束后再补打印后处理追加的内容（Beacon summary / 笔记路径等），
+    最后报告首 token 延迟（TTFT）与总耗时；启用过投机执行时一并报告（本会话累计的）
+    命中 / 未命中次数与命中省下的时间。
+    """
+    init_state = build_initial_state(query, session_id)
+    streamed: list[str] = []
+
+    def on_token(text: str) -> None:
+        if not streamed:
+            print("\nAssistant>")
+        streamed.append(text)
+        print(text, end="", flush=True)
+
+    state, ttft, total = stream_graph(app, init_state, on_token)
+    state = cast(AgentState, state)
+
+    final_answer = state.get("final_answer", "") or ""
+    streamed_text = "".join(streamed)
+    if not streamed:
+        # 没有收到 token（例如命中了响应缓存），直接打印完整答案
+        print("\nAssistant>")
+        print(final_answer.strip())
+    elif final_answer.startswith(streamed_text):
+        print(final_answer[len(streamed_text):].rstrip())
+    else:
+        print()
+
+    ttft_text = f"{ttft:.2f}s" if ttft is not None else "n/a"
+    latency_text = f"first token {ttft_text}, total {total:.2f}s"
+    spec = speculation_stats()
+    if spec["started"]:
+        # 未命中：路由不一致被取消，或输入已过期 / 调用失败而放弃
+        misses = spec["cancelled"] + spec["discarded"]
+        latency_text += (f" | speculation {spec['used']} hits / {misses} misses, "
+                         f"{spec['saved_sec']:.2f}s saved")
+    print(f"\n[Latency]: {latency_text}")
+    return state
+
+
 def interactive_loop():
     """
     简单的命令行交互循环：
     - 输入一条 query
-    - 运行图
-    - 打印最终答案 / 激活的 agents / 使用的工具
+    - 运行图，专家回答以 token 流的形式实时打印
+    - 打印激活的 agents / 使用的工具 / prompt token 数 / 延迟
     - 输入 'exit' 或 Ctrl+C 退出
     """
     app = build_graph()
+    session_id = uuid.uuid4().hex
     print("Multi-Agent Study & Productivity Assistant")
     print("Type 'exit' to quit.\n")
 
@@ -56,10 +107,15 @@ def interactive_loop():
             print("[Exiting]")
             break
 
-        state = run_single_query(app, query)
+        state = run_single_query_streaming(app, query, session_id)
 
-        print("\nAssistant>")
-        print(state.get("final_answer", "").strip())
+        # 后台 Beacon 分析：回答已经显示，再补充显示 summary
+        beacon_job = state.get("beacon_job")
+        if beacon_job:
+            followup = collect_beacon_followup(beacon_job)
+            if followup:
+                print("\n[Beacon follow-up]")
+                print(followup)
 
         activated = state.get("activated_agents", [])
         tools = state.get("tool_calls", [])
@@ -69,6 +125,31 @@ def interactive_loop():
         if tools:
             print("[Tools called]:", ", ".join(tools))
 
+        prompt_tokens = state.get("prompt_tokens", {})
+        if prompt_tokens:
+            print(f"[Prompt tokens] ({tokenizer_name()}):",
+                  ", ".join(f"{node} {n}" for node, n in prompt_tokens.items()),
+                  f"| total {sum(prompt_tokens.values())}")
+
+        cache_stats = get_cache_stats()
+        if cache_stats:
+            cache_text = ", ".join(
+                f"{node} {s['hits']}/{s['hits'] + s['misses']} hits"
+                for node, s in sorted(cache_stats.items())
+            )
+            print("[LLM cache]:", cache_text)
+
+        beacon_cache = get_beacon_cache()
+        if beacon_cache is not None:
+            s = beacon_cache.stats()
+            if s["hits"] + s["misses"]:
+                print(f"[Beacon cache]: {s['hits']}/{s['hits'] + s['misses']} hits")
+
+        beacon_incremental = get_beacon_incremental()
+        if beacon_incremental is not None and beacon_incremental.revisions:
+            print(f"[Beacon incremental]: {beacon_incremental.revisions} revisions, "
+                  f"{beacon_incremental.reused_functions} functions reused")
+
         print("-" * 60)
 
 
@@ -0,0 +1,134 @@
+# src/run_concurrent.py
+"""
+并发批量执行入口：
+
+通过 build_graph() 编译出的图，用 app.ainvoke 同时处理多条 query，
+发往 vLLM 的请求数由 src.config.llm_semaphore() 限制在 --concurrency 以内。
+结束后打印吞吐量（queries/sec）。
+
+用法:
+    python -m src.run_concurrent queries.txt --concurrency 8 --output results.json
+    cat queries.txt | python -m src.run_concurrent --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple, cast
+
+from src.config import set_llm_max_concurrency
+from src.graph_builder import build_graph
+from src.run_cli import build_initial_state
+from src.state import AgentState
+from src.tools import collect_beacon_followup
+
+
+async def arun_single_query(app, query: str) -> Tuple[AgentState, float]:
+    """
+    异步执行单条 query，返回 (结果 state, 耗时秒数)。
+    耗时不含后台 Beacon 分析；其 summary 之后取回，放在 state["beacon_summary"]。
+    """
+    start = time.perf_counter()
+    result = cast(AgentState, await app.ainvoke(build_initial_state(query)))
+    latency = time.perf_counter() - start
+
+    beacon_job = result.get("beacon_job")
+    if beacon_job:
+        result["beacon_summary"] = await asyncio.to_thread(collect_beacon_followup, beacon_job)
+    return result, latency
+
+
+async def run_queries_concurrently(app, queries: List[str]) -> Tuple[List[dict], float]:
+    """
+    同时提交所有 query，返回 (每条 query 的记录, 总耗时秒数)。
+    单条 query 失败不会影响其他 query，错误信息记录在 "error" 字段中。
+    """
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(
+        *(arun_single_query(app, q) for q in queries),
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - start
+
+    records: List[dict] = []
+    for query, outcome in zip(queries, outcomes):
+        if isinstance(outcome, BaseException):
+            records.append({"query": query, "error": repr(outcome)})
+            continue
+        state, latency = outcome
+        record = {
+            "query": query,
+            "latency_sec": round(latency, 3),
+            "activated_agents": state.get("activated_agents", []),
+            "tools_called": state.get("tool_calls", []),
+            "final_answer": state.get("final_answer", ""),
+        }
+        if state.get("beacon_summary"):
+            record["beacon_summary"] = state["beacon_summary"]
+        records.append(record)
+    return records, elapsed
+
+
+def _read_queries(path: str | None) -> List[str]:
+    if path is None:
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve many queries concurrently through the multi-agent graph."
+    )
+    parser.add_argument(
+        "queries",
+        nargs="?",
+        default=None,
+        help="Text file with one query per line (default: read from stdin).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Maximum number of in-flight LLM requests to the vLLM endpoint.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Optional path to save per-query results as JSON.",
+    )
+    args = parser.parse_args()
+
+    queries = _read_queries(args.queries)
+    if not queries:
+        print("[run_concurrent] No queries given.")
+        return
+
+    set_llm_max_concurrency(args.concurrency)
+    app = build_graph()
+
+    records, elapsed = asyncio.run(run_queries_concurrently(app, queries))
+
+    failed = sum(1 for r in records if "error" in r)
+    for r in records:
+        status = r["error"] if "error" in r else f"{r['latency_sec']:.2f}s"
+        print(f"- {r['query'][:60]!r}: {status}")
+
+    print("-" * 60)
+    print(f"Queries: {len(records)} (failed: {failed}), "
+          f"concurrency: {args.concurrency}, wall time: {elapsed:.2f}s")
+    print(f"Throughput: {len(records) / elapsed:.2f} queries/sec")
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(records, f, indent=2, ensure_ascii=False)
+        print(f"Results saved to: {Path(args.output).absolute()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+# src/speculation.py
+"""
+投机执行 specialist（opt-in，SPECULATIVE_ROUTING_ENABLED）。
+
+LLM Router 分类需要一次完整的 LLM 往返，而 specialist 的 LLM 调用要等路由结果出来才开始。
+开启投机执行后，router 节点在调用 LLM 分类的同时，按本地快速路由的最佳猜测（FastRouter.guess）
+提前启动最可能的 specialist：
+- 启动：后台线程（异步图中为 asyncio task）从 MemoryManager 的快照为该 specialist 挑选历史
+  （只按这一个 specialist 的预算，不重复整个 memory_load_node），构造 prompt 输入，
+  然后以流式方式调用 LLM，chunk 缓存在任务中；
+- 确认：router 给出的 route 与猜测一致时，任务 id 写入 state["speculative_job"]，
+  specialist 节点通过 take_speculative_answer 取回结果，不再重新调用 LLM；
+  已缓存的 chunk 立即、之后生成的 chunk 随到随发，经 streaming.token_writer 推给用户；
+- 取消：route 不一致时立即取消（线程里的流式调用在下一个 chunk 处中止，asyncio task 直接 cancel）。
+
+投机结果只有在其 prompt 输入与 specialist 节点实际构造的输入完全相同时才会被采用
+（输入不同则在推送任何 token 之前放弃），因此开启与否不改变回答内容。
+本地快速路由本身就能高置信度命中时（不需要等 LLM Router），不做投机；
+猜测的 specialist 启用了响应缓存时也不做投机（.stream 不查缓存，由 specialist 节点照常查缓存）。
+"""
+
+import asyncio
+import contextvars
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from src.config import (
+    FAST_ROUTER_ENABLED,
+    SPECULATIVE_MIN_CONFIDENCE,
+    llm_max_concurrency,
+    llm_semaphore,
+)
+from src.state import AgentState
+from src.streaming import _message_text, token_writer
+from src.history_selector import select_history_budgets
+from src.agents.memory_agent import AGENT_HISTORY_BUDGETS, get_memory_manager
+from src.agents.router_agent import _get_fast_router, router_node, arouter_node
+
+
+class _SpeculativeJob:
+    """
+    一次投机执行：猜测的 route、构造出的 prompt 输入、已收到的 chunk，以及后台的 Future / asyncio task。
+    inputs / chunks 有变化或任务结束时通知等待方（线程用 changed，asyncio task 用 achanged）。
+    """
+
+    def __init__(self, route: str, confidence: float):
+        self.route = route
+        self.confidence = confidence
+        self.inputs: Optional[Dict[str, Any]] = None
+        self.chunks: List[str] = []
+        self.cancelled = threading.Event()
+        self.changed = threading.Condition()
+        self.achanged = asyncio.Event()
+        self.future: Optional[Future] = None
+        self.task: Optional[asyncio.Task] = None
+        self.llm_started_at: Optional[float] = None
+        self.llm_done_at: Optional[float] = None
+        self.done_at: Optional[float] = None
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+        if self.task is not None:
+            self.task.cancel()
+
+    def done(self) -> bool:
+        return (self.future or self.task).done()
+
+    def notify(self) -> None:
+        if self.task is not None:
+            self.achanged.set()
+        else:
+            with self.changed:
+                self.changed.notify_all()
+
+    def push(self, text: str) -> None:
+        if self.task is not None:
+            self.chunks.append(text)
+            self.achanged.set()
+        else:
+            with self.changed:
+                self.chunks.append(text)
+                self.changed.notify_all()
+
+
+_jobs: Dict[str, _SpeculativeJob] = {}
+_job_ids = itertools.count(1)
+# 确认后 specialist 节点没有取走的任务（例如节点在 take 之前出错）：完成超过 _JOB_TTL 秒后丢弃，
+# 登记的任务数也不超过 _MAX_JOBS（超出时取消并丢弃最早的）
+_JOB_TTL = 60.0
+_MAX_JOBS = 64
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_size = 0
+
+# 统计：启动 / 命中并被采用 / 路由不一致取消 / 路由一致但输入已过期（或调用失败）而放弃，
+# 以及命中时 LLM 调用提前开始而省下的时间（秒，见 _accept）
+_stats: Dict[str, float] = {"started": 0, "used": 0, "cancelled": 0, "discarded": 0, "saved_sec": 0.0}
+
+
+def speculation_stats() -> Dict[str, float]:
+    with _lock:
+        return dict(_stats)
+
+
+def _count(key: str, amount: float = 1) -> None:
+    with _lock:
+        _stats[key] += amount
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """
+    投机线程池，大小为当前的 LLM 并发上限：每次使用时按 llm_max_concurrency() 检查，
+    上限被 set_llm_max_concurrency 修改后换一个新线程池（旧池中的任务照常完成）。
+    """
+    global _executor, _executor_size
+    size = max(1, llm_max_concurrency())
+    with _lock:
+        if _executor is None or _executor_size != size:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="speculate")
+            _executor_size = size
+        return _executor
+
+
+def _specialist(route: str) -> Tuple[Any, Any, Any]:
+    """route -> (_build_inputs, prompt, llm)。延迟导入，避免与各 specialist 模块循环导入。"""
+    from src.agents import coding_agent, general_agent, planner_agent, theory_agent
+
+    if route == "theory":
+        return theory_agent._build_inputs, theory_agent.theory_prompt, theory_agent.llm
+    if route == "coding":
+        return coding_agent._build_inputs, coding_agent.coding_prompt, coding_agent.llm
+    if route == "planning":
+        return planner_agent._build_inputs, planner_agent.planner_prompt, planner_agent.llm
+    return general_agent._build_inputs, general_agent.general_prompt, general_agent.llm
+
+
+def _prepare(job: _SpeculativeJob, state: AgentState):
+    """
+    在 state 副本上填入该 specialist 用到的记忆字段并构造 prompt 输入，返回 (prompt, llm, inputs)。
+    记忆取自 MemoryManager 的内存快照（与 memory_load_node 相同），历史只按 job.route 的预算挑选。
+    """
+    state = {k: (v.copy() if isinstance(v, (list, dict)) else v) for k, v in state.items()}
+    memory = get_memory_manager().snapshot()
+    budget = AGENT_HISTORY_BUDGETS.get(job.route)
+    state["user_profile"] = memory.get("user_profile", {})
+    state["notes"] = memory.get("notes", [])
+    state["agent_history"] = (
+        select_history_budgets(state.get("query", ""), memory.get("history", []), {job.route: budget})
+        if budget else {}
+    )
+    build_inputs, prompt, llm = _specialist(job.route)
+    job.inputs = build_inputs(state)
+    return prompt, llm, job.inputs
+
+
+def _run(job: _SpeculativeJob, state: AgentState) -> Optional[str]:
+    prompt, llm, inputs = _prepare(job, state)
+    job.notify()
+    if job.cancelled.is_set():
+        return None
+    job.llm_started_at = time.monotonic()
+    for chunk in (prompt | llm).stream(inputs):
+        if job.cancelled.is_set():
+            # 关闭生成器即断开流式连接，服务端不再继续生成
+            return None
+        job.push(_message_text(chunk))
+    job.llm_done_at = time.monotonic()
+    return "".join(job.chunks)
+
+
+async def _arun(job: _SpeculativeJob, state: AgentState) -> Optional[str]:
+    prompt, llm, inputs = await asyncio.to_thread(_prepare, job, state)
+    job.notify()
+    async with llm_semaphore():
+        job.llm_started_at = time.monotonic()
+        async for chunk in (prompt | llm).astream(inputs):
+            job.push(_message_text(chunk))
+    job.llm_done_at = time.monotonic()
+    return "".join(job.chunks)
+
+
+def _guess(state: AgentState) -> Optional[Tuple[str, float]]:
+    """值得投机时返回 (route, confidence)，否则返回 None。"""
+    query = state.get("query", "").strip()
+    if not query:
+        return None
+    fast_router = _get_fast_router()
+    guess = fast_router.guess(query)
+    if guess is None or guess[1] < SPECULATIVE_MIN_CONFIDENCE:
+        return None
+    if FAST_ROUTER_ENABLED and guess[1] >= fast_router.threshold:
+        # 快速路由会直接命中，不需要等 LLM Router
+        return None
+    if getattr(_specialist(guess[0])[2], "cache", None):
+        # 回答可能直接来自响应缓存，由 specialist 节点照常查询
+        return None
+    return guess
+
+
+def _prune_jobs() -> List[_SpeculativeJob]:
+    """
+    丢弃过期 / 超出数量上限的投机任务（调用方持有 _lock），
+    返回因超出上限被丢弃、需要取消的任务（在锁外取消：Future.cancel 会同步调用回调）。
+    """
+    now = time.monotonic()
+    for job_id, job in list(_jobs.items()):
+        if job.done_at is not None and now - job.done_at > _JOB_TTL:
+            del _jobs[job_id]
+    evicted = []
+    while len(_jobs) > _MAX_JOBS:
+        evicted.append(_jobs.pop(next(iter(_jobs))))
+    return evicted
+
+
+def _mark_done(job: _SpeculativeJob) -> None:
+    with _lock:
+        job.done_at = time.monotonic()
+    job.notify()
+
+
+def _register(job: _SpeculativeJob) -> str:
+    job_id = f"speculate-{next(_job_ids)}"
+    with _lock:
+        _jobs[job_id] = job
+        evicted = _prune_jobs()
+        _stats["started"] += 1
+    for old in evicted:
+        old.cancel()
+    # 在锁外登记：已完成的 Future 会立即调用回调
+    (job.future or job.task).add_done_callback(lambda _: _mark_done(job))
+    return job_id
+
+
+def start_speculation(state: AgentState) -> Optional[str]:
+    """按快速路由的猜测在后台线程中启动 specialist，返回任务 id；不值得投机时返回 None。"""
+    guess = _guess(state)
+    if guess is None:
+        return None
+    job = _SpeculativeJob(*guess)
+    job.future = _get_executor().submit(_run, job, dict(state))
+    return _register(job)
+
+
+def astart_speculation(state: AgentState) -> Optional[str]:
+    """start_speculation 的异步版本：启动一个 asyncio task（需要在事件循环中调用）。"""
+    guess = _guess(state)
+    if guess is None:
+        return None
+    job = _SpeculativeJob(*guess)
+    # 使用空的 contextvars 上下文：投机调用不挂在 router 节点的回调上，token 不会被流式输出
+    job.task = asyncio.get_running_loop().create_task(_arun(job, dict(state)),
+                                                      context=contextvars.Context())
+    return _register(job)
+
+
+def confirm_speculation(state: AgentState, job_id: Optional[str]) -> AgentState:
+    """router 给出 route 之后调用：猜对时把任务 id 写入 state，猜错时立即取消。"""
+    state["speculative_job"] = None
+    if job_id is None:
+        return state
+    with _lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        return state
+
+    route = state.get("route", "general")
+    trace = f"speculate[{job.route} conf={job.confidence:.2f}"
+    if route == job.route:
+        state["speculative_job"] = job_id
+        state.setdefault("tool_calls", []).append(trace + "; confirmed]")
+    else:
+        cancel_speculation(job_id)
+        state.setdefault("tool_calls", []).append(trace + f" -> {route}; cancelled]")
+    return state
+
+
+def cancel_speculation(job_id: Optional[str]) -> None:
+    """取消并丢弃一个投机任务（任务 id 不存在时什么也不做）。"""
+    if job_id is None:
+        return
+    with _lock:
+        job = _jobs.pop(job_id, None)
+    if job is not None:
+        job.cancel()
+        _count("cancelled")
+
+
+def _pop_job(state: AgentState, route: str) -> Optional[_SpeculativeJob]:
+    job_id = state.get("speculative_job")
+    if not job_id:
+        return None
+    state["speculative_job"] = None
+    with _lock:
+        job = _jobs.pop(job_id, None)
+    if job is not None and job.route != route:
+        job.cancel()
+        _count("cancelled")
+        return None
+    return job
+
+
+def _follow(job: _SpeculativeJob) -> Iterator[str]:
+    """逐个产出投机任务的 chunk：已收到的立即产出，其余随到随产出，直到任务结束。"""
+    sent = 0
+    while True:
+        with job.changed:
+            job.changed.wait_for(lambda: len(job.chunks) > sent or job.done())
+            new, done = job.chunks[sent:], job.done()
+        yield from new
+        sent += len(new)
+        if done:
+            return
+
+
+async def _afollow(job: _SpeculativeJob) -> AsyncIterator[str]:
+    """_follow 的异步版本（任务在同一个事件循环中运行）。"""
+    sent = 0
+    while True:
+        new, done = job.chunks[sent:], job.done()
+        for text in new:
+            yield text
+        sent += len(new)
+        if done:
+            return
+        if not new:
+            job.achanged.clear()
+            await job.achanged.wait()
+
+
+def _check_inputs(job: _SpeculativeJob, inputs: Dict[str, Any]) -> bool:
+    """投机任务的 prompt 输入与 specialist 实际构造的不同（例如期间记忆被更新）时取消任务。"""
+    if job.inputs == inputs:
+        return True
+    job.cancel()
+    _count("discarded")
+    return False
+
+
+def _accept(state: AgentState, job: _SpeculativeJob, answer: Optional[str], taken_at: float) -> Optional[str]:
+    """
+    采用投机回答并记录省下的时间：LLM 调用比 specialist 节点提前开始的时长
+    （调用在节点开始时已经结束的，按整个调用时长计）。
+    """
+    if answer is None or job.llm_started_at is None:
+        _count("discarded")
+        return None
+    _count("used")
+    _count("saved_sec", max(0.0, min(taken_at, job.llm_done_at or taken_at) - job.llm_started_at))
+    state.setdefault("tool_calls", []).append("speculative_answer")
+    return answer
+
+
+def take_speculative_answer(state: AgentState, route: str, inputs: Dict[str, Any]) -> Optional[str]:
+    """
+    specialist 节点调用：若 state 中有本 route 的投机任务，把它的 chunk 经 token_writer 推给调用方
+    （与节点自己调用 LLM 时的 token 流相同），返回完整回答。
+    投机任务的 prompt 输入与 inputs 不同时不推送任何 token，返回 None，由调用方照常调用 LLM；
+    流到一半调用失败时同样返回 None（已推送的部分由重新生成的回答代替）。
+    """
+    job = _pop_job(state, route)
+    if job is None or job.future is None:
+        return None
+    taken_at = time.monotonic()
+    with job.changed:
+        job.changed.wait_for(lambda: job.inputs is not None or job.done())
+    if not _check_inputs(job, inputs):
+        return None
+    write = token_writer()
+    for text in _follow(job):
+        write(text)
+    try:
+        answer = job.future.result()
+    except Exception:
+        answer = None
+    return _accept(state, job, answer, taken_at)
+
+
+async def atake_speculative_answer(state: AgentState, route: str,
+                                   inputs: Dict[str, Any]) -> Optional[str]:
+    """take_speculative_answer 的异步版本。"""
+    job = _pop_job(state, route)
+    if job is None or job.task is None:
+        return None
+    taken_at = time.monotonic()
+    while job.inputs is None and not job.done():
+        job.achanged.clear()
+        await job.achanged.wait()
+    if not _check_inputs(job, inputs):
+        return None
+    write = token_writer()
+    async for text in _afollow(job):
+        write(text)
+    try:
+        answer = await job.task
+    except Exception:
+        answer = None
+    return _accept(state, job, answer, taken_at)
+
+
+def speculative_router_node(state: AgentState) -> AgentState:
+    """router_node + 投机执行：先按猜测启动 specialist，再等待 router 的分类结果。"""
+    job_id = start_speculation(state)
+    try:
+        state = router_node(state)
+    except BaseException:
+        cancel_speculation(job_id)
+        raise
+    return confirm_speculation(state, job_id)
+
+
+async def aspeculative_router_node(state: AgentState) -> AgentState:
+    """speculative_router_node 的异步版本。"""
+    job_id = astart_speculation(state)
+    try:
+        state = await arouter_node(state)
+    except BaseException:
+        cancel_speculation(job_id)
+        raise
+    return confirm_speculation(state, job_id)
@@ -1,10 +1,26 @@
 # src/state.py
-from typing import TypedDict, List, Dict, Any, Optional, Literal
+from typing import Annotated, TypedDict, List, Dict, Any, Optional, Literal
 
 # 路由类别：Router 会在这几个标签之间选择
 RouteType = Literal["theory", "coding", "planning", "general"]
 
 
+def merge_trace(left: List[str], right: List[str]) -> List[str]:
+    """
+    activated_agents / tool_calls 的合并函数（LangGraph reducer）。
+
+    串行节点返回的是“原列表 + 新记录”，合并结果就是新列表；
+    router 与 memory_load 并行执行时，两边各自在同一个输入列表后面追加记录，
+    这里把两边新增的部分按到达顺序拼接起来，而不是互相覆盖。
+    """
+    prefix = 0
+    for a, b in zip(left, right):
+        if a != b:
+            break
+        prefix += 1
+    return left + right[prefix:]
+
+
 class AgentState(TypedDict, total=False):
     """
     多智能体系统的共享状态结构。
@@ -13,17 +29,24 @@ class AgentState(TypedDict, total=False):
 
     # 1. 用户输入
     query: str  # 当前用户查询
+    session_id: Optional[str]  # 会话 id（CLI 的一次交互会话）；Beacon 增量分析按它区分文档，没有时完整分析
 
     # 2. 中间结果
     route: RouteType                 # Router 的分类结果
+    route_source: Optional[str]      # route 的来源："llm"（LLM Router）/ "fast"（本地快速路由）/ "default"
     partial_answer: Optional[str]    # 某个专家智能体产生的回答
     plan: Optional[str]              # Planner 生成的学习/任务计划
 
-    activated_agents: List[str]      # 本次调用中依次被激活的节点名称
-    tool_calls: List[str]            # 本次调用中使用过的工具名称
+    activated_agents: Annotated[List[str], merge_trace]  # 本次调用中依次被激活的节点名称
+    tool_calls: Annotated[List[str], merge_trace]        # 本次调用中使用过的工具名称
+    beacon_job: Optional[str]        # 后台 Beacon 分析任务 id（见 tools.collect_beacon_followup）
+    beacon_summary: Optional[str]    # 取回的后台 Beacon summary（补充消息）
+    speculative_job: Optional[str]   # 投机执行的 specialist 任务 id（见 src/speculation.py）
+    prompt_tokens: Dict[str, int]    # 每次 LLM 调用的 prompt token 数（按节点名）
 
     # 3. 记忆相关
     session_history: List[Dict[str, str]]  # 当前会话的历史 Q&A（从长期记忆中截取）
+    agent_history: Dict[str, List[Dict[str, str]]]  # memory_load 按各专家的 history 预算挑好的历史
     user_profile: Dict[str, Any]           # 用户档案，如专业/课程/目标
     notes: List[str]                       # 简单的笔记列表，用于 search_notes 工具
 
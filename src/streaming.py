@@ -0,0 +1,95 @@
+# src/streaming.py
+"""
+端到端 token 流式输出。
+
+- 专家节点通过 stream_llm_text / astream_llm_text 以 .stream / .astream 调用 LLM；
+- 图以 LangGraph 的 "messages" 流模式把这些 token 逐个推给调用方；
+- 没有在节点内调用 LLM 的文本（如投机执行预先生成的回答，见 src/speculation.py）
+  通过 token_writer 以 "custom" 流模式补发，调用方看到的与 "messages" 中的 token 相同；
+- stream_graph 供 CLI 使用：边收 token 边回调，同时测量首 token 延迟（TTFT）。
+
+启用了响应缓存的节点仍走 invoke：LangChain 的 .stream 不查缓存，
+而 invoke 在 "messages" 流模式下未命中时同样会逐 token 回调。
+"""
+
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from langgraph.config import get_stream_writer
+
+from src.config import llm_semaphore
+
+# 这些节点的 LLM token 会显示给用户；router 的分类输出不显示
+SPECIALIST_NODES = {"theory", "coding", "planning", "general"}
+# token_writer 写入的 "custom" 流数据中 token 文本的键
+TOKEN_KEY = "token"
+
+
+def _message_text(message: Any) -> str:
+    content = getattr(message, "content", "")
+    return content if isinstance(content, str) else ""
+
+
+def stream_llm_text(prompt, llm, inputs: Dict[str, Any]) -> str:
+    """以流式方式调用 prompt | llm，返回拼接后的完整文本。"""
+    chain = prompt | llm
+    if getattr(llm, "cache", None):
+        return _message_text(chain.invoke(inputs))
+    parts = [_message_text(chunk) for chunk in chain.stream(inputs)]
+    return "".join(parts)
+
+
+async def astream_llm_text(prompt, llm, inputs: Dict[str, Any]) -> str:
+    """stream_llm_text 的异步版本，整个流期间占用一个 LLM 并发名额。"""
+    chain = prompt | llm
+    async with llm_semaphore():
+        if getattr(llm, "cache", None):
+            return _message_text(await chain.ainvoke(inputs))
+        parts = [_message_text(chunk) async for chunk in chain.astream(inputs)]
+    return "".join(parts)
+
+
+def token_writer() -> Callable[[str], None]:
+    """
+    当前节点的 token 写入函数：写入的文本经 "custom" 流模式交给 stream_graph，与 LLM token 一样推给调用方。
+    不在图节点中运行（或图没有以 "custom" 模式流式运行）时返回空操作。
+    """
+    try:
+        writer = get_stream_writer()
+    except (RuntimeError, KeyError):
+        return lambda text: None
+    return lambda text: writer({TOKEN_KEY: text})
+
+
+def stream_graph(app,
+                 init_state: Dict[str, Any],
+                 on_token: Callable[[str], None]) -> Tuple[Dict[str, Any], Optional[float], float]:
+    """
+    以 ["messages", "custom", "values"] 模式运行图：
+    专家节点的每个 token（包括 token_writer 补发的文本）都会立即传给 on_token。
+
+    返回 (最终 state, 首 token 延迟秒数或 None, 总耗时秒数)。
+    """
+    start = time.perf_counter()
+    ttft: Optional[float] = None
+    final_state: Dict[str, Any] = dict(init_state)
+
+    for mode, payload in app.stream(init_state, stream_mode=["messages", "custom", "values"]):
+        if mode == "values":
+            final_state = payload
+            continue
+
+        if mode == "custom":
+            text = payload.get(TOKEN_KEY, "") if isinstance(payload, dict) else ""
+        else:
+            chunk, metadata = payload
+            if metadata.get("langgraph_node") not in SPECIALIST_NODES:
+                continue
+            text = _message_text(chunk)
+        if not text:
+            continue
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        on_token(text)
+
+    return final_state, ttft, time.perf_counter() - start
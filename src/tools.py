@@ -1,47 +1,87 @@
 # src/tools.py
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
+import hashlib
+import itertools
+import multiprocessing
 import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from .config import (
+    BEACON_CACHE_ENABLED,
+    BEACON_CACHE_MAX_ENTRIES,
+    BEACON_CACHE_PATH,
+    BEACON_INCREMENTAL_ENABLED,
+    BEACON_MAX_CODE_CHARS,
+    BEACON_PARALLEL_MIN_CHARS,
+    BEACON_TIMEOUT,
+    BEACON_WORKERS,
+)
+from .prompt_budget import truncate_to_tokens
+from .retrieval import get_notes_index, notes_index_if_loaded
 
 # 尝试导入 BeaconExtractor（假设你把上面的长代码放在 src/Beacon.py 里）
 # 如果你的文件路径不同，可以把这一行改成 from Beacon import BeaconExtractor 等
 try:
-    from .Beacon import BeaconExtractor  # src/Beacon.py
+    from .Beacon import (  # src/Beacon.py
+        BeaconExtractor,
+        IncrementalBeacon,
+        analyze_source,
+    )
+    from .beacon import BeaconResultCache, BeaconServer  # src/beacon/
 except Exception:
     BeaconExtractor = None
+    BeaconResultCache = None
+    BeaconServer = None
+    IncrementalBeacon = None
+    analyze_source = None
 
 
 # =========================
 # 2. 笔记检索（保留）
 # =========================
 
-def search_notes(query: str, notes: List[str], max_results: int = 2) -> str:
+def search_notes(query: str,
+                 notes: List[str],
+                 max_results: int = 2,
+                 max_tokens: Optional[int] = None) -> str:
     """
-    在 notes 列表中根据 query 做最简单的关键词匹配检索。
+    在笔记索引中检索与 query 最相关的笔记。
+
+    索引覆盖 notes/ 目录下的 markdown 文件以及传入的 notes 列表（memory 中的笔记），
+    使用增量维护的 BM25 倒排索引，查询只访问查询词的 posting list。
 
     参数:
         query: 用户当前的查询文本
-        notes: 预先存储的笔记列表，每个元素是一段文本
+        notes: 预先存储的笔记列表，每个元素是一段文本（会增量加入索引）
         max_results: 返回的最多匹配条目数量
+        max_tokens: 结果的 token 上限（平均分给每条匹配的笔记），None 表示不截断
 
     返回:
         连接后的匹配笔记字符串，如果没有匹配则返回空字符串。
     """
-    q = query.lower().strip()
+    q = query.strip()
     if not q:
         return ""
 
-    matched = []
-    for note in notes:
-        if q in note.lower():
-            matched.append(note)
-        if len(matched) >= max_results:
-            break
+    index = get_notes_index()
+    if notes:
+        index.sync_memory_notes(notes)
+
+    matched = [index.text(doc_id) for doc_id, _ in index.search(q, k=max_results)]
+    matched = [m for m in matched if m]
 
     if not matched:
         return ""
 
+    if max_tokens is not None:
+        per_note = max_tokens // len(matched)
+        matched = [truncate_to_tokens(m, per_note) for m in matched]
+
     return "\n\n".join(matched)
 
 
@@ -49,9 +89,44 @@ def search_notes(query: str, notes: List[str], max_results: int = 2) -> str:
 # 3. Beacon 推理工具
 # =========================
 
+_beacon_cache = None
+_beacon_cache_lock = threading.Lock()
+
+
+def get_beacon_cache():
+    """进程级的 Beacon 结果缓存（按源码哈希 + 参数），未启用时返回 None。"""
+    global _beacon_cache
+    if not BEACON_CACHE_ENABLED or BeaconResultCache is None:
+        return None
+    with _beacon_cache_lock:
+        if _beacon_cache is None:
+            try:
+                _beacon_cache = BeaconResultCache(max_entries=BEACON_CACHE_MAX_ENTRIES,
+                                                  path=BEACON_CACHE_PATH)
+            except Exception as e:
+                print(f"[tools] Warning: Beacon disk cache unavailable ({e}), using memory only.")
+                _beacon_cache = BeaconResultCache(max_entries=BEACON_CACHE_MAX_ENTRIES)
+        return _beacon_cache
+
+
+_beacon_incremental = None
+
+
+def get_beacon_incremental():
+    """进程级的增量分析器：同一文档（会话）中代码的新版本只重新分析改动过的函数，未启用时返回 None。"""
+    global _beacon_incremental
+    if not BEACON_INCREMENTAL_ENABLED or IncrementalBeacon is None:
+        return None
+    with _beacon_cache_lock:
+        if _beacon_incremental is None:
+            _beacon_incremental = IncrementalBeacon()
+        return _beacon_incremental
+
+
 def beacon_analyze_code(code: str,
                         max_per_func: int = 20,
-                        mode: str = "compact") -> str:
+                        mode: str = "compact",
+                        doc_id: Optional[str] = None) -> str:
     """
     对一段 Python 源码字符串执行 Beacon 推理，返回一个简要的文本总结。
 
@@ -60,6 +135,9 @@ def beacon_analyze_code(code: str,
         - 不依赖文件路径，直接处理字符串（不同于 CLI 用法）
         - 返回一个可直接附加到回答后的 “Beacon summary” 文本
 
+    相同源码 + 参数的分析结果会被缓存（见 get_beacon_cache），LLM 重复给出同一段代码时直接复用；
+    给定 doc_id（如会话 id）时，同一 doc_id 下的新版本代码走增量分析（见 get_beacon_incremental），
+    不给时总是完整分析。
     如果 BeaconExtractor 无法导入，则返回提示信息。
     """
     if BeaconExtractor is None:
@@ -67,37 +145,18 @@ def beacon_analyze_code(code: str,
                 "Please check that `src/Beacon.py` exists and is importable.")
 
     try:
-        extractor = BeaconExtractor(code)
-        extractor.visit(extractor.tree)
-
         # 这里走 program-level beacons，和你 CLI 版本逻辑一致（但更简化）
-        program_beacons = extractor.compute_program_beacons(
-            max_per_func=max_per_func,
-            mode=mode,
-            explicit_entry=None,
-        )
-
-        lines: List[str] = []
-        lines.append("### Beacon summary")
-        lines.append("")
-        lines.append("Program-level beacons (entry-driven):")
-
-        for entry, nodes in program_beacons.items():
-            reachable = extractor.reachable_functions_from(entry)
-            reachable_str = ", ".join(sorted(reachable))
-            lines.append(f"- Entry `{entry}` (reachable functions: {reachable_str})")
-
-            for nid in nodes:
-                lineno = extractor.node_lines.get(nid)
-                func = extractor.node_func.get(nid, "<module>")
-                code_line = extractor._safe_get_line(nid).strip()
-                if not code_line:
-                    continue
-                lines.append(f"  - [{func}] line {lineno}: {code_line}")
-
-        if len(lines) == 3:  # 没有任何 beacon
-            lines.append("  (No significant beacons found for this code.)")
-
+        result = analyze_source(code,
+                                max_per_func=max_per_func,
+                                mode=mode,
+                                explicit_entry=None,
+                                cache=get_beacon_cache(),
+                                incremental=get_beacon_incremental(),
+                                include_local=False,
+                                doc_id=doc_id)
+
+        lines: List[str] = ["### Beacon summary", ""]
+        lines.extend(_beacon_summary_lines(result))
         return "\n".join(lines)
 
     except Exception as e:
@@ -105,6 +164,243 @@ def beacon_analyze_code(code: str,
         return f"[Beacon] Error while analyzing code: {e}"
 
 
+def _beacon_summary_lines(result: dict) -> List[str]:
+    """analyze_source 结果中 program-level beacons 部分的 summary 文本行。"""
+    lines: List[str] = ["Program-level beacons (entry-driven):"]
+
+    for entry, nodes in result["program_beacons"].items():
+        reachable_str = ", ".join(result["reachable"][entry])
+        lines.append(f"- Entry `{entry}` (reachable functions: {reachable_str})")
+
+        for node in nodes:
+            code_line = node["code"].strip()
+            if not code_line:
+                continue
+            lines.append(f"  - [{node['func']}] line {node['line']}: {code_line}")
+
+    if len(lines) == 1:  # 没有任何 beacon
+        lines.append("  (No significant beacons found for this code.)")
+    return lines
+
+
+_beacon_server = None
+
+
+def _beacon_mp_context():
+    """
+    Beacon 工作进程的启动方式。agent 进程里已经有其他线程在运行（记忆写线程、投机执行、
+    SQLite、httpx ...），fork 出的子进程可能继承被这些线程持有的锁，
+    所以用 forkserver（平台不支持时用 spawn）。
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def get_beacon_server():
+    """
+    进程级的 BeaconServer：一批代码块交给它统一分析（与 get_beacon_cache 共享结果缓存），
+    未缓存的代码块总量超过 BEACON_PARALLEL_MIN_CHARS 时分发到 BEACON_WORKERS 个进程
+    （进程用 _beacon_mp_context() 启动）。
+    """
+    global _beacon_server
+    if BeaconServer is None:
+        return None
+    cache = get_beacon_cache()
+    with _beacon_cache_lock:
+        if _beacon_server is None:
+            _beacon_server = BeaconServer(workers=max(1, BEACON_WORKERS),
+                                          cache=cache,
+                                          parallel_min_chars=BEACON_PARALLEL_MIN_CHARS,
+                                          mp_context=_beacon_mp_context())
+        return _beacon_server
+
+
+def _skipped_note(code: str) -> str:
+    return (f"[Beacon] Skipped: code block has {len(code)} characters "
+            f"(limit {BEACON_MAX_CODE_CHARS}).")
+
+
+def _response_lines(response: Optional[dict], code: str, timeout: Optional[float]) -> List[str]:
+    """BeaconServer 对一个代码块的响应 -> summary 文本行（未提交的是超限代码块）。"""
+    if response is None:
+        return [_skipped_note(code)]
+    error = response.get("error")
+    if error is None:
+        return _beacon_summary_lines(response["result"])
+    if timeout is not None and error.startswith("timeout"):
+        return ["[Beacon] Analysis did not finish in time; skipped."]
+    return [f"[Beacon] Error while analyzing code: {error}"]
+
+
+def beacon_analyze_blocks(blocks: List[Tuple[str, str]],
+                          max_per_func: int = 20,
+                          mode: str = "compact",
+                          timeout: Optional[float] = None,
+                          doc_id: Optional[str] = None) -> str:
+    """
+    对多个代码块做一次批量 Beacon 推理，返回合并后的 summary。
+
+    参数:
+        blocks: [(来源, 代码)]，来源如 "answer" / "query"，用于 summary 中的小标题
+        timeout: 分析时限（秒）。给定时所有代码块都在 Beacon 工作进程中分析，
+                 到时仍未完成的分析进程会被杀掉，对应代码块注明超时；
+                 None 时与之前一样（单个代码块在当前线程中分析）
+        doc_id: 文档 id（如会话 id），只有一个代码块时用于增量分析（见 beacon_analyze_code）
+
+    按代码内容哈希去重（同一段代码只分析一次，保留第一次出现的来源）。
+    只有一个代码块时 summary 与 beacon_analyze_code 相同（给定 doc_id 时走增量分析）；
+    多个代码块作为一批交给 get_beacon_server()，结果按代码块顺序合并。
+    超过 BEACON_MAX_CODE_CHARS 的代码块不做分析，只在 summary 中注明。
+    """
+    unique: Dict[bytes, Tuple[str, str]] = {}
+    for origin, code in blocks:
+        digest = hashlib.blake2b(code.encode("utf-8"), digest_size=16).digest()
+        unique.setdefault(digest, (origin, code))
+    items = list(unique.values())
+    if not items:
+        return ""
+    if len(items) == 1:
+        code = items[0][1]
+        if len(code) > BEACON_MAX_CODE_CHARS:
+            return _skipped_note(code)
+        if timeout is None:
+            return beacon_analyze_code(code, max_per_func=max_per_func, mode=mode, doc_id=doc_id)
+
+    server = get_beacon_server()
+    if server is None:
+        return ("[Beacon] BeaconExtractor not available. "
+                "Please check that `src/Beacon.py` exists and is importable.")
+
+    requests = [
+        {"id": i, "code": code, "max_per_func": max_per_func, "mode": mode, "include_local": False,
+         # 单个代码块多半是用户在同一会话里反复修改的代码：在工作进程中按 doc_id 走增量分析
+         "doc_id": doc_id if len(items) == 1 and BEACON_INCREMENTAL_ENABLED else None}
+        for i, (_, code) in enumerate(items)
+        if len(code) <= BEACON_MAX_CODE_CHARS
+    ]
+    try:
+        responses = {r["id"]: r for r in server.analyze_batch(requests, timeout=timeout)}
+    except Exception as e:
+        return f"[Beacon] Error while analyzing code: {e}"
+
+    if len(items) == 1:
+        return "\n".join(["### Beacon summary", ""]
+                         + _response_lines(responses.get(0), items[0][1], timeout))
+    lines: List[str] = [f"### Beacon summary ({len(items)} code blocks)"]
+    for i, (origin, code) in enumerate(items):
+        lines.extend(["", f"#### Code block {i + 1} (from the {origin})"])
+        lines.extend(_response_lines(responses.get(i), code, timeout))
+    return "\n".join(lines)
+
+
+_beacon_executor = None
+# 后台任务 id -> Future[str]，由 collect_beacon_followup 取走
+_beacon_jobs: Dict[str, Future] = {}
+# 已完成但还没被取走的任务 id -> 完成时间（time.monotonic()）
+_beacon_jobs_done: Dict[str, float] = {}
+_beacon_job_ids = itertools.count(1)
+# 调用方一直不取走的任务（例如并发入口中途出错）：完成超过 _BEACON_JOB_TTL 秒后丢弃，
+# 登记的任务数也不超过 _BEACON_MAX_JOBS（超出时丢弃最早的）
+_BEACON_JOB_TTL = 600.0
+_BEACON_MAX_JOBS = 256
+# 分析进程被杀掉、结果传回等所需的余量（秒）：wait_beacon_summary 在时限之后再多等这么久
+_BEACON_WAIT_GRACE = 1.0
+
+
+def _get_beacon_executor() -> ThreadPoolExecutor:
+    """
+    懒加载的 Beacon 线程池。线程只负责把代码块交给 BeaconServer 并等待结果，
+    分析本身在工作进程中进行（不与流式输出线程争抢 GIL），且不会超过任务的时限。
+    """
+    global _beacon_executor
+    with _beacon_cache_lock:
+        if _beacon_executor is None:
+            _beacon_executor = ThreadPoolExecutor(max_workers=max(1, BEACON_WORKERS),
+                                                  thread_name_prefix="beacon")
+        return _beacon_executor
+
+
+def _run_beacon_analysis(blocks: List[Tuple[str, str]], deadline: float,
+                         doc_id: Optional[str]) -> str:
+    # 在线程池中排队的时间也计入时限；已经超时时只返回已缓存的结果
+    return beacon_analyze_blocks(blocks, timeout=max(0.0, deadline - time.monotonic()), doc_id=doc_id)
+
+
+def submit_beacon_analysis(blocks: List[Tuple[str, str]], doc_id: Optional[str] = None) -> Future:
+    """
+    在后台执行 beacon_analyze_blocks，返回 Future[str]（doc_id 见 beacon_analyze_blocks）。
+
+    时限 BEACON_TIMEOUT 从提交时开始计算（包括在线程池中排队的时间）：到时仍在运行的分析进程
+    会被杀掉，对应代码块在 summary 中注明超时，因此 Future 最迟在时限之后很快完成。
+    超过 BEACON_MAX_CODE_CHARS 的代码块不做分析（见 beacon_analyze_blocks）；
+    全部代码块都超限时直接返回已完成的 Future。
+    """
+    if all(len(code) > BEACON_MAX_CODE_CHARS for _, code in blocks):
+        future: Future = Future()
+        future.set_result(beacon_analyze_blocks(blocks))
+        return future
+    deadline = time.monotonic() + BEACON_TIMEOUT
+    return _get_beacon_executor().submit(_run_beacon_analysis, blocks, deadline, doc_id)
+
+
+def wait_beacon_summary(future: Future, timeout: Optional[float] = None) -> str:
+    """
+    等待 Beacon summary，最多 timeout 秒（默认 BEACON_TIMEOUT 加上少量余量）。
+
+    分析本身受 BEACON_TIMEOUT 限制（超时的分析进程会被杀掉），正常情况下 Future 在时限内完成；
+    这里的 timeout 只是兜底。
+    """
+    timeout = BEACON_TIMEOUT + _BEACON_WAIT_GRACE if timeout is None else timeout
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        return f"[Beacon] Analysis did not finish within {timeout:g}s; skipped."
+
+
+def _prune_beacon_jobs() -> None:
+    """丢弃过期 / 超出数量上限的后台任务（调用方持有 _beacon_cache_lock）。"""
+    now = time.monotonic()
+    for job_id, done_at in list(_beacon_jobs_done.items()):
+        if now - done_at > _BEACON_JOB_TTL:
+            _beacon_jobs.pop(job_id, None)
+            del _beacon_jobs_done[job_id]
+    while len(_beacon_jobs) > _BEACON_MAX_JOBS:
+        job_id = next(iter(_beacon_jobs))
+        _beacon_jobs.pop(job_id).cancel()
+        _beacon_jobs_done.pop(job_id, None)
+
+
+def _mark_beacon_job_done(job_id: str) -> None:
+    with _beacon_cache_lock:
+        if job_id in _beacon_jobs:
+            _beacon_jobs_done[job_id] = time.monotonic()
+
+
+def start_beacon_job(blocks: List[Tuple[str, str]], doc_id: Optional[str] = None) -> str:
+    """提交后台 Beacon 分析，返回任务 id（可以放进 AgentState）。"""
+    job_id = f"beacon-{next(_beacon_job_ids)}"
+    future = submit_beacon_analysis(blocks, doc_id)
+    with _beacon_cache_lock:
+        _beacon_jobs[job_id] = future
+        _prune_beacon_jobs()
+    # 在锁外登记：已完成的 Future 会立即调用回调
+    future.add_done_callback(lambda _: _mark_beacon_job_done(job_id))
+    return job_id
+
+
+def collect_beacon_followup(job_id: str, timeout: Optional[float] = None) -> Optional[str]:
+    """
+    取回后台任务的 Beacon summary（作为回答之后的补充消息），最多等待 timeout 秒。
+    任务 id 不存在（已被取走，或过期被丢弃，见 _BEACON_JOB_TTL）时返回 None。
+    """
+    with _beacon_cache_lock:
+        future = _beacon_jobs.pop(job_id, None)
+        _beacon_jobs_done.pop(job_id, None)
+    if future is None:
+        return None
+    return wait_beacon_summary(future, timeout)
+
+
 # =========================
 # 4. Markdown 写作 / 保存工具
 # =========================
@@ -157,4 +453,12 @@ def save_markdown_note(title: str,
     md_text = format_as_markdown(title, content)
 
     path.write_text(md_text, encoding="utf-8")
+
+    # 增量更新笔记索引（索引尚未建立时，首次建立会扫描到这个文件）。
+    # 只收录索引根目录下的笔记：保存到其他 base_dir 的文件重建索引时不会被扫描到，
+    # 增量加入会让检索结果依赖于进程是否重启过。
+    index = notes_index_if_loaded()
+    if index is not None and index.covers(path):
+        index.add_document(str(path.resolve()), md_text)
+
     return str(path)